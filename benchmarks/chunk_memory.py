@@ -0,0 +1,114 @@
+"""Resident memory of the chunk records a loaded store keeps, and the cost of reading hit text.
+
+    python -m benchmarks.chunk_memory --chunks 20000
+
+The reference point is the list of `ChunkRecord`s with text and line terms the store used to
+hold for every chunk; the store now keeps a `ChunkTable` and reads text for the final hits.
+"""
+
+import argparse
+import json
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from orchestrator_api.rag.chunk_table import ChunkTable
+from orchestrator_api.rag.line_terms import build_line_terms
+from orchestrator_api.rag.sqlite_storage import SQLiteStorage
+from orchestrator_api.rag.store import ChunkRecord
+
+WORDS = (
+    "cloud mask ndvi band red nir swir sentinel landsat scene water index shadow pixel "
+    "reflectance terrain glacier crop forest urban thermal radar orbit tile granule"
+).split()
+
+
+def synthetic_rows(chunks: int, chunks_per_doc: int, words: int, seed: int):
+    rng = np.random.default_rng(seed)
+    for doc_idx in range(chunks):
+        doc = doc_idx // chunks_per_doc
+        start = (doc_idx % chunks_per_doc) * 12 + 1
+        lines = [" ".join(rng.choice(WORDS, words // 12)) for _ in range(12)]
+        text = f"Section: part {doc_idx}\n" + "\n".join(lines)
+        yield (
+            doc_idx,
+            f"doc-{doc}.md",
+            f"doc-{doc}.md:{start}-{start + 11}",
+            text,
+            start,
+            start + 11,
+            build_line_terms(text),
+        )
+
+
+def retained_bytes(build) -> tuple[int, object]:
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--chunks-per-doc", type=int, default=40)
+    parser.add_argument("--words", type=int, default=120)
+    parser.add_argument("--hits", type=int, default=9)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "chunks.sqlite3"
+        storage = SQLiteStorage(db_path)
+        with storage.transaction() as conn:
+            storage.insert_chunks(
+                conn, synthetic_rows(args.chunks, args.chunks_per_doc, args.words, args.seed)
+            )
+        text_bytes = sum(len(text.encode()) for _, text in storage.load_texts())
+
+        reader = sqlite3.connect(db_path)
+        records_size, _ = retained_bytes(
+            lambda: [
+                ChunkRecord(*row)
+                for row in reader.execute(
+                    "SELECT doc_id, chunk_id, text, line_start, line_end, line_terms "
+                    "FROM chunks ORDER BY doc_idx"
+                )
+            ]
+        )
+        reader.close()
+        table_size, table = retained_bytes(
+            lambda: ChunkTable().extend_at(args.chunks, storage.load_chunk_index())
+        )
+
+        rng = np.random.default_rng(args.seed + 1)
+        start = time.perf_counter()
+        for _ in range(args.queries):
+            hits = rng.choice(args.chunks, args.hits, replace=False).tolist()
+            storage.fetch_chunks([table.chunk_id(doc_index) for doc_index in hits])
+        fetch_ms = (time.perf_counter() - start) / args.queries * 1000
+        storage.close()
+
+    print(
+        json.dumps(
+            {
+                "chunks": args.chunks,
+                "text_mb": round(text_bytes / 2**20, 2),
+                "records_mb": round(records_size / 2**20, 2),
+                "chunk_table_mb": round(table_size / 2**20, 2),
+                "hit_text_fetch_ms_mean": round(fetch_ms, 3),
+                "hits_per_query": args.hits,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
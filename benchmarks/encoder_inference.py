@@ -0,0 +1,141 @@
+"""SPLADE encoder inference modes on CPU: parity with fp32 PyTorch, latency and throughput.
+
+    python -m benchmarks.encoder_inference --modes torch int8 onnx --docs 500 --threads 4
+
+Each mode in `RAG_SPARSE_INFERENCE` loads the model through `SparseEncoderRuntime`, encodes a
+synthetic corpus and query set (see `benchmarks.retrieval`) and reports document throughput,
+single-query latency percentiles and, against the fp32 `torch` mode, the mean and worst top-k
+overlap of the chunks each query ranks highest. `--autotune` times batch sizes first, as
+`RAG_ENCODE_BATCH_AUTOTUNE` does at warm-up. A mode that falls back to another is reported
+with the mode that actually ran.
+"""
+
+import argparse
+import json
+import platform
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.retrieval import git_commit, synthetic_documents, synthetic_queries, vocabulary
+from orchestrator_api.config import settings
+from orchestrator_api.rag.encoder import (
+    INFERENCE_MODES,
+    SparseEncoderRuntime,
+    SparseVector,
+    autotune_batch_size,
+)
+
+
+def score_matrix(queries: list[SparseVector], docs: list[SparseVector], dim: int) -> np.ndarray:
+    doc_matrix = np.zeros((len(docs), dim), dtype=np.float32)
+    for row, vec in enumerate(docs):
+        doc_matrix[row, vec.rows] = vec.weights
+    query_matrix = np.zeros((len(queries), dim), dtype=np.float32)
+    for row, vec in enumerate(queries):
+        query_matrix[row, vec.rows] = vec.weights
+    return query_matrix @ doc_matrix.T
+
+
+def top_k(scores: np.ndarray, k: int) -> list[set[int]]:
+    # Stable, so tied scores rank the same in every mode.
+    return [set(np.argsort(-row, kind="stable")[:k].tolist()) for row in scores]
+
+
+def run_mode(mode: str, texts: list[str], queries: list[str], args) -> tuple[dict, np.ndarray]:
+    runtime = SparseEncoderRuntime(args.model, inference=mode)
+    start = time.perf_counter()
+    if not runtime.wait_ready():
+        raise SystemExit(f"{mode}: {runtime.error}")
+    load = time.perf_counter() - start
+    if args.autotune:
+        with torch.no_grad():
+            runtime.encode_batch_size, runtime.batch_autotune = autotune_batch_size(
+                runtime.model.encode_document, args.autotune
+            )
+
+    start = time.perf_counter()
+    docs = runtime.encode_documents(texts)
+    encode = time.perf_counter() - start
+
+    for query in queries[: args.warmup]:
+        runtime._encode_query_batch([query])
+    latencies = []
+    encoded = []
+    for query in queries:
+        start = time.perf_counter()
+        encoded.extend(runtime._encode_query_batch([query]))
+        latencies.append(time.perf_counter() - start)
+    lat_ms = np.asarray(latencies) * 1000
+
+    dim = 1 + max(int(vec.rows.max()) for vec in docs + encoded if len(vec.rows))
+    row = {
+        "mode": mode,
+        "inference": runtime.inference,
+        "threads": torch.get_num_threads(),
+        "load_seconds": round(load, 3),
+        "encode_batch_size": runtime.encode_batch_size,
+        "batch_autotune": runtime.batch_autotune,
+        "docs_per_s": round(len(texts) / encode, 1),
+        "query_ms_p50": round(float(np.percentile(lat_ms, 50)), 3),
+        "query_ms_p95": round(float(np.percentile(lat_ms, 95)), 3),
+        "query_ms_p99": round(float(np.percentile(lat_ms, 99)), 3),
+        "queries_per_s": round(len(queries) / float(np.sum(latencies)), 1),
+        "avg_doc_nnz": round(float(np.mean([len(vec.rows) for vec in docs])), 1),
+    }
+    return row, score_matrix(encoded, docs, dim)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=settings.rag_sparse_model)
+    parser.add_argument("--modes", nargs="+", choices=INFERENCE_MODES, default=["torch", "int8"])
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=0, help="torch threads (0: default)")
+    parser.add_argument("--autotune", type=int, nargs="*", help="batch sizes to time first")
+    parser.add_argument("--vocab", type=int, default=20000)
+    parser.add_argument("--korean-share", type=float, default=0.4)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    words = vocabulary(args.vocab, args.seed, args.korean_share)
+    documents = synthetic_documents(args.docs, 20, words, args.seed)
+    texts = [record.text for _, records in documents for record in records]
+    queries = synthetic_queries(args.queries, words, args.seed + 1)
+
+    # fp32 PyTorch is the reference every mode is compared with.
+    modes = ["torch", *(mode for mode in args.modes if mode != "torch")]
+    results = []
+    reference = None
+    for mode in modes:
+        row, scores = run_mode(mode, texts, queries, args)
+        ranked = top_k(scores, args.top_k)
+        if reference is None:
+            reference = ranked
+        overlaps = [len(a & b) / len(a) for a, b in zip(ranked, reference, strict=True)]
+        row["top_k_overlap_mean"] = round(float(np.mean(overlaps)), 4)
+        row["top_k_overlap_min"] = round(float(np.min(overlaps)), 4)
+        results.append(row)
+
+    print(
+        json.dumps(
+            {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "torch": torch.__version__,
+                "args": {key: str(value) for key, value in vars(args).items()},
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
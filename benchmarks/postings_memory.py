@@ -0,0 +1,101 @@
+"""Memory per million postings of each posting weight format, and its cost at query time.
+
+    python -m benchmarks.postings_memory --docs 20000
+
+Reference points are the dict of `(doc, weight)` tuple lists the store used to keep, and
+the plain int32/float32 CSR arrays used before doc ids were block-coded.
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.sparse_pruning import synthetic_index, synthetic_queries
+from orchestrator_api.rag.sparse_index import WEIGHT_FORMATS, PostingSegment, SparseMatrixIndex
+
+MILLION = 1_000_000
+
+
+def dict_bytes_per_posting(rows: np.ndarray, docs: np.ndarray, values: np.ndarray) -> float:
+    tracemalloc.start()
+    postings: dict[int, list[tuple[int, float]]] = {}
+    for row, doc, value in zip(rows.tolist(), docs.tolist(), values.tolist(), strict=True):
+        postings.setdefault(row, []).append((doc, value))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(rows)
+
+
+def csr_bytes_per_posting(segment: PostingSegment) -> float:
+    # int64 row ids + indptr, int32 doc ids and float32 weights.
+    return (len(segment.row_ids) * 16 + segment.nnz * 8) / segment.nnz
+
+
+def query_ms(index: SparseMatrixIndex, queries, docs: int) -> float:
+    start = time.perf_counter()
+    for rows, weights in queries:
+        index.matvec(rows, weights, docs)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--terms-per-doc", type=int, default=120)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dict-sample", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    index = synthetic_index(args.docs, args.terms_per_doc, args.seed)
+    rows, docs, values = index.merged().to_triples()
+    queries = synthetic_queries(args.queries, args.seed + 1)
+    sample = slice(0, min(args.dict_sample, len(rows)))
+    baselines = {
+        "dict_of_tuples": dict_bytes_per_posting(rows[sample], docs[sample], values[sample]),
+        "csr_int32_float32": csr_bytes_per_posting(PostingSegment.from_triples(rows, docs, values)),
+    }
+
+    exact = SparseMatrixIndex(weight_format="float32").append(rows, docs, values)
+    formats = {}
+    for weight_format in WEIGHT_FORMATS:
+        index = SparseMatrixIndex(weight_format=weight_format).append(rows, docs, values)
+        _, _, stored = index.merged().to_triples()
+        per_posting = index.nbytes / index.nnz
+        errors = [
+            np.abs(index.matvec(*query, args.docs) - exact.matvec(*query, args.docs)).max()
+            for query in queries
+        ]
+        formats[weight_format] = {
+            "bytes_per_posting": round(per_posting, 3),
+            "mb_per_million_postings": round(per_posting * MILLION / 2**20, 2),
+            "mb_saved_per_million_vs_dict": round(
+                (baselines["dict_of_tuples"] - per_posting) * MILLION / 2**20, 2
+            ),
+            "mb_saved_per_million_vs_csr": round(
+                (baselines["csr_int32_float32"] - per_posting) * MILLION / 2**20, 2
+            ),
+            "max_weight_error": float(np.abs(stored - values).max()),
+            "max_score_error": float(max(errors)),
+            "query_ms_mean": round(query_ms(index, queries, args.docs), 3),
+        }
+    print(
+        json.dumps(
+            {
+                "docs": args.docs,
+                "postings": len(rows),
+                "baseline_bytes_per_posting": {
+                    name: round(value, 2) for name, value in baselines.items()
+                },
+                "formats": formats,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
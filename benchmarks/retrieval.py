@@ -0,0 +1,301 @@
+"""End-to-end `SparseVectorStore` benchmark on reproducible synthetic corpora.
+
+    python -m benchmarks.retrieval --chunks 1000 10000 --out bench.json
+    python -m benchmarks.retrieval --chunks 100000 1000000 --no-rebuild --compare bench.json
+
+For each corpus size and backend (lexical, and sparse with a small local stand-in for the
+SPLADE model) it measures ingest throughput, cold-start load time from the snapshot and
+from SQLite alone, search latency percentiles, heap and disk bytes per chunk, and query
+throughput with concurrent searchers. Corpora mix English and Korean words so both halves
+of `TOKEN_PATTERN` are exercised. With `--compare` each metric is also reported relative to
+the same row of an earlier results file.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from orchestrator_api.rag import store as store_module
+from orchestrator_api.rag.embedder import TOKEN_PATTERN
+from orchestrator_api.rag.encoder import SparseEncoderRuntime, SparseVector
+from orchestrator_api.rag.snapshot import remove_snapshot
+from orchestrator_api.rag.store import ChunkRecord, SparseVectorStore
+
+VOCAB_SIZE = 30522
+BACKENDS = ("lexical", "sparse")
+
+ENGLISH = (
+    "ndvi nir red swir band reflectance cloud shadow mask threshold flood extent sar "
+    "backscatter glacier calving urban change detection water body extraction crop "
+    "wildfire burn scar landslide coastline erosion snow cover ice sentinel landsat "
+    "resolution orbit revisit tile mosaic atmospheric correction radiance dem slope"
+).split()
+HANGUL_FIRST, HANGUL_COUNT = 0xAC00, 11172
+
+
+class StandInEncoder(SparseEncoderRuntime):
+    """The shared encoder runtime with a deterministic SPLADE stand-in for the model.
+
+    Tokens are hashed into the vocabulary and weighted by log term frequency; everything
+    else, query caching and batching included, is the real runtime. `ready=False` makes the
+    store serve the lexical backend.
+    """
+
+    def __init__(self, ready: bool) -> None:
+        super().__init__("stand-in/hashed-tokens")
+        self.stand_in_ready = ready
+        self.state = "loading"
+        self._load()
+
+    def _load(self) -> None:
+        self.warmup_seconds = 0.0
+        if self.stand_in_ready:
+            self.tokenizer = _hashed_token_ids
+            self.state = "ready"
+        else:
+            self.error = "stand-in: lexical backend"
+            self.state = "failed"
+        self._settled.set()
+
+    def encode_documents(self, texts: list[str]) -> list[SparseVector]:
+        return self._encode_query_batch(texts)
+
+    def _encode_query_batch(self, queries: list[str]) -> list[SparseVector]:
+        vectors = []
+        for text in queries:
+            counts = Counter(_hashed_token_ids(text)["input_ids"])
+            rows = np.fromiter(sorted(counts), dtype=np.int64, count=len(counts))
+            weights = np.log1p(
+                np.asarray([counts[row] for row in rows.tolist()], dtype=np.float32)
+            )
+            vectors.append(SparseVector(rows=rows, weights=weights))
+        return vectors
+
+
+def _hashed_token_ids(text: str, add_special_tokens: bool = True) -> dict[str, list[int]]:
+    """Tokenizer of the stand-in model, called like a Hugging Face tokenizer."""
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    return {"input_ids": [zlib.crc32(token.encode()) % VOCAB_SIZE for token in tokens]}
+
+
+def vocabulary(size: int, seed: int, korean_share: float) -> list[str]:
+    """English domain words plus `size` generated words, `korean_share` of them in Hangul."""
+    rng = np.random.default_rng(seed)
+    words = list(ENGLISH)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    for _ in range(size):
+        if rng.random() < korean_share:
+            syllables = rng.integers(
+                HANGUL_FIRST, HANGUL_FIRST + HANGUL_COUNT, size=rng.integers(2, 5)
+            )
+            words.append("".join(map(chr, syllables)))
+        else:
+            words.append("".join(rng.choice(letters, size=rng.integers(3, 11))))
+    return words
+
+
+def synthetic_documents(
+    chunks: int,
+    chunks_per_doc: int,
+    words: list[str],
+    seed: int,
+) -> list[tuple[str, list[ChunkRecord]]]:
+    rng = np.random.default_rng(seed)
+    # Zipf-like word popularity, as in real text.
+    cdf = np.cumsum(1.0 / np.arange(1, len(words) + 1) ** 1.05)
+    cdf /= cdf[-1]
+    vocab = np.asarray(words, dtype=object)
+    documents = []
+    for first in range(0, chunks, chunks_per_doc):
+        doc_id = f"doc-{first // chunks_per_doc}.md"
+        count = min(chunks_per_doc, chunks - first)
+        line_counts = rng.integers(3, 8, size=count)
+        # One heading of two words, then body lines of 6 to 13 words.
+        lengths = np.concatenate(
+            [[2, *rng.integers(6, 14, size=lines)] for lines in line_counts.tolist()]
+        )
+        tokens = vocab[np.searchsorted(cdf, rng.random(int(lengths.sum())))]
+        bounds = np.concatenate([[0], np.cumsum(lengths)]).tolist()
+        lines = [" ".join(tokens[a:b]) for a, b in zip(bounds[:-1], bounds[1:], strict=True)]
+        records = []
+        position = 0
+        line = 1
+        for body in line_counts.tolist():
+            text = "# " + "\n".join(lines[position : position + body + 1])
+            position += body + 1
+            end = line + body
+            records.append(ChunkRecord(doc_id, f"{doc_id}:{line}-{end}", text, line, end))
+            line = end + 1
+        documents.append((doc_id, records))
+    return documents
+
+
+def synthetic_queries(count: int, words: list[str], seed: int) -> list[str]:
+    rng = np.random.default_rng(seed)
+    # Queries draw on the 2000 most common words, so most of them have matches.
+    pool = words[: min(len(words), 2000)]
+    return [" ".join(rng.choice(pool, size=int(rng.integers(2, 6)))) for _ in range(count)]
+
+
+def disk_bytes(root: Path) -> int:
+    return sum(path.stat().st_size for path in root.rglob("*") if path.is_file())
+
+
+def run_backend(backend: str, documents, queries: list[str], args) -> dict:
+    chunks = sum(len(records) for _, records in documents)
+    previous = store_module.sparse_encoder
+    store_module.sparse_encoder = StandInEncoder(ready=backend == "sparse")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / "bench.sqlite3"
+            store = SparseVectorStore(db_path=db_path, name="bench")
+            start = time.perf_counter()
+            for first in range(0, len(documents), args.docs_per_batch):
+                batch = documents[first : first + args.docs_per_batch]
+                store.upsert_documents([(doc_id, records, None) for doc_id, records in batch])
+            store.save_snapshot()
+            ingest = time.perf_counter() - start
+            assert store.backend_info()["backend"] == backend
+            store.unload()
+
+            cold = SparseVectorStore(db_path=db_path, name="bench")
+            start = time.perf_counter()
+            cold.count()
+            cold_snapshot = time.perf_counter() - start
+
+            tracemalloc.start()
+            measured = SparseVectorStore(db_path=db_path, name="bench")
+            measured.count()
+            heap, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            measured.unload()
+
+            cold_rebuild = None
+            if not args.no_rebuild:
+                remove_snapshot(cold._snapshot_path)
+                rebuilt = SparseVectorStore(db_path=db_path, name="bench")
+                start = time.perf_counter()
+                rebuilt.count()
+                cold_rebuild = round(time.perf_counter() - start, 3)
+                rebuilt.unload()
+
+            for query in queries[: args.warmup]:
+                cold.search(query, top_k=args.top_k)
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                cold.search(query, top_k=args.top_k)
+                latencies.append(time.perf_counter() - start)
+            lat_ms = np.asarray(latencies) * 1000
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.threads) as pool:
+                list(pool.map(lambda query: cold.search(query, top_k=args.top_k), queries))
+            concurrent = time.perf_counter() - start
+
+            return {
+                "backend": backend,
+                "chunks": chunks,
+                "ingest_seconds": round(ingest, 3),
+                "ingest_chunks_per_s": round(chunks / ingest, 1),
+                "cold_start_snapshot_s": round(cold_snapshot, 3),
+                "cold_start_rebuild_s": cold_rebuild,
+                "search_ms_p50": round(float(np.percentile(lat_ms, 50)), 3),
+                "search_ms_p95": round(float(np.percentile(lat_ms, 95)), 3),
+                "search_ms_p99": round(float(np.percentile(lat_ms, 99)), 3),
+                "search_qps_serial": round(len(queries) / float(np.sum(latencies)), 1),
+                "search_qps_concurrent": round(len(queries) / concurrent, 1),
+                "heap_bytes_per_chunk": round(heap / chunks, 1),
+                "disk_bytes_per_chunk": round(disk_bytes(Path(tmp)) / chunks, 1),
+            }
+    finally:
+        store_module.sparse_encoder = previous
+
+
+def compare(results: list[dict], baseline: list[dict]) -> list[dict]:
+    """Ratio of each numeric metric to the same (backend, chunks) row of `baseline`."""
+    rows = {(row["backend"], row["chunks"]): row for row in baseline}
+    out = []
+    for row in results:
+        before = rows.get((row["backend"], row["chunks"]))
+        if before is None:
+            continue
+        ratios = {
+            key: round(value / before[key], 3)
+            for key, value in row.items()
+            if isinstance(value, int | float)
+            and key != "chunks"
+            and isinstance(before.get(key), int | float)
+            and before[key]
+        }
+        out.append({"backend": row["backend"], "chunks": row["chunks"], **ratios})
+    return out
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--chunks-per-doc", type=int, default=20)
+    parser.add_argument("--docs-per-batch", type=int, default=50)
+    parser.add_argument("--vocab", type=int, default=20000)
+    parser.add_argument("--korean-share", type=float, default=0.4)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=9)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--no-rebuild", action="store_true", help="skip the cold rebuild")
+    parser.add_argument("--out", type=Path, help="also write the results to this file")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare with")
+    args = parser.parse_args(argv)
+
+    words = vocabulary(args.vocab, args.seed, args.korean_share)
+    queries = synthetic_queries(args.queries, words, args.seed + 1)
+    results = []
+    for chunks in args.chunks:
+        documents = synthetic_documents(chunks, args.chunks_per_doc, words, args.seed)
+        for backend in args.backends:
+            results.append(run_backend(backend, documents, queries, args))
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "args": {key: str(value) for key, value in vars(args).items()},
+        "results": results,
+    }
+    if args.compare:
+        report["relative_to_baseline"] = compare(
+            results, json.loads(args.compare.read_text())["results"]
+        )
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        args.out.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Postings touched and latency of MaxScore pruning vs. exhaustive sparse scoring.
+
+    python -m benchmarks.sparse_pruning --docs 50000 --queries 200
+
+The corpus imitates SPLADE output: token popularity is Zipf-distributed, frequent tokens
+carry small weights, and queries mix a few strong terms with many weak expansion terms.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from orchestrator_api.rag.pruning import maxscore_top_k
+from orchestrator_api.rag.sparse_index import SparseMatrixIndex, top_k_indices
+
+VOCAB_SIZE = 30522
+
+
+def synthetic_index(docs: int, terms_per_doc: int, seed: int) -> SparseMatrixIndex:
+    rng = np.random.default_rng(seed)
+    index = SparseMatrixIndex()
+    batch = 2000
+    for first in range(0, docs, batch):
+        count = min(batch, docs - first)
+        lengths = rng.integers(terms_per_doc // 2, terms_per_doc * 2, size=count)
+        doc_ids = np.repeat(np.arange(first, first + count), lengths)
+        rows = np.minimum(rng.zipf(1.15, size=len(doc_ids)), VOCAB_SIZE - 1)
+        pairs = np.unique(np.stack([rows, doc_ids], axis=1), axis=0)
+        # SPLADE learns IDF-like weights: frequent tokens get small ones.
+        idf_like = np.minimum(1.0, 0.15 * np.log2(pairs[:, 0] + 1.0))
+        weights = (rng.lognormal(-0.5, 0.5, size=len(pairs)) * idf_like).astype(np.float32)
+        index = index.append(pairs[:, 0], pairs[:, 1], weights)
+    return index
+
+
+def synthetic_queries(count: int, seed: int) -> list[tuple[np.ndarray, np.ndarray]]:
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(count):
+        strong = rng.integers(50, 3000, size=rng.integers(2, 5))
+        weak = np.minimum(rng.zipf(1.3, size=rng.integers(15, 40)), VOCAB_SIZE - 1)
+        rows, first = np.unique(np.concatenate([strong, weak]), return_index=True)
+        weights = np.where(
+            first < len(strong),
+            rng.uniform(1.0, 2.5, size=len(rows)),
+            rng.uniform(0.05, 0.4, size=len(rows)),
+        )
+        queries.append((rows, weights))
+    return queries
+
+
+def run(index, queries, docs: int, top_k: int, mode: str, factor: float) -> dict:
+    touched = total = 0
+    latencies = []
+    results = []
+    for rows, weights in queries:
+        start = time.perf_counter()
+        if mode == "off":
+            scores = index.matvec(rows, weights, docs)
+            top = top_k_indices(scores, top_k)
+            _, row_nnz = index.row_stats(rows)
+            touched += int(row_nnz.sum())
+            total += int(row_nnz.sum())
+        else:
+            pruned = maxscore_top_k(
+                index,
+                rows,
+                weights,
+                docs,
+                top_k,
+                factor=factor if mode == "approx" else 1.0,
+            )
+            candidates = np.flatnonzero(pruned.alive)
+            top = candidates[top_k_indices(pruned.scores[candidates], top_k)]
+            touched += pruned.postings_touched
+            total += pruned.postings_total
+        latencies.append(time.perf_counter() - start)
+        results.append(top)
+    lat_ms = np.asarray(latencies) * 1000
+    return {
+        "postings_touched_per_query": round(touched / len(queries), 1),
+        "touched_ratio": round(touched / total, 4) if total else 0.0,
+        "query_ms_mean": round(float(lat_ms.mean()), 3),
+        "query_ms_p95": round(float(np.percentile(lat_ms, 95)), 3),
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--terms-per-doc", type=int, default=120)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=9)
+    parser.add_argument("--factor", type=float, default=1.2)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    index = synthetic_index(args.docs, args.terms_per_doc, args.seed)
+    queries = synthetic_queries(args.queries, args.seed + 1)
+    modes = {
+        mode: run(index, queries, args.docs, args.top_k, mode, args.factor)
+        for mode in ("off", "exact", "approx")
+    }
+    exhaustive = modes["off"].pop("results")
+    for mode in ("exact", "approx"):
+        found = modes[mode].pop("results")
+        overlap = [len(set(a) & set(b)) / max(1, len(a)) for a, b in zip(exhaustive, found)]
+        modes[mode]["recall_at_k"] = round(float(np.mean(overlap)), 4)
+    print(json.dumps({"docs": args.docs, "postings": index.nnz, "modes": modes}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Write/read benchmark for the SQLite storage layer against the previous layout.
+
+    python -m benchmarks.sqlite_storage --docs 5000 --batch 256
+"""
+
+import argparse
+import json
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from orchestrator_api.rag.sqlite_storage import SQLiteStorage
+
+VOCAB_SIZE = 30522
+
+
+def synthetic_postings(docs: int, terms_per_doc: int, seed: int) -> list[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(docs):
+        # Zipf-like token popularity, as in real SPLADE expansions.
+        tokens = np.unique(np.minimum(rng.zipf(1.3, terms_per_doc), VOCAB_SIZE - 1))
+        out.append(tokens)
+    return out
+
+
+def bench_legacy(path: Path, postings: list[np.ndarray], lookups: np.ndarray) -> dict:
+    """Heap table + token index, default pragmas, one connection and commit per document."""
+
+    def connect() -> sqlite3.Connection:
+        return sqlite3.connect(path)
+
+    with connect() as conn:
+        conn.execute(
+            "CREATE TABLE postings (token_id INTEGER NOT NULL, doc_idx INTEGER NOT NULL, "
+            "weight REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX idx_postings_token ON postings(token_id)")
+
+    start = time.perf_counter()
+    for doc_idx, tokens in enumerate(postings):
+        with connect() as conn:
+            conn.executemany(
+                "INSERT INTO postings(token_id, doc_idx, weight) VALUES(?, ?, ?)",
+                [(int(token), doc_idx, 1.0) for token in tokens],
+            )
+            conn.commit()
+    write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with connect() as conn:
+        conn.execute("SELECT token_id, doc_idx, weight FROM postings").fetchall()
+    full_read = time.perf_counter() - start
+
+    latencies = []
+    for token in lookups:
+        start = time.perf_counter()
+        with connect() as conn:
+            conn.execute(
+                "SELECT doc_idx, weight FROM postings WHERE token_id = ?", (int(token),)
+            ).fetchall()
+        latencies.append(time.perf_counter() - start)
+    return _result(write, full_read, latencies, postings)
+
+
+def bench_storage(
+    path: Path,
+    postings: list[np.ndarray],
+    lookups: np.ndarray,
+    batch: int,
+) -> dict:
+    storage = SQLiteStorage(path)
+
+    start = time.perf_counter()
+    for first in range(0, len(postings), batch):
+        rows = [
+            (int(token), doc_idx, 1.0)
+            for doc_idx in range(first, min(first + batch, len(postings)))
+            for token in postings[doc_idx]
+        ]
+        rows.sort()
+        with storage.transaction() as conn:
+            storage.insert_postings(conn, rows)
+    write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    storage.load_postings()
+    full_read = time.perf_counter() - start
+
+    reader = sqlite3.connect(path)
+    latencies = []
+    for token in lookups:
+        start = time.perf_counter()
+        reader.execute(
+            "SELECT doc_idx, weight FROM postings WHERE token_id = ?", (int(token),)
+        ).fetchall()
+        latencies.append(time.perf_counter() - start)
+    reader.close()
+    storage.close()
+    return _result(write, full_read, latencies, postings)
+
+
+def _result(write: float, full_read: float, latencies: list[float], postings) -> dict:
+    nnz = sum(len(tokens) for tokens in postings)
+    lat_ms = np.asarray(latencies) * 1000
+    return {
+        "write_seconds": round(write, 3),
+        "write_postings_per_s": round(nnz / write, 1),
+        "full_read_seconds": round(full_read, 3),
+        "token_read_ms_mean": round(float(lat_ms.mean()), 3),
+        "token_read_ms_p95": round(float(np.percentile(lat_ms, 95)), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--terms-per-doc", type=int, default=150)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    postings = synthetic_postings(args.docs, args.terms_per_doc, args.seed)
+    popular = np.concatenate(postings)
+    lookups = np.random.default_rng(args.seed).choice(popular, size=args.lookups)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            "docs": args.docs,
+            "postings": int(len(popular)),
+            "legacy": bench_legacy(Path(tmp) / "legacy.sqlite3", postings, lookups),
+            "storage": bench_storage(Path(tmp) / "storage.sqlite3", postings, lookups, args.batch),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
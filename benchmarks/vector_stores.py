@@ -0,0 +1,103 @@
+"""Ingest and query benchmark across store backends on one synthetic corpus.
+
+    python -m benchmarks.vector_stores --chunks 5000 --backends sqlite chroma
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from orchestrator_api.rag.chroma_store import ChromaVectorStore
+from orchestrator_api.rag.store import ChunkRecord, SparseVectorStore
+from orchestrator_api.rag.vector_store import STORE_BACKENDS, VectorStore
+
+WORDS = (
+    "ndvi nir red swir band reflectance cloud shadow mask threshold flood extent sar "
+    "backscatter glacier calving urban change detection water body extraction crop "
+    "wildfire burn scar landslide coastline erosion snow cover ice sentinel landsat "
+    "resolution orbit revisit tile mosaic atmospheric correction radiance dem slope"
+).split()
+
+
+def synthetic_corpus(chunks: int, docs: int, seed: int) -> list[tuple[str, list[ChunkRecord]]]:
+    rng = np.random.default_rng(seed)
+    per_doc = max(1, chunks // docs)
+    corpus = []
+    for doc in range(docs):
+        doc_id = f"doc{doc}"
+        records = []
+        for line in range(per_doc):
+            text = " ".join(rng.choice(WORDS, size=int(rng.integers(20, 60))))
+            chunk_id = f"{doc_id}:{line + 1}-{line + 1}"
+            records.append(ChunkRecord(doc_id, chunk_id, text, line + 1, line + 1))
+        corpus.append((doc_id, records))
+    return corpus
+
+
+def make_store(backend: str, root: Path) -> VectorStore:
+    if backend == "chroma":
+        return ChromaVectorStore(path=root / "bench.chroma", name="bench")
+    return SparseVectorStore(db_path=root / "bench.sqlite3", name="bench")
+
+
+def run_backend(backend: str, corpus, queries: list[str], top_k: int, batch: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = make_store(backend, Path(tmp))
+        start = time.perf_counter()
+        for first in range(0, len(corpus), batch):
+            store.upsert_documents(
+                [(doc_id, records, None) for doc_id, records in corpus[first : first + batch]]
+            )
+        store.save_snapshot()
+        ingest = time.perf_counter() - start
+
+        store.search(queries[0], top_k=top_k)
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            store.search(query, top_k=top_k)
+            latencies.append(time.perf_counter() - start)
+        lat_ms = np.asarray(latencies) * 1000
+        return {
+            "features": store.backend_info().get("features") or store.backend_info()["backend"],
+            "count": store.count(),
+            "ingest_seconds": round(ingest, 3),
+            "chunks_per_s": round(store.count() / ingest, 1),
+            "query_ms_mean": round(float(lat_ms.mean()), 3),
+            "query_ms_p95": round(float(np.percentile(lat_ms, 95)), 3),
+            "qps": round(len(queries) / float(np.sum(latencies)), 1),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=9)
+    parser.add_argument("--batch", type=int, default=16, help="documents per upsert")
+    parser.add_argument("--backends", nargs="+", choices=STORE_BACKENDS, default=STORE_BACKENDS)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.chunks, args.docs, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = [" ".join(rng.choice(WORDS, size=3)) for _ in range(args.queries)]
+
+    results = {"chunks": sum(len(records) for _, records in corpus), "backends": {}}
+    for backend in args.backends:
+        try:
+            results["backends"][backend] = run_backend(
+                backend, corpus, queries, args.top_k, args.batch
+            )
+        except ImportError as exc:
+            results["backends"][backend] = {"error": str(exc)}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,9 +12,22 @@ class Settings:
     mcp_base_url: str = os.getenv("MCP_BASE_URL", "http://127.0.0.1:8100")
     rag_index_name: str = os.getenv("RAG_INDEX_NAME", "default")
     rag_store_db_path: str = os.getenv("RAG_STORE_DB_PATH", "data/vector_store/rag_store.sqlite3")
+    rag_store_backend: str = os.getenv("RAG_STORE_BACKEND", "sqlite").lower()
+    rag_chroma_dim: int = int(os.getenv("RAG_CHROMA_DIM", "1024"))
     rag_min_score: float = float(os.getenv("RAG_MIN_SCORE", "0.05"))
     rag_sparse_model: str = os.getenv("RAG_SPARSE_MODEL", "telepix/PIXIE-Splade-v1.0")
     rag_sparse_min_weight: float = float(os.getenv("RAG_SPARSE_MIN_WEIGHT", "0.01"))
+    rag_sparse_inference: str = os.getenv("RAG_SPARSE_INFERENCE", "torch").lower()
+    # Empty: the ONNX file of the model repo, exported on first load if there is none.
+    rag_sparse_onnx_file: str = os.getenv("RAG_SPARSE_ONNX_FILE", "")
+    rag_sparse_threads: int = int(os.getenv("RAG_SPARSE_THREADS", "0"))
+    rag_query_encoding: str = os.getenv("RAG_QUERY_ENCODING", "model").lower()
+    rag_query_encoding_max_pending: int = int(os.getenv("RAG_QUERY_ENCODING_MAX_PENDING", "16"))
+    # Empty: inference-free queries are weighted by IDF over the index postings.
+    rag_query_tables_path: str = os.getenv("RAG_QUERY_TABLES_PATH", "")
+    rag_posting_weights: str = os.getenv("RAG_POSTING_WEIGHTS", "float16").lower()
+    rag_sparse_pruning: str = os.getenv("RAG_SPARSE_PRUNING", "off").lower()
+    rag_sparse_pruning_factor: float = float(os.getenv("RAG_SPARSE_PRUNING_FACTOR", "1.2"))
     llm_api_key: str = os.getenv("LLM_API_KEY", "")
     llm_model: str = os.getenv("LLM_MODEL", "gpt-4o-mini")
     llm_base_url: str = os.getenv("LLM_BASE_URL", "https://api.openai.com/v1")
@@ -28,6 +41,33 @@ class Settings:
     rag_bm25_k1: float = float(os.getenv("RAG_BM25_K1", "1.2"))
     rag_bm25_b: float = float(os.getenv("RAG_BM25_B", "0.75"))
     rag_rerank_heading_boost: float = float(os.getenv("RAG_RERANK_HEADING_BOOST", "0.15"))
+    rag_query_cache_size: int = int(os.getenv("RAG_QUERY_CACHE_SIZE", "1024"))
+    rag_result_cache_size: int = int(os.getenv("RAG_RESULT_CACHE_SIZE", "256"))
+    rag_result_cache_ttl_seconds: float = float(
+        os.getenv("RAG_RESULT_CACHE_TTL_SECONDS", "300")
+    )
+    rag_query_batch_max_size: int = int(os.getenv("RAG_QUERY_BATCH_MAX_SIZE", "16"))
+    rag_query_batch_max_wait_ms: float = float(os.getenv("RAG_QUERY_BATCH_MAX_WAIT_MS", "3"))
+    rag_search_workers: int = int(os.getenv("RAG_SEARCH_WORKERS", str(os.cpu_count() or 4)))
+    rag_max_resident_indexes: int = int(os.getenv("RAG_MAX_RESIDENT_INDEXES", "4"))
+    rag_chunk_unit: str = os.getenv("RAG_CHUNK_UNIT", "chars").lower()
+    # 0: the sparse model's max sequence length.
+    rag_chunk_max_tokens: int = int(os.getenv("RAG_CHUNK_MAX_TOKENS", "0"))
+    rag_chunk_overlap_tokens: int = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", "32"))
+    rag_encode_batch_size: int = int(os.getenv("RAG_ENCODE_BATCH_SIZE", "32"))
+    # Comma-separated batch sizes timed at warm-up; empty keeps RAG_ENCODE_BATCH_SIZE.
+    rag_encode_batch_autotune: str = os.getenv("RAG_ENCODE_BATCH_AUTOTUNE", "")
+    rag_ingest_workers: int = int(os.getenv("RAG_INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+    rag_ingest_queue_size: int = int(os.getenv("RAG_INGEST_QUEUE_SIZE", "8"))
+    rag_ingest_stream_bytes: int = int(os.getenv("RAG_INGEST_STREAM_BYTES", str(8 << 20)))
+    rag_pdf_pages_per_task: int = int(os.getenv("RAG_PDF_PAGES_PER_TASK", "16"))
+    # Empty: a `parsed_text` directory next to RAG_STORE_DB_PATH.
+    rag_parsed_text_dir: str = os.getenv("RAG_PARSED_TEXT_DIR", "")
+    rag_parsed_text_cache_mb: int = int(os.getenv("RAG_PARSED_TEXT_CACHE_MB", "1024"))
+    rag_ingest_max_jobs: int = int(os.getenv("RAG_INGEST_MAX_JOBS", "2"))
+    rag_compaction_tombstone_ratio: float = float(
+        os.getenv("RAG_COMPACTION_TOMBSTONE_RATIO", "0.2")
+    )
 
 settings = Settings()
 
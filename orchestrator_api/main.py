@@ -1,6 +1,7 @@
 import json
 from contextlib import asynccontextmanager
 from pathlib import Path
+from threading import Thread
 from uuid import uuid4
 
 from fastapi import Depends, FastAPI, File, HTTPException, UploadFile
@@ -14,8 +15,12 @@ from orchestrator_api.observability import (
     configure_logging,
     metrics_registry,
 )
-from orchestrator_api.rag.ingest import ingest_documents
-from orchestrator_api.rag.store import store
+from orchestrator_api.rag.encoder import sparse_encoder
+from orchestrator_api.rag.indexes import UnknownIndexError, indexes
+from orchestrator_api.rag.ingest import ingest_documents, ingest_with_report, sync_documents
+from orchestrator_api.rag.jobs import IngestJob, ingest_jobs
+from orchestrator_api.rag.pipeline import parsed_text_cache
+from orchestrator_api.rag.retrieve import result_cache
 from orchestrator_api.schemas import ChatRequest, ChatResponse, IngestRequest, IngestResponse
 from orchestrator_api.security import require_verified_user
 from orchestrator_api.services.chat_service import run_chat, run_chat_stream
@@ -29,27 +34,34 @@ UPLOADS_DIR = IMAGERY_DIR / "uploads"
 UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 
 def startup_ingest_docs() -> None:
-    if store.count() > 0:
+    # The stored index may be reset if the encoder differs from the one that built it.
+    sparse_encoder.wait_ready()
+    if indexes.get().count() > 0:
         return
 
-    if not DOCS_DIR.exists():
+    docs = _list_docs()
+    if not docs:
         return
 
-    docs = sorted(
+    ingest_documents(docs)
+
+
+def _list_docs() -> list[str]:
+    if not DOCS_DIR.exists():
+        return []
+    return sorted(
         str(path)
         for path in DOCS_DIR.iterdir()
         if path.is_file() and path.suffix.lower() in {".md", ".txt", ".pdf", ".html", ".htm"}
     )
-    if not docs:
-        return
-
-    ingest_documents(docs)
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     configure_logging()
-    startup_ingest_docs()
+    # Load the SPLADE model off the request path; search is served lexically until it is ready.
+    sparse_encoder.start_warmup()
+    Thread(target=startup_ingest_docs, name="rag-startup-ingest", daemon=True).start()
     yield
 
 
@@ -61,18 +73,45 @@ app.mount("/imagery", StaticFiles(directory=IMAGERY_DIR), name="imagery")
 
 
 @app.get("/health")
-def health() -> dict[str, str]:
-    return {"status": "ok", "mcp_base_url": settings.mcp_base_url}
+def health() -> dict:
+    return {
+        "status": "ok",
+        "mcp_base_url": settings.mcp_base_url,
+        "rag_encoder": sparse_encoder.info(),
+        "rag_indexes": indexes.info(),
+        "rag_result_cache": result_cache.stats(),
+        "rag_parsed_text_cache": parsed_text_cache.stats(),
+    }
 
 
 @app.get("/metrics")
 def metrics() -> PlainTextResponse:
     if not settings.enable_metrics:
         return PlainTextResponse("metrics disabled\n", status_code=404)
-    body = metrics_registry.render_prometheus()
+    body = metrics_registry.render_prometheus() + _render_cache_metrics()
     return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
 
 
+def _render_cache_metrics() -> str:
+    stats = result_cache.stats()
+    text_stats = parsed_text_cache.stats()
+    lines = [
+        "# TYPE rag_result_cache_hits_total counter",
+        f"rag_result_cache_hits_total {stats['hits']}",
+        "# TYPE rag_result_cache_misses_total counter",
+        f"rag_result_cache_misses_total {stats['misses']}",
+        "# TYPE rag_result_cache_expired_total counter",
+        f"rag_result_cache_expired_total {stats['expired']}",
+        "# TYPE rag_result_cache_size gauge",
+        f"rag_result_cache_size {stats['size']}",
+        "# TYPE rag_parsed_text_cache_hits_total counter",
+        f"rag_parsed_text_cache_hits_total {text_stats['hits']}",
+        "# TYPE rag_parsed_text_cache_misses_total counter",
+        f"rag_parsed_text_cache_misses_total {text_stats['misses']}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
 @app.get("/", include_in_schema=False)
 def index_page() -> FileResponse:
     return FileResponse(FRONTEND_DIR / "index.html")
@@ -116,44 +155,122 @@ def ingest(
     request: IngestRequest,
     _: str | None = Depends(require_verified_user),
 ) -> IngestResponse:
-    ingested_count, failed = ingest_documents(
+    store = _resolve_index(request.index_name)
+    report = ingest_with_report(
         request.documents,
         chunk_size=request.chunk_size,
         overlap=request.overlap,
+        index_name=store.name,
+    )
+    return IngestResponse(
+        ingested_count=len(report.ingested),
+        failed=report.failures,
+        index_name=store.name,
+        throughput=report.throughput(),
     )
-    return IngestResponse(ingested_count=ingested_count, failed=failed)
 
 
 @app.post("/reindex-docs")
-def reindex_docs(_: str | None = Depends(require_verified_user)) -> dict:
-    if not DOCS_DIR.exists():
-        return {
-            "ingested_count": 0,
-            "failed": [],
-            "store_count": store.count(),
-            "backend": store.backend_info(),
-        }
-
-    docs = sorted(
-        str(path)
-        for path in DOCS_DIR.iterdir()
-        if path.is_file() and path.suffix.lower() in {".md", ".txt", ".pdf", ".html", ".htm"}
-    )
-    store.clear(delete_disk=True)
-    ingested_count, failed = ingest_documents(docs)
+def reindex_docs(
+    index_name: str | None = None,
+    full: bool = False,
+    _: str | None = Depends(require_verified_user),
+) -> dict:
+    store = _resolve_index(index_name)
+    if full:
+        store.clear(delete_disk=True)
+    report = sync_documents(_list_docs(), root=str(DOCS_DIR), index_name=store.name)
     return {
-        "ingested_count": ingested_count,
-        "failed": failed,
+        "ingested_count": len(report["updated"]),
+        **report,
         "store_count": store.count(),
         "backend": store.backend_info(),
     }
 
 
+@app.post("/ingest/jobs", status_code=202)
+def submit_ingest_job(
+    request: IngestRequest,
+    _: str | None = Depends(require_verified_user),
+) -> dict:
+    store = _resolve_index(request.index_name)
+
+    def run(job: IngestJob) -> dict:
+        report = ingest_with_report(
+            request.documents,
+            chunk_size=request.chunk_size,
+            overlap=request.overlap,
+            index_name=store.name,
+            on_progress=job.update,
+            cancel=job.cancel,
+        )
+        return {"ingested_count": len(report.ingested), "throughput": report.throughput()}
+
+    job = ingest_jobs.submit("ingest", store.name, run, files_total=len(request.documents))
+    return job.to_dict()
+
+
+@app.post("/reindex-docs/jobs", status_code=202)
+def submit_reindex_job(
+    index_name: str | None = None,
+    full: bool = False,
+    _: str | None = Depends(require_verified_user),
+) -> dict:
+    store = _resolve_index(index_name)
+
+    def run(job: IngestJob) -> dict:
+        if full:
+            store.clear(delete_disk=True)
+        report = sync_documents(
+            _list_docs(),
+            root=str(DOCS_DIR),
+            index_name=store.name,
+            on_progress=job.update,
+            cancel=job.cancel,
+        )
+        return {key: value for key, value in report.items() if key != "failed"}
+
+    job = ingest_jobs.submit("reindex", store.name, run)
+    return job.to_dict()
+
+
+@app.get("/ingest/jobs")
+def list_ingest_jobs(_: str | None = Depends(require_verified_user)) -> list[dict]:
+    return [job.to_dict() for job in ingest_jobs.recent()]
+
+
+@app.get("/ingest/jobs/{job_id}")
+def get_ingest_job(job_id: str, _: str | None = Depends(require_verified_user)) -> dict:
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingest job")
+    return job.to_dict()
+
+
+@app.post("/ingest/jobs/{job_id}/cancel")
+def cancel_ingest_job(job_id: str, _: str | None = Depends(require_verified_user)) -> dict:
+    job = ingest_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingest job")
+    return job.to_dict()
+
+
+def _resolve_index(index_name: str | None, create: bool = True):
+    """The named index; only ingest and reindex endpoints may create one."""
+    try:
+        return indexes.get(index_name, create=create)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except UnknownIndexError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
     _: str | None = Depends(require_verified_user),
 ) -> ChatResponse:
+    _resolve_index(request.index_name, create=False)
     return await run_chat(request)
 
 
@@ -162,6 +279,8 @@ async def chat_stream(
     request: ChatRequest,
     _: str | None = Depends(require_verified_user),
 ) -> StreamingResponse:
+    _resolve_index(request.index_name, create=False)
+
     async def event_generator():
         async for event in run_chat_stream(request):
             yield json.dumps(event, ensure_ascii=False) + "\n"
@@ -0,0 +1,347 @@
+import zlib
+from pathlib import Path
+from threading import Lock
+
+import numpy as np
+
+from orchestrator_api.config import settings
+from orchestrator_api.rag.embedder import cosine_similarity, embed_text
+from orchestrator_api.rag.encoder import SparseVector, sparse_encoder
+from orchestrator_api.rag.line_terms import build_line_terms
+from orchestrator_api.rag.store import ChunkRecord, SourceState
+
+COLLECTION_NAME = "chunks"
+_SOURCE_KEYS = ("content_hash", "mtime", "size")
+
+
+class ChromaVectorStore:
+    """Store backend on a persistent chromadb collection, one directory per index.
+
+    Chroma indexes dense vectors, so SPLADE weights (or lexical term counts while the
+    encoder is unavailable) are folded into `RAG_CHROMA_DIM` dimensions by signed feature
+    hashing and searched by cosine similarity. Which of the two a collection holds is
+    fixed when it is created. Until the encoder is ready, a SPLADE collection is searched by
+    a lexical scan of its chunk texts, as the SQLite store serves lexically during warm-up.
+    There is no BM25 blend or heading rerank on this backend.
+    """
+
+    def __init__(self, path: str | Path, name: str | None = None) -> None:
+        self.name = name or settings.rag_index_name
+        self.dim = max(8, settings.rag_chroma_dim)
+        self._path = Path(path)
+        self._collection = None
+        self._features: str | None = None
+        self._generation = 0
+        self._lock = Lock()
+
+    def add(
+        self,
+        chunks: list[ChunkRecord],
+        vectors: list[SparseVector] | None = None,
+    ) -> None:
+        if not chunks:
+            return
+        with self._lock:
+            collection = self._collection_locked(create=True)
+            existing = set(collection.get(ids=[chunk.chunk_id for chunk in chunks])["ids"])
+            kept = [i for i, chunk in enumerate(chunks) if chunk.chunk_id not in existing]
+            if kept:
+                self._insert_locked(
+                    [chunks[i] for i in kept],
+                    {},
+                    [vectors[i] for i in kept] if vectors is not None else None,
+                )
+                self._generation += 1
+
+    def upsert_document(
+        self,
+        doc_id: str,
+        chunks: list[ChunkRecord],
+        source: SourceState | None = None,
+    ) -> None:
+        self.upsert_documents([(doc_id, chunks, source)])
+
+    def upsert_documents(
+        self,
+        documents: list[tuple[str, list[ChunkRecord], SourceState | None]],
+        vectors: list[SparseVector] | None = None,
+    ) -> None:
+        for doc_id, chunks, _ in documents:
+            if any(chunk.doc_id != doc_id for chunk in chunks):
+                raise ValueError(f"chunks must all belong to document {doc_id!r}")
+        if len({doc_id for doc_id, _, _ in documents}) != len(documents):
+            raise ValueError("each document may only appear once per upsert")
+
+        with self._lock:
+            collection = self._collection_locked(create=True)
+            doc_ids = [doc_id for doc_id, _, _ in documents]
+            # Chroma has no transactions: a failure between delete and insert loses the doc,
+            # which the next incremental reindex re-ingests.
+            collection.delete(where={"doc_id": {"$in": doc_ids}})
+            chunks = [chunk for _, doc_chunks, _ in documents for chunk in doc_chunks]
+            sources = {doc_id: source for doc_id, _, source in documents if source}
+            if chunks:
+                self._insert_locked(chunks, sources, vectors)
+            self._generation += 1
+
+    def delete_document(self, doc_id: str) -> int:
+        with self._lock:
+            collection = self._collection_locked()
+            if collection is None:
+                return 0
+            ids = collection.get(where={"doc_id": doc_id})["ids"]
+            if ids:
+                collection.delete(ids=ids)
+                self._generation += 1
+            return len(ids)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 3,
+        min_score: float = 0.0,
+        query_encoding: str | None = None,
+    ) -> list[tuple[ChunkRecord, float]]:
+        if not query.strip() or top_k <= 0:
+            return []
+        with self._lock:
+            collection = self._collection_locked()
+            features = self._features
+        if collection is None:
+            return []
+        total = collection.count()
+        if total == 0:
+            return []
+        if features == "sparse" and not sparse_encoder.ready:
+            return self._lexical_scan(collection, query, top_k, min_score)
+
+        embedding = self._embed_query(query, features, query_encoding)
+        result = collection.query(
+            query_embeddings=[embedding],
+            n_results=min(top_k, total),
+            include=["documents", "metadatas", "distances"],
+        )
+        hits: list[tuple[ChunkRecord, float]] = []
+        for chunk_id, text, meta, distance in zip(
+            result["ids"][0],
+            result["documents"][0],
+            result["metadatas"][0],
+            result["distances"][0],
+            strict=True,
+        ):
+            score = 1.0 - float(distance)
+            # Like the SQLite store, only chunks sharing a feature with the query count.
+            if not score > 0 or score < min_score:
+                continue
+            hits.append((_chunk_record(chunk_id, text, meta), score))
+        return hits
+
+    def _lexical_scan(
+        self, collection, query: str, top_k: int, min_score: float
+    ) -> list[tuple[ChunkRecord, float]]:
+        """Term-count cosine over every stored chunk; only used while the encoder warms up."""
+        query_tf = embed_text(query)
+        found = collection.get(include=["documents", "metadatas"])
+        scored = []
+        for chunk_id, text, meta in zip(
+            found["ids"], found["documents"], found["metadatas"], strict=True
+        ):
+            score = cosine_similarity(query_tf, embed_text(text))
+            if score > 0 and score >= min_score:
+                scored.append((score, chunk_id, text, meta))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [
+            (_chunk_record(chunk_id, text, meta), score)
+            for score, chunk_id, text, meta in scored[:top_k]
+        ]
+
+    def count(self) -> int:
+        with self._lock:
+            collection = self._collection_locked()
+        return collection.count() if collection is not None else 0
+
+    def clear(self, delete_disk: bool = True) -> None:  # noqa: ARG002
+        # Deleting the collection drops its data; the client keeps the directory open.
+        with self._lock:
+            if self._path.exists():
+                client = self._client()
+                if COLLECTION_NAME in _collection_names(client):
+                    client.delete_collection(COLLECTION_NAME)
+            self._collection = None
+            self._features = None
+            self._generation += 1
+
+    def save_snapshot(self) -> None:
+        """Chroma persists every write; nothing to snapshot."""
+
+    def unload(self) -> None:
+        with self._lock:
+            self._collection = None
+            self._features = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._collection is not None
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def source_states(self) -> dict[str, SourceState]:
+        with self._lock:
+            collection = self._collection_locked()
+            if collection is None:
+                return {}
+            metadatas = collection.get(include=["metadatas"])["metadatas"]
+        return {
+            meta["doc_id"]: SourceState(*(meta[key] for key in _SOURCE_KEYS))
+            for meta in metadatas
+            if "content_hash" in meta
+        }
+
+    def record_source(self, doc_id: str, source: SourceState) -> None:
+        with self._lock:
+            collection = self._collection_locked()
+            if collection is None:
+                return
+            found = collection.get(where={"doc_id": doc_id}, include=["metadatas"])
+            if found["ids"]:
+                collection.update(
+                    ids=found["ids"],
+                    metadatas=[{**meta, **source._asdict()} for meta in found["metadatas"]],
+                )
+
+    def backend_info(self) -> dict[str, str | float | None]:
+        error = sparse_encoder.error
+        if self._features == "sparse" and sparse_encoder.settled and not sparse_encoder.ready:
+            error = "collection holds SPLADE vectors but the encoder is unavailable"
+        return {
+            "backend": "chroma",
+            "features": self._features,
+            "index_name": self.name,
+            "error": error,
+            "model": settings.rag_sparse_model,
+            "db_path": str(self._path),
+            "warmup_state": sparse_encoder.state,
+            "warmup_seconds": sparse_encoder.warmup_seconds,
+        }
+
+    def _client(self):
+        import chromadb
+
+        self._path.mkdir(parents=True, exist_ok=True)
+        return chromadb.PersistentClient(path=str(self._path))
+
+    def _collection_locked(self, create: bool = False):
+        """The open collection, or `None` if none exists yet and `create` is false.
+
+        Only writers create it: picking its features waits for the encoder to settle, which
+        a search or count during warm-up must not do.
+        """
+        if self._collection is not None:
+            return self._collection
+        if not create and not self._path.exists():
+            return None
+        client = self._client()
+        if COLLECTION_NAME in _collection_names(client):
+            collection = client.get_collection(COLLECTION_NAME, embedding_function=None)
+        elif not create:
+            return None
+        else:
+            # A new collection is hashed from SPLADE once the encoder comes up, else lexically.
+            features = "sparse" if sparse_encoder.wait_ready() else "lexical"
+            collection = client.create_collection(
+                COLLECTION_NAME,
+                metadata={"hnsw:space": "cosine", "features": features, "dim": self.dim},
+                embedding_function=None,
+            )
+        meta = collection.metadata or {}
+        self._features = meta.get("features", "lexical")
+        self.dim = int(meta.get("dim", self.dim))
+        self._collection = collection
+        return collection
+
+    def _insert_locked(
+        self,
+        chunks: list[ChunkRecord],
+        sources: dict[str, SourceState],
+        vectors: list[SparseVector] | None,
+    ) -> None:
+        texts = [chunk.text for chunk in chunks]
+        if self._features == "sparse":
+            vectors = vectors or sparse_encoder.encode_documents(texts)
+            embeddings = [self._project_sparse(vec) for vec in vectors]
+        else:
+            embeddings = [self._project_terms(text) for text in texts]
+        metadatas = []
+        for chunk in chunks:
+            meta = {
+                "doc_id": chunk.doc_id,
+                "line_start": chunk.line_start,
+                "line_end": chunk.line_end,
+                "line_terms": chunk.line_terms or build_line_terms(chunk.text),
+            }
+            if chunk.doc_id in sources:
+                meta.update(sources[chunk.doc_id]._asdict())
+            metadatas.append(meta)
+        self._collection.upsert(
+            ids=[chunk.chunk_id for chunk in chunks],
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=metadatas,
+        )
+
+    def _embed_query(
+        self,
+        query: str,
+        features: str | None,
+        query_encoding: str | None = None,
+    ) -> list[float]:
+        if features != "sparse":
+            return self._project_terms(query)
+        if sparse_encoder.resolve_query_encoding(query_encoding) == "inference_free":
+            # There are no postings to take IDF from, so without query tables tokens weigh 1.
+            return self._project_sparse(sparse_encoder.encode_query_inference_free(query))
+        return self._project_sparse(sparse_encoder.encode_query(query))
+
+    def _project_sparse(self, vec: SparseVector) -> list[float]:
+        keys = (vec.rows.astype(np.uint64) * np.uint64(2654435761)) & np.uint64(0xFFFFFFFF)
+        return _hashed_embedding(keys, vec.weights, self.dim)
+
+    def _project_terms(self, text: str) -> list[float]:
+        counts = embed_text(text)
+        keys = np.fromiter(
+            (zlib.crc32(term.encode("utf-8")) for term in counts),
+            dtype=np.uint64,
+            count=len(counts),
+        )
+        weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        return _hashed_embedding(keys, weights, self.dim)
+
+
+def _hashed_embedding(keys: np.ndarray, weights: np.ndarray, dim: int) -> list[float]:
+    # The top hash bit picks the sign so colliding features cancel out on average.
+    buckets = (keys % np.uint64(dim)).astype(np.int64)
+    signs = np.where((keys >> np.uint64(31)) & np.uint64(1), -1.0, 1.0)
+    embedding = np.zeros(dim, dtype=np.float64)
+    np.add.at(embedding, buckets, signs * weights)
+    norm = float(np.linalg.norm(embedding))
+    if norm > 0:
+        embedding /= norm
+    return embedding.tolist()
+
+
+def _chunk_record(chunk_id: str, text: str, meta: dict) -> ChunkRecord:
+    return ChunkRecord(
+        doc_id=meta["doc_id"],
+        chunk_id=chunk_id,
+        text=text,
+        line_start=int(meta["line_start"]),
+        line_end=int(meta["line_end"]),
+        line_terms=meta.get("line_terms"),
+    )
+
+
+def _collection_names(client) -> set[str]:
+    # chromadb < 0.6 returns Collection objects, newer releases return names.
+    return {getattr(item, "name", item) for item in client.list_collections()}
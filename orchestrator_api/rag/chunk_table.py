@@ -0,0 +1,103 @@
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Doc code of indices whose chunk was never stored (holes left by deletes on disk).
+NO_DOC = -1
+
+
+def _empty_column() -> np.ndarray:
+    return np.zeros(0, dtype=np.int32)
+
+
+@dataclass(frozen=True)
+class ChunkTable:
+    """Chunk metadata by doc index, one column per field; the text stays in SQLite.
+
+    `chunk_ids` and `doc_names` are shared append-only lists: a table only looks at its
+    first `len(self)` chunk ids, and a doc code never changes meaning. Line ranges and
+    doc codes are int32 arrays, replaced rather than mutated on append.
+    """
+
+    chunk_ids: list[str] = field(default_factory=list)
+    doc_names: list[str] = field(default_factory=list)
+    doc_codes: dict[str, int] = field(default_factory=dict)
+    docs: np.ndarray = field(default_factory=_empty_column)
+    line_starts: np.ndarray = field(default_factory=_empty_column)
+    line_ends: np.ndarray = field(default_factory=_empty_column)
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    @property
+    def nbytes(self) -> int:
+        return self.docs.nbytes + self.line_starts.nbytes + self.line_ends.nbytes
+
+    def doc_id(self, doc_index: int) -> str:
+        code = int(self.docs[doc_index])
+        return self.doc_names[code] if code != NO_DOC else ""
+
+    def chunk_id(self, doc_index: int) -> str:
+        return self.chunk_ids[doc_index]
+
+    def row(self, doc_index: int) -> tuple[str, str, int, int]:
+        """`(doc_id, chunk_id, line_start, line_end)` of one doc index."""
+        return (
+            self.doc_id(doc_index),
+            self.chunk_ids[doc_index],
+            int(self.line_starts[doc_index]),
+            int(self.line_ends[doc_index]),
+        )
+
+    def append(self, rows: Iterable[tuple[str, str, int, int]]) -> "ChunkTable":
+        """Table with `(doc_id, chunk_id, line_start, line_end)` rows added at the end."""
+        first = len(self)
+        indexed = [(first + offset, *row) for offset, row in enumerate(rows)]
+        return self.extend_at(first + len(indexed), indexed)
+
+    def extend_at(
+        self,
+        size: int,
+        rows: Iterable[tuple[int, str, str, int, int]],
+    ) -> "ChunkTable":
+        """Table grown to `size` doc indices from `(doc_index, doc_id, chunk_id, start, end)`.
+
+        Doc indices without a row become holes with no doc and an empty chunk id.
+        """
+        first = len(self)
+        docs = np.full(size - first, NO_DOC, dtype=np.int32)
+        line_starts = np.zeros(size - first, dtype=np.int32)
+        line_ends = np.zeros(size - first, dtype=np.int32)
+        chunk_ids = [""] * (size - first)
+        for doc_index, doc_id, chunk_id, line_start, line_end in rows:
+            code = self.doc_codes.get(doc_id)
+            if code is None:
+                code = self.doc_codes[doc_id] = len(self.doc_names)
+                self.doc_names.append(doc_id)
+            offset = doc_index - first
+            docs[offset] = code
+            line_starts[offset] = line_start
+            line_ends[offset] = line_end
+            chunk_ids[offset] = chunk_id
+
+        self.chunk_ids.extend(chunk_ids)
+        return ChunkTable(
+            chunk_ids=self.chunk_ids,
+            doc_names=self.doc_names,
+            doc_codes=self.doc_codes,
+            docs=np.concatenate([self.docs, docs]),
+            line_starts=np.concatenate([self.line_starts, line_starts]),
+            line_ends=np.concatenate([self.line_ends, line_ends]),
+        )
+
+    def take(self, doc_indices: np.ndarray) -> "ChunkTable":
+        """A new, unshared table of the given doc indices in order."""
+        return ChunkTable(
+            chunk_ids=[self.chunk_ids[doc_index] for doc_index in doc_indices.tolist()],
+            doc_names=list(self.doc_names),
+            doc_codes=dict(self.doc_codes),
+            docs=self.docs[doc_indices],
+            line_starts=self.line_starts[doc_indices],
+            line_ends=self.line_ends[doc_indices],
+        )
@@ -1,5 +1,12 @@
 import re
+from collections.abc import Callable, Iterable, Iterator
 from dataclasses import dataclass
+from itertools import islice
+
+CHUNK_UNITS = ("chars", "tokens")
+HEADING_PATTERN = re.compile(r"^\s{0,3}#{1,6}\s+(.*)")
+# Lines measured per `measure` call when chunking by tokens.
+MEASURE_BATCH = 256
 
 
 @dataclass(frozen=True)
@@ -9,95 +16,159 @@ class TextChunk:
     line_end: int
 
 
-def chunk_text(text: str, chunk_size: int = 500, overlap: int = 100) -> list[TextChunk]:
+def chunk_text(
+    text: str,
+    chunk_size: int = 500,
+    overlap: int = 100,
+    measure: Callable[[list[str]], list[int]] | None = None,
+) -> list[TextChunk]:
     if not text or not text.strip():
         return []
-
+    return list(
+        iter_chunks(text.splitlines(), chunk_size=chunk_size, overlap=overlap, measure=measure)
+    )
+
+
+def iter_chunks(
+    lines: Iterable[str],
+    chunk_size: int = 500,
+    overlap: int = 100,
+    measure: Callable[[list[str]], list[int]] | None = None,
+) -> Iterator[TextChunk]:
+    """Chunk a stream of lines as `chunk_text` would, holding only the current window.
+
+    Sizes are in characters, or in the units of `measure`, which gets lines in batches and
+    returns their lengths, e.g. in tokens. Measured chunks also leave room for their
+    `Section:` line. Line numbers count from the first line of the stream.
+    """
     if chunk_size <= overlap:
         raise ValueError("chunk_size must be greater than overlap")
+    return _iter_chunks(lines, chunk_size, overlap, measure)
 
-    lines = text.splitlines()
-    sections = _split_sections(lines)
-    chunks: list[TextChunk] = []
-    for section in sections:
-        chunks.extend(
-            _chunk_section_lines(
-                lines=section["lines"],
-                line_offset=section["start_line"],
-                chunk_size=chunk_size,
-                overlap=overlap,
-                header=section["header"],
+
+def iter_lines(pieces: Iterable[str]) -> Iterator[str]:
+    """Lines of the concatenated `pieces`, split exactly like `str.splitlines`."""
+    pending = ""
+    for piece in pieces:
+        if not piece:
+            continue
+        lines = (pending + piece).splitlines(keepends=True)
+        # The last line may continue in the next piece, and a trailing "\r" may be half a "\r\n".
+        pending = lines.pop()
+        if not pending.endswith("\r") and pending.splitlines()[0] != pending:
+            lines.append(pending)
+            pending = ""
+        for line in lines:
+            yield line.splitlines()[0]
+    if pending:
+        yield pending.splitlines()[0]
+
+
+def _iter_chunks(
+    lines: Iterable[str],
+    chunk_size: int,
+    overlap: int,
+    measure: Callable[[list[str]], list[int]] | None,
+) -> Iterator[TextChunk]:
+    if measure is None:
+        # Characters, counting the newline that joins two lines.
+        measured = ((line, len(line)) for line in lines)
+        separator = 1
+    else:
+        measured = _measured(lines, measure)
+        separator = 0
+    header = ""
+    budget = chunk_size
+    # Lines of the current section from the start of the next chunk on, and their lengths.
+    window: list[str] = []
+    lengths: list[int] = []
+    first_line = 1
+    size = -separator
+    for number, (line, length) in enumerate(measured, start=1):
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            if window:
+                yield from _drain(
+                    window, lengths, first_line, header, budget, overlap, separator, final=True
+                )
+            header = heading.group(1).strip()
+            if measure is not None:
+                budget = max(overlap + 1, chunk_size - measure([f"Section: {header}"])[0])
+            window, lengths, first_line, size = [], [], number, -separator
+        window.append(line)
+        lengths.append(length)
+        size += length + separator
+        if size > budget and len(window) > 1:
+            first_line += yield from _drain(
+                window, lengths, first_line, header, budget, overlap, separator, final=False
             )
+            size = sum(lengths) + separator * (len(lengths) - 1)
+    if window:
+        yield from _drain(
+            window, lengths, first_line, header, budget, overlap, separator, final=True
         )
-    return chunks
-
-
-def _split_sections(lines: list[str]) -> list[dict]:
-    if not lines:
-        return []
-
-    sections: list[dict] = []
-    current = {"header": "", "start_line": 1, "lines": []}
-    heading_pattern = re.compile(r"^\s{0,3}#{1,6}\s+(.*)")
 
-    for idx, line in enumerate(lines, start=1):
-        heading = heading_pattern.match(line)
-        if heading:
-            if current["lines"]:
-                sections.append(current)
-            current = {"header": heading.group(1).strip(), "start_line": idx, "lines": [line]}
-            continue
-        current["lines"].append(line)
 
-    if current["lines"]:
-        sections.append(current)
-    return sections
+def _measured(
+    lines: Iterable[str],
+    measure: Callable[[list[str]], list[int]],
+) -> Iterator[tuple[str, int]]:
+    lines = iter(lines)
+    while batch := list(islice(lines, MEASURE_BATCH)):
+        yield from zip(batch, measure(batch), strict=True)
 
 
-def _chunk_section_lines(
-    lines: list[str],
-    line_offset: int,
+def _drain(
+    window: list[str],
+    lengths: list[int],
+    first_line: int,
+    header: str,
     chunk_size: int,
     overlap: int,
-    header: str,
-) -> list[TextChunk]:
-    chunks: list[TextChunk] = []
-    i = 0
-    while i < len(lines):
-        acc: list[str] = []
-        start_idx = i
+    separator: int,
+    final: bool,
+) -> Iterator[TextChunk]:
+    """Emit the chunks of `window` that no later line can change; returns lines dropped.
+
+    Unless `final`, the last, still open chunk stays in `window` with its overlap.
+    """
+    dropped = 0
+    while window:
+        i = 0
         total_len = 0
-
-        while i < len(lines):
-            next_line = lines[i]
-            projected = total_len + len(next_line) + (1 if acc else 0)
-            if acc and projected > chunk_size:
+        while i < len(window):
+            projected = total_len + lengths[i] + (separator if i else 0)
+            if i and projected > chunk_size:
                 break
-            acc.append(next_line)
             total_len = projected
             i += 1
+        if i == len(window) and not final:
+            break
 
-        raw_chunk_text = "\n".join(acc)
+        raw_chunk_text = "\n".join(window[:i])
         if raw_chunk_text.strip():
             chunk_text_value = raw_chunk_text
             if header and not chunk_text_value.lower().startswith(f"section: {header}".lower()):
                 chunk_text_value = f"Section: {header}\n{chunk_text_value}"
-            chunks.append(
-                TextChunk(
-                    text=chunk_text_value,
-                    line_start=line_offset + start_idx,
-                    line_end=line_offset + i - 1,
-                )
+            yield TextChunk(
+                text=chunk_text_value,
+                line_start=first_line + dropped,
+                line_end=first_line + dropped + i - 1,
             )
 
-        if i >= len(lines):
+        if i == len(window):
+            dropped += len(window)
+            window.clear()
+            lengths.clear()
             break
 
         overlap_len = 0
         back = i - 1
-        while back >= start_idx and overlap_len < overlap:
-            overlap_len += len(lines[back]) + 1
+        while back >= 0 and overlap_len < overlap:
+            overlap_len += lengths[back] + separator
             back -= 1
-        i = max(start_idx + 1, back + 1)
-
-    return chunks
+        step = max(1, back + 1)
+        del window[:step]
+        del lengths[:step]
+        dropped += step
+    return dropped
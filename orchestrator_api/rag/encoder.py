@@ -0,0 +1,367 @@
+import logging
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from queue import Empty, SimpleQueue
+from threading import Event, Lock, Thread
+from typing import NamedTuple
+
+import numpy as np
+import torch
+from sentence_transformers import SparseEncoder
+from transformers import AutoTokenizer
+
+from orchestrator_api.config import settings
+from orchestrator_api.rag.cache import LRUCache
+from orchestrator_api.rag.inference_free import QUERY_ENCODINGS, QueryTables
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_MODES = ("torch", "int8", "onnx")
+# Roughly one ingest chunk of text, used to time batch sizes at warm-up.
+_AUTOTUNE_TEXT = (
+    "Sentinel-2 surface reflectance is corrected for atmospheric effects before NDVI and water "
+    "indices are computed per tile. Cloud and shadow masks remove pixels above the threshold, and "
+    "change detection compares the remaining scenes of each revisit with the previous mosaic. "
+) * 2
+
+
+class SparseVector(NamedTuple):
+    rows: np.ndarray
+    weights: np.ndarray
+
+
+class QueryMicroBatcher:
+    """Collects queries that arrive within `max_wait_ms` into one encoder call."""
+
+    def __init__(
+        self,
+        encode_batch: Callable[[list[str]], list[SparseVector]],
+        max_batch_size: int,
+        max_wait_ms: float,
+    ) -> None:
+        self._encode_batch = encode_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self.batches = 0
+        self.queries = 0
+        self._queue: SimpleQueue[tuple[str, Future]] = SimpleQueue()
+        self._worker: Thread | None = None
+        self._worker_lock = Lock()
+
+    def encode(self, query: str) -> SparseVector:
+        future: Future = Future()
+        self._queue.put((query, future))
+        self._ensure_worker()
+        return future.result()
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+        }
+
+    def _ensure_worker(self) -> None:
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = Thread(target=self._run, name="splade-query-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch: list[tuple[str, Future]]) -> None:
+        unique = list(dict.fromkeys(query for query, _ in batch))
+        try:
+            encoded = dict(zip(unique, self._encode_batch(unique), strict=True))
+        except Exception as exc:  # noqa: BLE001
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        self.batches += 1
+        self.queries += len(batch)
+        for query, future in batch:
+            future.set_result(encoded[query])
+
+
+class SparseEncoderRuntime:
+    """Process-wide SPLADE encoder that is loaded once, on a background thread."""
+
+    def __init__(self, model_name: str, inference: str | None = None) -> None:
+        self.model_name = model_name
+        self.requested_inference = inference or settings.rag_sparse_inference
+        # Checked here, at import, so a typo fails startup instead of the background load.
+        if self.requested_inference not in INFERENCE_MODES:
+            raise ValueError(f"unknown RAG_SPARSE_INFERENCE: {self.requested_inference!r}")
+        self.inference: str | None = None
+        self.state = "idle"
+        self.error: str | None = None
+        self.device: str | None = None
+        self.warmup_seconds: float | None = None
+        self.encode_batch_size = settings.rag_encode_batch_size
+        self.batch_autotune: dict[int, float] | None = None
+        self.model = None
+        self.tokenizer = None
+        self.special_ids: frozenset[int] = frozenset()
+        self.query_tables: QueryTables | None = None
+        self.query_encodings = {"model": 0, "inference_free": 0}
+
+        self._start_lock = Lock()
+        self._pending_lock = Lock()
+        self._pending_queries = 0
+        self._settled = Event()
+        self._query_cache = LRUCache(settings.rag_query_cache_size)
+        self._batcher = QueryMicroBatcher(
+            self._encode_query_batch,
+            max_batch_size=settings.rag_query_batch_max_size,
+            max_wait_ms=settings.rag_query_batch_max_wait_ms,
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    @property
+    def settled(self) -> bool:
+        return self._settled.is_set()
+
+    @property
+    def overloaded(self) -> bool:
+        """Whether model query encodes are queuing past `RAG_QUERY_ENCODING_MAX_PENDING`."""
+        return self._pending_queries >= settings.rag_query_encoding_max_pending
+
+    def resolve_query_encoding(self, query_encoding: str | None = None) -> str:
+        """How a query is encoded right now, `model` or `inference_free`, given the
+        requested `query_encoding` (default `RAG_QUERY_ENCODING`)."""
+        encoding = query_encoding or settings.rag_query_encoding
+        if encoding not in QUERY_ENCODINGS:
+            raise ValueError(f"unknown query encoding: {encoding!r}")
+        # "auto" skips the model only while its query encodes are backed up.
+        if encoding == "auto":
+            return "inference_free" if self.overloaded else "model"
+        return encoding
+
+    def start_warmup(self) -> None:
+        with self._start_lock:
+            if self.state != "idle":
+                return
+            self.state = "loading"
+        Thread(target=self._load, name="splade-warmup", daemon=True).start()
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        self.start_warmup()
+        self._settled.wait(timeout)
+        return self.ready
+
+    def info(self) -> dict:
+        return {
+            "state": self.state,
+            "model": self.model_name,
+            "device": self.device,
+            "inference": self.inference,
+            "threads": torch.get_num_threads(),
+            "encode_batch_size": self.encode_batch_size,
+            "batch_autotune": self.batch_autotune,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+            "query_cache": self._query_cache.stats(),
+            "query_batching": self._batcher.stats(),
+            "query_encodings": dict(self.query_encodings),
+            "query_tables": settings.rag_query_tables_path if self.query_tables else None,
+        }
+
+    def encode_documents(self, texts: list[str]) -> list[SparseVector]:
+        with torch.no_grad():
+            dense = _to_dense_numpy(
+                self.model.encode_document(texts, batch_size=self.encode_batch_size)
+            )
+        return [self._sparsify(vec) for vec in dense]
+
+    def encode_query(self, query: str) -> SparseVector:
+        key = " ".join(query.split())
+        self.query_encodings["model"] += 1
+        cached = self._query_cache.get(key)
+        if cached is not None:
+            return cached
+        with self._pending_lock:
+            self._pending_queries += 1
+        try:
+            if self._batcher.max_batch_size > 1:
+                encoded = self._batcher.encode(key)
+            else:
+                encoded = self._encode_query_batch([key])[0]
+        finally:
+            with self._pending_lock:
+                self._pending_queries -= 1
+        self._query_cache.put(key, encoded)
+        return encoded
+
+    def encode_query_inference_free(
+        self,
+        query: str,
+        token_weights: Callable[[np.ndarray], np.ndarray] | None = None,
+    ) -> SparseVector:
+        """Encode `query` with the tokenizer alone, without running the model.
+
+        Tokens are weighted by the learned `query_tables` when loaded, which also add each
+        token's expansions; otherwise by `token_weights(rows)`, e.g. IDF over the index.
+        """
+        self.query_encodings["inference_free"] += 1
+        ids = self.tokenizer(query, add_special_tokens=False)["input_ids"]
+        rows = np.unique(np.asarray(ids, dtype=np.int64))
+        if self.special_ids:
+            rows = rows[~np.isin(rows, list(self.special_ids))]
+        if self.query_tables is not None:
+            rows, weights = self.query_tables.weigh(rows)
+        elif token_weights is not None:
+            weights = token_weights(rows)
+        else:
+            weights = np.ones(len(rows))
+        keep = weights > 0
+        return SparseVector(rows=rows[keep], weights=weights[keep].astype(np.float32))
+
+    def _encode_query_batch(self, queries: list[str]) -> list[SparseVector]:
+        with torch.no_grad():
+            dense = _to_dense_numpy(self.model.encode_query(queries))
+        return [self._sparsify(vec) for vec in dense.reshape(len(queries), -1)]
+
+    def _sparsify(self, vec: np.ndarray) -> SparseVector:
+        rows = np.flatnonzero(vec > settings.rag_sparse_min_weight)
+        if self.special_ids:
+            rows = rows[~np.isin(rows, list(self.special_ids))]
+        weights = vec[rows].astype(np.float32)
+        # Cached vectors are shared between requests.
+        rows.setflags(write=False)
+        weights.setflags(write=False)
+        return SparseVector(rows=rows, weights=weights)
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+        try:
+            if settings.rag_sparse_threads > 0:
+                torch.set_num_threads(settings.rag_sparse_threads)
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            model, inference = build_sparse_model(
+                self.model_name, self.requested_inference, device, settings.rag_sparse_threads
+            )
+            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            if settings.rag_query_tables_path:
+                self.query_tables = _load_query_tables(settings.rag_query_tables_path)
+            candidates = _batch_sizes(settings.rag_encode_batch_autotune)
+            if candidates:
+                with torch.no_grad():
+                    self.encode_batch_size, self.batch_autotune = autotune_batch_size(
+                        model.encode_document, candidates
+                    )
+            self.model = model
+            self.tokenizer = tokenizer
+            self.special_ids = frozenset(getattr(tokenizer, "all_special_ids", []) or [])
+            self.device = device
+            self.inference = inference
+            self.warmup_seconds = round(time.perf_counter() - start, 3)
+            # Publish last so readers that see "ready" also see the model.
+            self.state = "ready"
+        except Exception as exc:  # noqa: BLE001
+            self.error = str(exc)
+            self.warmup_seconds = round(time.perf_counter() - start, 3)
+            self.state = "failed"
+            logger.warning("sparse encoder unavailable, serving lexical retrieval: %s", exc)
+        finally:
+            self._settled.set()
+
+
+def build_sparse_model(model_name: str, inference: str, device: str, threads: int = 0):
+    """`(model, inference)` for a SPLADE model run as `inference` (one of `INFERENCE_MODES`).
+
+    `int8` dynamically quantizes the linear layers of the PyTorch model and `onnx` runs the
+    model on ONNX Runtime; both are CPU-only. On a GPU, or when ONNX Runtime cannot load the
+    model, the fp32 PyTorch model is used and reported instead.
+    """
+    if inference not in INFERENCE_MODES:
+        raise ValueError(f"unknown sparse inference mode: {inference}")
+    if inference != "torch" and device != "cpu":
+        logger.info("sparse inference %s is CPU-only, using torch on %s", inference, device)
+        inference = "torch"
+    if inference == "onnx":
+        try:
+            model = SparseEncoder(
+                model_name,
+                device="cpu",
+                backend="onnx",
+                model_kwargs=_onnx_model_kwargs(threads),
+            )
+            return model, "onnx"
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("onnx sparse encoder unavailable, using torch fp32: %s", exc)
+            inference = "torch"
+    model = SparseEncoder(model_name).to(device)
+    if inference == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model, inference
+
+
+def autotune_batch_size(
+    encode: Callable[..., object],
+    candidates: list[int],
+    text: str = _AUTOTUNE_TEXT,
+) -> tuple[int, dict[int, float]]:
+    """The fastest of `candidates` for `encode(texts, batch_size=...)`, and texts/s of each.
+
+    Every candidate encodes the same texts, twice the largest candidate, after one untimed call.
+    """
+    texts = [text] * (2 * max(candidates))
+    encode(texts[: min(candidates)], batch_size=min(candidates))
+    rates = {}
+    for batch_size in candidates:
+        start = time.perf_counter()
+        encode(texts, batch_size=batch_size)
+        rates[batch_size] = round(len(texts) / (time.perf_counter() - start), 1)
+    return max(rates, key=rates.__getitem__), rates
+
+
+def _load_query_tables(path: str) -> QueryTables | None:
+    try:
+        return QueryTables.load(path)
+    except (OSError, KeyError, ValueError) as exc:
+        logger.warning("query tables unavailable, weighting by IDF: %s", exc)
+        return None
+
+
+def _batch_sizes(raw: str) -> list[int]:
+    return sorted({int(part) for part in raw.split(",") if part.strip() and int(part) > 0})
+
+
+def _onnx_model_kwargs(threads: int) -> dict:
+    kwargs: dict = {"provider": "CPUExecutionProvider"}
+    if settings.rag_sparse_onnx_file:
+        kwargs["file_name"] = settings.rag_sparse_onnx_file
+    if threads > 0:
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        kwargs["session_options"] = options
+    return kwargs
+
+
+def _to_dense_numpy(value) -> np.ndarray:
+    if hasattr(value, "to_dense"):
+        return value.to_dense().float().cpu().numpy()
+    if isinstance(value, torch.Tensor):
+        return value.float().cpu().numpy()
+    return np.asarray(value)
+
+
+sparse_encoder = SparseEncoderRuntime(settings.rag_sparse_model)
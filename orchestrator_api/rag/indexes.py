@@ -0,0 +1,85 @@
+import re
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+
+from orchestrator_api.config import settings
+from orchestrator_api.rag.chroma_store import ChromaVectorStore
+from orchestrator_api.rag.store import SparseVectorStore, store
+from orchestrator_api.rag.vector_store import STORE_BACKENDS, VectorStore
+from orchestrator_api.schemas import INDEX_NAME_PATTERN
+
+_INDEX_NAME_RE = re.compile(INDEX_NAME_PATTERN)
+
+
+class UnknownIndexError(LookupError):
+    """A read named an index that was never created."""
+
+
+class IndexRegistry:
+    """Named stores, each with its own file or directory, loaded lazily on first use.
+
+    At most `max_resident` indexes keep their postings in memory; the least recently
+    used ones are unloaded and come back from their snapshot on the next access. Only
+    writers create indexes; reads of a name with nothing on disk raise `UnknownIndexError`.
+    """
+
+    def __init__(self, default: VectorStore, max_resident: int) -> None:
+        self.default_name = default.name
+        self.max_resident = max(1, max_resident)
+        self._stores: OrderedDict[str, VectorStore] = OrderedDict({default.name: default})
+        self._lock = Lock()
+
+    def get(self, name: str | None = None, create: bool = False) -> VectorStore:
+        name = name or self.default_name
+        if not _INDEX_NAME_RE.match(name):
+            raise ValueError(f"invalid index name: {name!r}")
+
+        with self._lock:
+            index = self._stores.get(name)
+            if index is None:
+                if not create and not index_exists(name):
+                    raise UnknownIndexError(f"unknown index: {name!r}")
+                index = create_store(name)
+                self._stores[name] = index
+            self._stores.move_to_end(name)
+            cold = [other for other in list(self._stores.values())[:-1] if other.loaded]
+        # The index being returned is about to be read, so it counts as resident.
+        for other in cold[: max(0, len(cold) + 1 - self.max_resident)]:
+            other.unload()
+        return index
+
+    def info(self) -> list[dict[str, str | bool]]:
+        with self._lock:
+            stores = list(self._stores.values())
+        return [{"name": index.name, "loaded": index.loaded} for index in reversed(stores)]
+
+
+def create_store(name: str) -> VectorStore:
+    """Build the store for index `name` with the backend picked by `RAG_STORE_BACKEND`."""
+    if settings.rag_store_backend not in STORE_BACKENDS:
+        raise ValueError(f"unknown RAG_STORE_BACKEND: {settings.rag_store_backend!r}")
+    if settings.rag_store_backend == "chroma":
+        return ChromaVectorStore(path=index_db_path(name).with_suffix(".chroma"), name=name)
+    return SparseVectorStore(db_path=index_db_path(name), name=name)
+
+
+def index_exists(name: str) -> bool:
+    """Whether index `name` was created before, possibly by an earlier process."""
+    path = index_db_path(name)
+    if settings.rag_store_backend == "chroma":
+        path = path.with_suffix(".chroma")
+    return path.exists()
+
+
+def index_db_path(name: str) -> Path:
+    base = Path(settings.rag_store_db_path)
+    if name == settings.rag_index_name:
+        return base
+    return base.with_name(f"{base.stem}.{name}{base.suffix}")
+
+
+indexes = IndexRegistry(
+    store if settings.rag_store_backend == "sqlite" else create_store(settings.rag_index_name),
+    max_resident=settings.rag_max_resident_indexes,
+)
@@ -0,0 +1,121 @@
+import argparse
+from collections.abc import Callable, Sequence
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+
+QUERY_ENCODINGS = ("model", "inference_free", "auto")
+
+
+@dataclass(frozen=True)
+class QueryTables:
+    """Query token weights and expansions taken from the SPLADE model once, offline.
+
+    `token_weights[t]` is the weight the model gives token `t` in a query of its text alone.
+    The expansions of `t` are `expansion_ids[expansion_ptr[t]:expansion_ptr[t + 1]]`, with
+    weights relative to `t` itself.
+    """
+
+    token_weights: np.ndarray
+    expansion_ptr: np.ndarray
+    expansion_ids: np.ndarray
+    expansion_weights: np.ndarray
+
+    @classmethod
+    def load(cls, path: str | Path) -> "QueryTables":
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in cls.__dataclass_fields__})
+
+    def save(self, path: str | Path) -> None:
+        np.savez(path, **asdict(self))
+
+    def weigh(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Learned weights of `rows` plus their expansions, one weight per distinct row."""
+        rows = rows[rows < len(self.token_weights)]
+        weights = self.token_weights[rows]
+        starts = self.expansion_ptr[rows]
+        counts = self.expansion_ptr[rows + 1] - starts
+        total = int(counts.sum())
+        if not total:
+            return rows, weights
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        picked = np.repeat(starts, counts) + offsets
+        all_rows = np.concatenate([rows, self.expansion_ids[picked]])
+        all_weights = np.concatenate(
+            [weights, self.expansion_weights[picked] * np.repeat(weights, counts)]
+        )
+        # A token reached from several query tokens keeps its largest weight.
+        order = np.lexsort((-all_weights, all_rows))
+        unique, first = np.unique(all_rows[order], return_index=True)
+        return unique, all_weights[order][first]
+
+
+def build_query_tables(
+    encode_queries: Callable[[list[str]], Sequence],
+    token_texts: list[str],
+    top_n: int = 8,
+    batch_size: int = 256,
+) -> QueryTables:
+    """Encode every vocabulary token's text as a query and keep its weight and expansions.
+
+    A token missing from the encoding of its own text (a word piece, say) gets the largest
+    weight of that encoding.
+    """
+    vocab = len(token_texts)
+    token_weights = np.zeros(vocab, dtype=np.float32)
+    expansion_ptr = np.zeros(vocab + 1, dtype=np.int64)
+    expansion_ids: list[np.ndarray] = []
+    expansion_weights: list[np.ndarray] = []
+    for first in range(0, vocab, batch_size):
+        texts = token_texts[first : first + batch_size]
+        for token, vec in enumerate(encode_queries(texts), start=first):
+            rows = np.asarray(vec.rows, dtype=np.int64)
+            weights = np.asarray(vec.weights, dtype=np.float32)
+            if not len(rows):
+                continue
+            own = np.flatnonzero(rows == token)
+            token_weights[token] = weights[own[0]] if len(own) else weights.max()
+            others = np.flatnonzero(rows != token)
+            top = others[np.argsort(-weights[others], kind="stable")[:top_n]]
+            expansion_ids.append(rows[top])
+            expansion_weights.append(np.minimum(weights[top] / token_weights[token], 1.0))
+            expansion_ptr[token + 1] = len(top)
+    return QueryTables(
+        token_weights=token_weights,
+        expansion_ptr=np.cumsum(expansion_ptr),
+        expansion_ids=np.concatenate(expansion_ids or [np.zeros(0, dtype=np.int64)]),
+        expansion_weights=np.concatenate(
+            expansion_weights or [np.zeros(0, dtype=np.float32)]
+        ).astype(np.float32),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Build the RAG_QUERY_TABLES_PATH file for inference-free query encoding."
+    )
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--model", help="SPLADE model (default: RAG_SPARSE_MODEL)")
+    parser.add_argument("--top-n", type=int, default=8, help="expansions kept per token")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    # The encoder module imports this one.
+    from orchestrator_api.config import settings
+    from orchestrator_api.rag.encoder import SparseEncoderRuntime
+
+    runtime = SparseEncoderRuntime(args.model or settings.rag_sparse_model)
+    if not runtime.wait_ready():
+        raise SystemExit(f"sparse encoder unavailable: {runtime.error}")
+    tokenizer = runtime.tokenizer
+    token_texts = [tokenizer.decode([token]) for token in range(len(tokenizer))]
+    tables = build_query_tables(
+        runtime._encode_query_batch, token_texts, top_n=args.top_n, batch_size=args.batch_size
+    )
+    tables.save(args.out)
+    print(f"wrote {args.out}: {len(token_texts)} tokens, {len(tables.expansion_ids)} expansions")
+
+
+if __name__ == "__main__":
+    main()
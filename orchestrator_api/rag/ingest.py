@@ -1,35 +1,111 @@
-from orchestrator_api.rag.chunker import chunk_text
-from orchestrator_api.rag.parser import parse_document
-from orchestrator_api.rag.store import ChunkRecord, store
+import time
+from collections.abc import Callable
+from pathlib import Path
+from threading import Event
+
+from orchestrator_api.rag.indexes import indexes
+from orchestrator_api.rag.pipeline import IngestPipeline, IngestReport, source_state
 
 
 def ingest_documents(
     documents: list[str],
     chunk_size: int = 500,
     overlap: int = 100,
+    index_name: str | None = None,
 ) -> tuple[int, list[dict[str, str]]]:
-    ingested_count = 0
-    failures: list[dict[str, str]] = []
-
-    for doc_input in documents:
-        try:
-            doc_id, text = parse_document(doc_input)
-            chunks = chunk_text(text, chunk_size=chunk_size, overlap=overlap)
-            records: list[ChunkRecord] = []
-            for chunk in chunks:
-                chunk_id = f"{doc_id}:{chunk.line_start}-{chunk.line_end}"
-                records.append(
-                    ChunkRecord(
-                        doc_id=doc_id,
-                        chunk_id=chunk_id,
-                        text=chunk.text,
-                        line_start=chunk.line_start,
-                        line_end=chunk.line_end,
-                    )
-                )
-            store.add(records)
-            ingested_count += 1
-        except Exception as exc:  # noqa: BLE001
-            failures.append({"document": doc_input, "error": str(exc)})
-
-    return ingested_count, failures
+    report = ingest_with_report(documents, chunk_size, overlap, index_name)
+    return len(report.ingested), report.failures
+
+
+def ingest_with_report(
+    documents: list[str],
+    chunk_size: int = 500,
+    overlap: int = 100,
+    index_name: str | None = None,
+    on_progress: Callable[[IngestReport, int], None] | None = None,
+    cancel: Event | None = None,
+) -> IngestReport:
+    store = indexes.get(index_name, create=True)
+    report = IngestPipeline(
+        store,
+        chunk_size=chunk_size,
+        overlap=overlap,
+        on_progress=on_progress,
+        cancel=cancel,
+    ).run(documents)
+    if report.ingested:
+        store.save_snapshot()
+    return report
+
+
+def sync_documents(
+    paths: list[str],
+    root: str,
+    chunk_size: int = 500,
+    overlap: int = 100,
+    index_name: str | None = None,
+    on_progress: Callable[[IngestReport, int], None] | None = None,
+    cancel: Event | None = None,
+) -> dict:
+    """Bring the index in line with `paths`, re-ingesting only files whose content changed.
+
+    Files under `root` that were ingested before but are no longer in `paths` are removed.
+    """
+    store = indexes.get(index_name, create=True)
+    started = time.perf_counter()
+    known = store.source_states()
+
+    skipped: list[str] = []
+    changed: list[str] = []
+    for path in paths:
+        stat = Path(path).stat()
+        state = known.get(path)
+        if state is not None and state.mtime == stat.st_mtime and state.size == stat.st_size:
+            skipped.append(path)
+            continue
+        current = source_state(path)
+        if state is not None and state.content_hash == current.content_hash:
+            # Touched but identical: refresh the fingerprint so the next scan can stat-skip it.
+            store.record_source(path, current)
+            skipped.append(path)
+            continue
+        changed.append(path)
+    scanned = time.perf_counter()
+
+    report = IngestPipeline(
+        store,
+        chunk_size=chunk_size,
+        overlap=overlap,
+        on_progress=on_progress,
+        cancel=cancel,
+    ).run(changed)
+    ingested = time.perf_counter()
+
+    root_path = Path(root).resolve()
+    present = set(paths)
+    removed = [
+        doc_id
+        for doc_id in known
+        if doc_id not in present and Path(doc_id).resolve().is_relative_to(root_path)
+    ]
+    if report.cancelled:
+        removed = []
+    for doc_id in removed:
+        store.delete_document(doc_id)
+    if report.ingested or removed:
+        store.save_snapshot()
+    finished = time.perf_counter()
+
+    return {
+        "skipped": skipped,
+        "updated": report.ingested,
+        "removed": removed,
+        "failed": report.failures,
+        "timings_ms": {
+            "scan": round((scanned - started) * 1000, 1),
+            "ingest": round((ingested - scanned) * 1000, 1),
+            "remove": round((finished - ingested) * 1000, 1),
+            "total": round((finished - started) * 1000, 1),
+        },
+        "throughput": report.throughput(),
+    }
@@ -0,0 +1,133 @@
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from threading import Event, Lock
+from uuid import uuid4
+
+from orchestrator_api.config import settings
+from orchestrator_api.rag.pipeline import IngestReport
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATES = {"succeeded", "failed", "cancelled"}
+
+
+@dataclass
+class IngestJob:
+    kind: str
+    index_name: str
+    id: str = field(default_factory=lambda: uuid4().hex)
+    status: str = "queued"
+    files_total: int = 0
+    files_done: int = 0
+    chunks_done: int = 0
+    failures: list[dict[str, str]] = field(default_factory=list)
+    result: dict | None = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    cancel: Event = field(default_factory=Event)
+
+    def update(self, report: IngestReport, total: int) -> None:
+        self.files_total = total
+        self.files_done = len(report.ingested) + len(report.failures)
+        self.chunks_done = report.chunks
+        self.failures = list(report.failures)
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        files_per_s = self.files_done / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.files_total - self.files_done)
+        eta = None
+        if self.status == "running" and files_per_s > 0:
+            eta = round(remaining / files_per_s, 1)
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "index_name": self.index_name,
+            "status": self.status,
+            "files_total": self.files_total,
+            "files_done": self.files_done,
+            "chunks_done": self.chunks_done,
+            "failed": self.failures,
+            "elapsed_seconds": round(elapsed, 3),
+            "docs_per_s": round(files_per_s, 2),
+            "chunks_per_s": round(self.chunks_done / elapsed, 2) if elapsed > 0 else 0.0,
+            "eta_seconds": eta,
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+class IngestJobManager:
+    """Runs ingest jobs on a small worker pool; at most `max_concurrent` run at once."""
+
+    def __init__(self, max_concurrent: int, history: int = 100) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.history = history
+        self._jobs: OrderedDict[str, IngestJob] = OrderedDict()
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrent,
+            thread_name_prefix="rag-ingest-job",
+        )
+
+    def submit(
+        self,
+        kind: str,
+        index_name: str,
+        run: Callable[[IngestJob], dict],
+        files_total: int = 0,
+    ) -> IngestJob:
+        job = IngestJob(kind=kind, index_name=index_name, files_total=files_total)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune_locked()
+        self._executor.submit(self._run, job, run)
+        return job
+
+    def get(self, job_id: str) -> IngestJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def recent(self) -> list[IngestJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> IngestJob | None:
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        job.cancel.set()
+        if job.status == "queued":
+            job.status = "cancelled"
+            job.finished_at = time.time()
+        return job
+
+    def _run(self, job: IngestJob, run: Callable[[IngestJob], dict]) -> None:
+        if job.cancel.is_set():
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = run(job)
+            job.status = "cancelled" if job.cancel.is_set() else "succeeded"
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("ingest job %s failed", job.id)
+            job.error = str(exc)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def _prune_locked(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[: max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+
+
+ingest_jobs = IngestJobManager(max_concurrent=settings.rag_ingest_max_jobs)
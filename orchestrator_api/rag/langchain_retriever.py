@@ -1,7 +1,7 @@
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
 
-from orchestrator_api.rag.store import store
+from orchestrator_api.rag.indexes import indexes
 
 
 class ExistingStoreRetriever(BaseRetriever):
@@ -10,15 +10,18 @@ class ExistingStoreRetriever(BaseRetriever):
     top_k: int = 3
     min_score: float = 0.0
     search_multiplier: int = 3
+    index_name: str | None = None
+    query_encoding: str | None = None
 
     def _get_relevant_documents(self, query: str, *, run_manager) -> list[Document]:
         if not query.strip():
             return []
 
-        raw_hits = store.search(
+        raw_hits = indexes.get(self.index_name).search(
             query=query,
             top_k=max(self.top_k * self.search_multiplier, self.top_k),
             min_score=self.min_score,
+            query_encoding=self.query_encoding,
         )
 
         docs: list[Document] = []
@@ -31,6 +34,7 @@ class ExistingStoreRetriever(BaseRetriever):
                         "chunk_id": chunk.chunk_id,
                         "line_start": chunk.line_start,
                         "line_end": chunk.line_end,
+                        "line_terms": getattr(chunk, "line_terms", None),
                         "score": float(score),
                     },
                 )
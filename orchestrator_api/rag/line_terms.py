@@ -0,0 +1,88 @@
+from dataclasses import dataclass
+
+from orchestrator_api.rag.embedder import TOKEN_PATTERN
+
+SECTION_PREFIX = "Section: "
+
+
+@dataclass(frozen=True)
+class LineTerms:
+    """Which lines of a chunk each of its lowercased tokens occurs on.
+
+    `vocab` holds the distinct tokens separated by spaces and `masks[i]` is the hex bit
+    mask of the lines token i is on (the synthetic `Section:` line is not counted). A query
+    term occurs in a line exactly when it is a substring of one of the line's tokens, since
+    a term never spans a token boundary. Serialized as `vocab`, a newline, and the masks
+    separated by commas, so loading one is two splits.
+    """
+
+    vocab: str
+    masks: list[str]
+
+    @classmethod
+    def from_text(cls, text: str) -> "LineTerms":
+        lines = text.splitlines()
+        if lines and lines[0].startswith(SECTION_PREFIX):
+            lines = lines[1:]
+        masks: dict[str, int] = {}
+        for index, line in enumerate(lines):
+            for token in TOKEN_PATTERN.findall(line.lower()):
+                masks[token] = masks.get(token, 0) | (1 << index)
+        return cls(" ".join(masks), [format(mask, "x") for mask in masks.values()])
+
+    @classmethod
+    def loads(cls, raw: str) -> "LineTerms":
+        vocab, masks = raw.split("\n", 1)
+        return cls(vocab, masks.split(","))
+
+    def dumps(self) -> str:
+        return f"{self.vocab}\n{','.join(self.masks)}"
+
+    def lines_with(self, term: str) -> int:
+        """Bit mask of the lines containing `term`."""
+        found = 0
+        pos = self.vocab.find(term)
+        while pos >= 0:
+            found |= int(self.masks[self.vocab.count(" ", 0, pos)], 16)
+            pos = self.vocab.find(term, pos + 1)
+        return found
+
+
+def build_line_terms(text: str) -> str:
+    return LineTerms.from_text(text).dumps()
+
+
+def query_terms(query: str) -> list[str]:
+    return [token.lower() for token in TOKEN_PATTERN.findall(query) if len(token) >= 2]
+
+
+def refine_line_span(
+    line_terms: LineTerms,
+    terms: list[str],
+    chunk_line_start: int,
+    chunk_line_end: int,
+) -> tuple[int, int]:
+    """Narrow a chunk's line range to the lines matching the most query `terms`."""
+    masks = [line_terms.lines_with(term) for term in terms]
+    n_lines = max((mask.bit_length() for mask in masks), default=0)
+    if not n_lines:
+        return chunk_line_start, chunk_line_end
+
+    per_line_scores = [sum(mask >> line & 1 for mask in masks) for line in range(n_lines)]
+    max_score = max(per_line_scores)
+    best_idx = per_line_scores.index(max_score)
+    left = best_idx
+    right = best_idx
+
+    # Only expand span when signal is strong enough; single-term matches stay narrow.
+    if max_score > 1:
+        while left - 1 >= 0 and per_line_scores[left - 1] >= max_score:
+            left -= 1
+        while right + 1 < len(per_line_scores) and per_line_scores[right + 1] >= max_score:
+            right += 1
+
+    line_start = max(chunk_line_start, chunk_line_start + left)
+    line_end = min(chunk_line_end, chunk_line_start + right)
+    if line_start > line_end:
+        return chunk_line_start, chunk_line_end
+    return line_start, line_end
@@ -1,26 +1,155 @@
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 from pathlib import Path
 
 from bs4 import BeautifulSoup
 from pypdf import PdfReader
 
+from orchestrator_api.rag.chunker import TextChunk, chunk_text, iter_chunks, iter_lines
+from orchestrator_api.rag.text_cache import ParsedTextCache
+from orchestrator_api.rag.token_length import token_counter
+
+_READ_BLOCK = 1 << 20
+
 
 def parse_document(path_or_text: str) -> tuple[str, str]:
     path = Path(path_or_text)
     if path.exists() and path.is_file():
-        return str(path), _parse_file(path)
+        return str(path), "".join(_iter_file_text(path))
     return "inline", path_or_text
 
 
-def _parse_file(path: Path) -> str:
+def parse_and_chunk(
+    path_or_text: str,
+    chunk_size: int,
+    overlap: int,
+    tokenizer: str | None = None,
+) -> tuple[str, list[TextChunk]]:
+    """Ingest worker entry point; kept free of heavy imports so pool processes start fast.
+
+    With `tokenizer`, a model name, sizes are in tokens of that model's tokenizer.
+    """
+    doc_id, text = parse_document(path_or_text)
+    measure = token_counter(tokenizer) if tokenizer else None
+    return doc_id, chunk_text(text, chunk_size=chunk_size, overlap=overlap, measure=measure)
+
+
+def iter_document_chunks(
+    path_or_text: str,
+    chunk_size: int,
+    overlap: int,
+    pool: Executor | None = None,
+    pages_per_task: int = 16,
+    tasks_ahead: int = 8,
+    text_cache: ParsedTextCache | None = None,
+    content_hash: str | None = None,
+    tokenizer: str | None = None,
+) -> tuple[str, Iterator[TextChunk]]:
+    """Like `parse_and_chunk`, but reads and chunks lazily, a PDF page or text block at a time.
+
+    PDF pages are extracted in ranges on `pool` when given. With `text_cache` and the
+    file's `content_hash`, a PDF extracted before is read from the cache instead.
+    """
+    chunk = partial(
+        iter_chunks,
+        chunk_size=chunk_size,
+        overlap=overlap,
+        measure=token_counter(tokenizer) if tokenizer else None,
+    )
+    path = Path(path_or_text)
+    if not (path.exists() and path.is_file()):
+        return "inline", chunk(iter_lines(iter([path_or_text])))
+    if path.suffix.lower() == ".pdf":
+        extract_pages = partial(iter_pdf_pages, str(path), pool, pages_per_task, tasks_ahead)
+        pieces = _iter_pdf_text(extract_pages, text_cache, content_hash)
+    else:
+        pieces = _iter_file_text(path)
+    return str(path), chunk(iter_lines(pieces))
+
+
+def extract_pdf_pages(path: str, start: int, stop: int) -> list[str]:
+    """Pool worker entry point: the text of pages `start` to `stop - 1` of a PDF."""
+    reader = PdfReader(path)
+    return [reader.pages[number].extract_text() or "" for number in range(start, stop)]
+
+
+def iter_pdf_pages(
+    path: str,
+    pool: Executor | None = None,
+    pages_per_task: int = 16,
+    tasks_ahead: int = 8,
+) -> Iterator[str]:
+    """Page texts of a PDF in order, extracted in page ranges on `pool` when given.
+
+    At most `tasks_ahead` ranges are in flight, so a long PDF is never held whole.
+    """
+    if pool is None:
+        for page in PdfReader(path).pages:
+            yield page.extract_text() or ""
+        return
+
+    page_count = len(PdfReader(path).pages)
+    ranges = deque(
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    )
+    in_flight: deque = deque()
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < tasks_ahead:
+                start, stop = ranges.popleft()
+                try:
+                    future = pool.submit(extract_pdf_pages, path, start, stop)
+                except (BrokenProcessPool, RuntimeError):
+                    future = None
+                in_flight.append((start, stop, future))
+            start, stop, future = in_flight.popleft()
+            try:
+                pages = future.result() if future is not None else None
+            except BrokenProcessPool:
+                pages = None
+            yield from pages if pages is not None else extract_pdf_pages(path, start, stop)
+    finally:
+        for _, _, future in in_flight:
+            if future is not None:
+                future.cancel()
+
+
+def _iter_pdf_text(
+    extract_pages: Callable[[], Iterator[str]],
+    text_cache: ParsedTextCache | None,
+    content_hash: str | None,
+) -> Iterator[str]:
+    if text_cache is None or content_hash is None:
+        yield from _join_pages(extract_pages())
+        return
+    cached = text_cache.read(content_hash)
+    if cached is not None:
+        yield from cached
+        return
+    yield from text_cache.write_through(content_hash, _join_pages(extract_pages()))
+
+
+def _join_pages(pages: Iterator[str]) -> Iterator[str]:
+    for number, page in enumerate(pages):
+        if number:
+            yield "\n"
+        yield page
+
+
+def _iter_file_text(path: Path) -> Iterator[str]:
+    """The text of a file in pieces; joined, they are the whole document text."""
     suffix = path.suffix.lower()
-    if suffix in {".txt", ".md"}:
-        return path.read_text(encoding="utf-8", errors="ignore")
     if suffix in {".html", ".htm"}:
         raw = path.read_text(encoding="utf-8", errors="ignore")
         # Preserve block boundaries as line breaks so line-based citations stay meaningful.
-        return BeautifulSoup(raw, "html.parser").get_text("\n")
+        yield BeautifulSoup(raw, "html.parser").get_text("\n")
+        return
     if suffix == ".pdf":
-        reader = PdfReader(str(path))
-        pages = [page.extract_text() or "" for page in reader.pages]
-        return "\n".join(pages)
-    return path.read_text(encoding="utf-8", errors="ignore")
+        yield from _join_pages(iter_pdf_pages(str(path)))
+        return
+    with path.open(encoding="utf-8", errors="ignore") as handle:
+        yield from iter(lambda: handle.read(_READ_BLOCK), "")
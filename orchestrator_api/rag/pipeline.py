@@ -0,0 +1,398 @@
+import hashlib
+import logging
+import multiprocessing
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from queue import Queue
+from threading import Event, Lock, Thread
+
+from orchestrator_api.config import settings
+from orchestrator_api.rag.chunker import CHUNK_UNITS
+from orchestrator_api.rag.encoder import SparseVector, sparse_encoder
+from orchestrator_api.rag.line_terms import build_line_terms
+from orchestrator_api.rag.parser import iter_document_chunks, parse_and_chunk
+from orchestrator_api.rag.store import ChunkRecord, SourceState
+from orchestrator_api.rag.text_cache import ParsedTextCache
+from orchestrator_api.rag.token_length import token_counter
+from orchestrator_api.rag.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = Lock()
+
+# Extracted PDF text by content hash, so unchanged PDFs are not extracted again on reindex.
+parsed_text_cache = ParsedTextCache(
+    settings.rag_parsed_text_dir or Path(settings.rag_store_db_path).parent / "parsed_text",
+    settings.rag_parsed_text_cache_mb << 20,
+)
+
+
+@dataclass
+class ParsedDocument:
+    """Chunks of a document, or one piece of a streamed one.
+
+    The first piece replaces the document in the store and later pieces are appended to
+    it; `source` is only set on the last piece, so an interrupted document is re-ingested.
+    """
+
+    doc_input: str
+    doc_id: str
+    chunks: list[ChunkRecord]
+    source: SourceState | None
+    first: bool = True
+    last: bool = True
+
+
+@dataclass
+class IngestReport:
+    ingested: list[str] = field(default_factory=list)
+    failures: list[dict[str, str]] = field(default_factory=list)
+    chunks: int = 0
+    seconds: float = 0.0
+    cancelled: bool = False
+    stage_seconds: dict[str, float] = field(
+        default_factory=lambda: {"parse": 0.0, "encode": 0.0, "write": 0.0}
+    )
+
+    def throughput(self) -> dict[str, float]:
+        seconds = self.seconds or 1e-9
+        return {
+            "documents": len(self.ingested),
+            "chunks": self.chunks,
+            "seconds": round(self.seconds, 3),
+            "docs_per_s": round(len(self.ingested) / seconds, 2),
+            "chunks_per_s": round(self.chunks / seconds, 2),
+            **{f"{stage}_seconds": round(value, 3) for stage, value in self.stage_seconds.items()},
+        }
+
+
+class IngestPipeline:
+    """Parse -> encode -> write stages connected by bounded queues.
+
+    Parsing and chunking run in a process pool, chunks from several documents are
+    encoded together, and each encoded batch is written in one SQLite transaction.
+    PDFs, files of `RAG_INGEST_STREAM_BYTES` or more, and every document when there is no
+    pool are parsed in-process and streamed in pieces of one encode batch, so a large
+    document is indexed as it is read; PDF pages are extracted in ranges on the pool, or
+    read from `parsed_text_cache`. Documents are written in input order. Setting `cancel` stops
+    the pipeline after the batch being written; `on_progress(report, total)` is called
+    after every batch.
+    """
+
+    def __init__(
+        self,
+        store: VectorStore,
+        chunk_size: int = 500,
+        overlap: int = 100,
+        on_progress: Callable[[IngestReport, int], None] | None = None,
+        cancel: Event | None = None,
+    ) -> None:
+        self.store = store
+        self.chunk_size, self.overlap, self.tokenizer = _chunk_sizing(chunk_size, overlap)
+        self.on_progress = on_progress
+        self.cancel = cancel or Event()
+        self.queue_size = max(1, settings.rag_ingest_queue_size)
+        self.batch_size = max(1, settings.rag_encode_batch_size)
+        self.stream_bytes = settings.rag_ingest_stream_bytes
+
+    def run(self, documents: list[str]) -> IngestReport:
+        report = IngestReport()
+        started = time.perf_counter()
+        self._total = len(documents)
+        self._progress(report)
+        parsed: Queue = Queue(maxsize=self.queue_size)
+        encoded: Queue = Queue(maxsize=self.queue_size)
+        stages = [
+            Thread(target=self._parse_stage, args=(documents, parsed, report), daemon=True),
+            Thread(target=self._encode_stage, args=(parsed, encoded, report), daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+        self._write_stage(encoded, report)
+        for stage in stages:
+            stage.join()
+        report.seconds = time.perf_counter() - started
+        report.cancelled = self.cancel.is_set()
+        self._progress(report)
+        logger.info("ingest pipeline finished: %s", report.throughput())
+        return report
+
+    def _parse_stage(self, documents: list[str], out: Queue, report: IngestReport) -> None:
+        started = time.perf_counter()
+        pool = _parse_pool() if len(documents) > 1 else None
+        in_flight: deque[tuple[str, SourceState | None, Future | None]] = deque()
+        try:
+            for doc_input in documents:
+                if self.cancel.is_set():
+                    break
+                try:
+                    # Fingerprint before parsing so a file edited mid-ingest is seen as changed.
+                    source = source_state(doc_input) if Path(doc_input).is_file() else None
+                except Exception as exc:  # noqa: BLE001
+                    report.failures.append({"document": doc_input, "error": str(exc)})
+                    continue
+                future = None
+                if pool is not None and not self._streamed(doc_input, source):
+                    try:
+                        future = pool.submit(
+                            parse_and_chunk,
+                            doc_input,
+                            self.chunk_size,
+                            self.overlap,
+                            self.tokenizer,
+                        )
+                    except Exception:  # noqa: BLE001
+                        logger.warning("ingest process pool unavailable, parsing in-process")
+                        _reset_parse_pool()
+                        pool = None
+                in_flight.append((doc_input, source, future))
+                if len(in_flight) >= self.queue_size:
+                    self._collect(in_flight.popleft(), out, report)
+            while in_flight:
+                self._collect(in_flight.popleft(), out, report)
+        finally:
+            report.stage_seconds["parse"] = time.perf_counter() - started
+            out.put(_DONE)
+
+    def _collect(
+        self,
+        item: tuple[str, SourceState | None, Future | None],
+        out: Queue,
+        report: IngestReport,
+    ) -> None:
+        doc_input, source, future = item
+        try:
+            if future is not None:
+                try:
+                    doc_id, chunks = future.result()
+                except BrokenProcessPool:
+                    logger.warning("ingest process pool broke, parsing in-process")
+                    _reset_parse_pool()
+                else:
+                    out.put(ParsedDocument(doc_input, doc_id, _records(doc_id, chunks), source))
+                    return
+            self._stream(doc_input, source, out)
+        except Exception as exc:  # noqa: BLE001
+            report.failures.append({"document": doc_input, "error": str(exc)})
+
+    def _stream(self, doc_input: str, source: SourceState | None, out: Queue) -> None:
+        pool = _parse_pool() if Path(doc_input).suffix.lower() == ".pdf" else None
+        doc_id, chunks = iter_document_chunks(
+            doc_input,
+            self.chunk_size,
+            self.overlap,
+            pool=pool,
+            pages_per_task=settings.rag_pdf_pages_per_task,
+            tasks_ahead=2 * max(1, settings.rag_ingest_workers),
+            text_cache=parsed_text_cache,
+            content_hash=source.content_hash if source is not None else None,
+            tokenizer=self.tokenizer,
+        )
+        piece = list(islice(chunks, self.batch_size))
+        first = True
+        while not self.cancel.is_set():
+            # One piece of lookahead tells whether this piece is the last.
+            following = list(islice(chunks, self.batch_size)) if piece else []
+            last = not following
+            out.put(
+                ParsedDocument(
+                    doc_input,
+                    doc_id,
+                    _records(doc_id, piece),
+                    source if last else None,
+                    first=first,
+                    last=last,
+                )
+            )
+            if last:
+                return
+            piece, first = following, False
+
+    def _streamed(self, doc_input: str, source: SourceState | None) -> bool:
+        if source is None:
+            return False
+        return source.size >= self.stream_bytes or Path(doc_input).suffix.lower() == ".pdf"
+
+    def _encode_stage(self, parsed: Queue, out: Queue, report: IngestReport) -> None:
+        # The store encodes with SPLADE only once the shared encoder is ready.
+        use_encoder = sparse_encoder.wait_ready()
+        batch: list[ParsedDocument] = []
+        batch_chunks = 0
+        try:
+            while (item := parsed.get()) is not _DONE:
+                if any(doc.doc_id == item.doc_id for doc in batch):
+                    self._flush(batch, use_encoder, out, report)
+                    batch, batch_chunks = [], 0
+                batch.append(item)
+                batch_chunks += len(item.chunks)
+                if batch_chunks >= self.batch_size:
+                    self._flush(batch, use_encoder, out, report)
+                    batch, batch_chunks = [], 0
+            if batch:
+                self._flush(batch, use_encoder, out, report)
+        finally:
+            out.put(_DONE)
+
+    def _flush(
+        self,
+        batch: list[ParsedDocument],
+        use_encoder: bool,
+        out: Queue,
+        report: IngestReport,
+    ) -> None:
+        if self.cancel.is_set():
+            return
+        texts = [chunk.text for doc in batch for chunk in doc.chunks]
+        vectors: list[SparseVector] | Exception | None = None
+        if use_encoder and texts:
+            started = time.perf_counter()
+            try:
+                vectors = sparse_encoder.encode_documents(texts)
+            except Exception as exc:  # noqa: BLE001
+                # Handed on so the write stage drops the rest of streamed documents too.
+                vectors = exc
+            finally:
+                report.stage_seconds["encode"] += time.perf_counter() - started
+        out.put((batch, vectors))
+
+    def _write_stage(self, encoded: Queue, report: IngestReport) -> None:
+        failed: set[str] = set()
+        while (item := encoded.get()) is not _DONE:
+            if self.cancel.is_set():
+                # Keep draining so the upstream stages are never blocked on a full queue.
+                continue
+            batch, vectors = item
+            if any(doc.doc_input in failed for doc in batch):
+                # The rest of a streamed document whose earlier piece failed.
+                kept = [i for i, doc in enumerate(batch) if doc.doc_input not in failed]
+                if not isinstance(vectors, Exception):
+                    vectors = _pieces_vectors(batch, vectors, kept)
+                batch = [batch[i] for i in kept]
+            if isinstance(vectors, Exception):
+                report.failures.extend(
+                    {"document": doc.doc_input, "error": str(vectors)} for doc in batch
+                )
+                failed.update(doc.doc_input for doc in batch if not doc.last)
+                self._progress(report)
+                continue
+            started = time.perf_counter()
+            try:
+                self._write(batch, vectors)
+            except Exception as exc:  # noqa: BLE001
+                report.failures.extend(
+                    {"document": doc.doc_input, "error": str(exc)} for doc in batch
+                )
+                failed.update(doc.doc_input for doc in batch if not doc.last)
+            else:
+                report.ingested.extend(doc.doc_input for doc in batch if doc.last)
+                report.chunks += sum(len(doc.chunks) for doc in batch)
+            finally:
+                report.stage_seconds["write"] += time.perf_counter() - started
+            self._progress(report)
+
+    def _write(self, batch: list[ParsedDocument], vectors: list[SparseVector] | None) -> None:
+        replaced = [i for i, doc in enumerate(batch) if doc.first]
+        appended = [i for i, doc in enumerate(batch) if not doc.first]
+        if replaced:
+            self.store.upsert_documents(
+                [(batch[i].doc_id, batch[i].chunks, batch[i].source) for i in replaced],
+                vectors=_pieces_vectors(batch, vectors, replaced),
+            )
+        if appended:
+            self.store.add(
+                [chunk for i in appended for chunk in batch[i].chunks],
+                vectors=_pieces_vectors(batch, vectors, appended),
+            )
+            for i in appended:
+                if batch[i].source is not None:
+                    self.store.record_source(batch[i].doc_id, batch[i].source)
+
+    def _progress(self, report: IngestReport) -> None:
+        if self.on_progress is not None:
+            self.on_progress(report, self._total)
+
+
+def _chunk_sizing(chunk_size: int, overlap: int) -> tuple[int, int, str | None]:
+    """`(chunk_size, overlap, tokenizer)` for `RAG_CHUNK_UNIT`.
+
+    By tokens, the request's character sizes give way to a budget that fits the encoder's
+    max sequence length.
+    """
+    if settings.rag_chunk_unit not in CHUNK_UNITS:
+        raise ValueError(f"unknown RAG_CHUNK_UNIT: {settings.rag_chunk_unit!r}")
+    if settings.rag_chunk_unit == "chars":
+        return chunk_size, overlap, None
+    try:
+        counter = token_counter(settings.rag_sparse_model)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("tokenizer unavailable, chunking by characters: %s", exc)
+        return chunk_size, overlap, None
+    budget = counter.budget(settings.rag_chunk_max_tokens)
+    return budget, min(settings.rag_chunk_overlap_tokens, budget // 2), settings.rag_sparse_model
+
+
+def _records(doc_id: str, chunks) -> list[ChunkRecord]:
+    return [
+        ChunkRecord(
+            doc_id=doc_id,
+            chunk_id=f"{doc_id}:{chunk.line_start}-{chunk.line_end}",
+            text=chunk.text,
+            line_start=chunk.line_start,
+            line_end=chunk.line_end,
+            line_terms=build_line_terms(chunk.text),
+        )
+        for chunk in chunks
+    ]
+
+
+def _pieces_vectors(
+    batch: list[ParsedDocument],
+    vectors: list[SparseVector] | None,
+    indices: list[int],
+) -> list[SparseVector] | None:
+    """The encodings of the chunks of `batch[i]` for each i in `indices`, in order."""
+    if vectors is None:
+        return None
+    starts = [0]
+    for doc in batch:
+        starts.append(starts[-1] + len(doc.chunks))
+    return [vec for i in indices for vec in vectors[starts[i] : starts[i + 1]]]
+
+
+def source_state(path: str) -> SourceState:
+    stat = Path(path).stat()
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return SourceState(content_hash=digest.hexdigest(), mtime=stat.st_mtime, size=stat.st_size)
+
+
+def _parse_pool() -> ProcessPoolExecutor | None:
+    global _pool
+    if settings.rag_ingest_workers <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the parent process holds torch and encoder threads.
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.rag_ingest_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_parse_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
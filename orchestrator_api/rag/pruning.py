@@ -0,0 +1,217 @@
+import math
+from dataclasses import dataclass
+from threading import Lock
+
+import numpy as np
+
+from orchestrator_api.rag.sparse_index import PostingSegment, SparseMatrixIndex
+
+PRUNING_MODES = ("off", "exact", "approx")
+
+
+@dataclass(frozen=True)
+class PrunedScores:
+    scores: np.ndarray
+    alive: np.ndarray
+    postings_touched: int
+    postings_total: int
+
+
+def maxscore_top_k(
+    index: SparseMatrixIndex,
+    query_rows: np.ndarray,
+    query_weights: np.ndarray,
+    n_docs: int,
+    k: int,
+    *,
+    scale: float = 1.0,
+    offset_lb: np.ndarray | None = None,
+    offset_ub: np.ndarray | None = None,
+    unseen_ub: float = 0.0,
+    seed: np.ndarray | None = None,
+    excluded: np.ndarray | None = None,
+    floor: float = -math.inf,
+    factor: float = 1.0,
+) -> PrunedScores:
+    """Block-max MaxScore for the top `k` of `scale * (q . d) + offset(d)`.
+
+    Query terms are visited by decreasing upper bound (query weight x the token's max
+    weight). While a doc that has not been seen yet could still reach the current k-th
+    best lower bound, a term's posting list is read, skipping the blocks whose block max
+    cannot lift an unseen doc that far (seen docs in those blocks are looked up instead).
+    After that only the surviving candidates are looked up, and candidates whose upper
+    bound falls below the threshold are dropped. `offset_lb`/`offset_ub` bound a per-doc
+    additive term known up front, `unseen_ub` bounds it for docs outside `seed`, and
+    `floor` is a score nothing below which is wanted. Docs left in `alive` have exact
+    scores; any doc that could make the top k (or reach `floor`) is among them.
+    `factor` > 1 inflates the threshold, trading exactness for fewer postings.
+    """
+    query_rows = np.asarray(query_rows, dtype=np.int64)
+    query_weights = np.asarray(query_weights, dtype=np.float64)
+    row_max, row_nnz = index.row_stats(query_rows)
+    bounds = query_weights * row_max
+    order = np.argsort(-bounds, kind="stable")
+    order = order[bounds[order] > 0]
+    # remaining[i]: the most terms i.. can still add; remaining[len(order)] == 0.
+    remaining = np.append(np.cumsum(bounds[order][::-1])[::-1], 0.0)
+
+    scores = np.zeros(n_docs, dtype=np.float64)
+    alive = np.zeros(n_docs, dtype=bool) if seed is None else seed[:n_docs].copy()
+    if excluded is not None:
+        alive &= ~excluded[:n_docs]
+    if offset_lb is None:
+        offset_lb = np.zeros(n_docs, dtype=np.float64)
+    if offset_ub is None:
+        offset_ub = offset_lb
+
+    touched = 0
+    step = 0
+    top = _top_k_docs(np.flatnonzero(alive), scores, offset_lb, k, scale)
+    in_top = np.zeros(n_docs, dtype=bool)
+    # Essential phase: docs not seen yet may still make it, so posting lists are read.
+    while step < len(order):
+        threshold = _kth(scale * scores[top] + offset_lb[top], k, floor, factor)
+        if scale * remaining[step] + unseen_ub < threshold:
+            break
+        row = int(query_rows[order[step]])
+        # float32 products, as in `SparseMatrixIndex.matvec`.
+        weight = np.float32(query_weights[order[step]])
+        seen = None
+        updated = []
+        for segment in index.segments:
+            pos = segment.row_position(row)
+            if pos is None:
+                continue
+            block_max = segment.row_block_max(pos)
+            passing = scale * (weight * block_max + remaining[step + 1]) + unseen_ub >= threshold
+            if seen is None and not passing.all():
+                seen = np.flatnonzero(alive)
+            docs, values, read = _read_blocks(segment, pos, passing, seen)
+            touched += read
+            if excluded is not None:
+                keep = ~excluded[docs]
+                docs, values = docs[keep], values[keep]
+            scores[docs] += values * weight
+            alive[docs] = True
+            updated.append(docs)
+        step += 1
+        if updated:
+            # Scores only grow, so the k best are among the previous k best and the docs
+            # this term updated.
+            changed = np.concatenate(updated)
+            in_top[top] = True
+            pool = np.concatenate([top, changed[~in_top[changed]]])
+            in_top[top] = False
+            top = _top_k_docs(pool, scores, offset_lb, k, scale)
+
+    # Lookup phase: only the surviving candidates, kept in compact arrays, are scored.
+    candidates = np.flatnonzero(alive)
+    partial = scores[candidates]
+    lower = offset_lb[candidates]
+    upper = offset_ub[candidates]
+    for step in range(step, len(order) + 1):
+        threshold = _kth(scale * partial + lower, k, floor, factor)
+        keep = scale * (partial + remaining[step]) + upper >= threshold
+        dead = len(keep) - int(np.count_nonzero(keep))
+        # Compacting is not free; a few stale candidates only cost a lookup each.
+        if dead and (step == len(order) or dead * 8 >= len(keep)):
+            candidates, partial = candidates[keep], partial[keep]
+            lower, upper = lower[keep], upper[keep]
+        if step == len(order) or not len(candidates):
+            break
+        pos, values, read = index.lookup(int(query_rows[order[step]]), candidates)
+        touched += read
+        partial[pos] += values * np.float32(query_weights[order[step]])
+
+    alive[:] = False
+    alive[candidates] = True
+    scores[candidates] = partial
+    return PrunedScores(
+        scores=scores,
+        alive=alive,
+        postings_touched=touched,
+        postings_total=int(row_nnz.sum()),
+    )
+
+
+def _read_blocks(
+    segment: PostingSegment,
+    pos: int,
+    passing: np.ndarray,
+    seen: np.ndarray | None,
+) -> tuple[np.ndarray, np.ndarray, int]:
+    """Postings of the passing blocks, plus those of `seen` docs in the skipped blocks."""
+    if passing.all():
+        docs, values = segment.row_postings(pos)
+        return docs, values, len(docs)
+    read_docs, read_values = segment.row_postings(pos, passing)
+    read = len(read_docs)
+    if seen is not None and len(seen):
+        # Blocks are doc-ordered, so a doc can only be in the block whose head precedes it.
+        block = np.searchsorted(segment.row_block_heads(pos), seen, side="right") - 1
+        probe = seen[(block >= 0) & ~passing[np.maximum(block, 0)]]
+        if len(probe):
+            docs, values = segment.row_postings(pos, ~passing)
+            at = np.minimum(np.searchsorted(docs, probe), len(docs) - 1)
+            hit = docs[at] == probe
+            read_docs = np.concatenate([read_docs, probe[hit]])
+            read_values = np.concatenate([read_values, values[at[hit]]])
+            read += len(probe)
+    return read_docs, read_values, read
+
+
+def _top_k_docs(
+    docs: np.ndarray,
+    scores: np.ndarray,
+    offset_lb: np.ndarray,
+    k: int,
+    scale: float,
+) -> np.ndarray:
+    if k <= 0 or len(docs) <= k:
+        return docs
+    lower = scale * scores[docs] + offset_lb[docs]
+    return docs[np.argpartition(lower, len(docs) - k)[len(docs) - k :]]
+
+
+def _kth(lower: np.ndarray, k: int, floor: float, factor: float) -> float:
+    """Score a doc must reach: the k-th best lower bound, at least `floor`, times `factor`."""
+    kth = -math.inf
+    if 0 < k <= len(lower):
+        kth = float(np.partition(lower, len(lower) - k)[len(lower) - k])
+    threshold = max(kth, floor)
+    return threshold * factor if threshold > 0 else threshold
+
+
+class PruningStats:
+    """Running totals of postings touched by pruned sparse searches."""
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.postings_touched = 0
+        self.postings_total = 0
+        self.last_touched = 0
+        self.last_total = 0
+        self._lock = Lock()
+
+    def record(self, touched: int, total: int) -> None:
+        with self._lock:
+            self.queries += 1
+            self.postings_touched += touched
+            self.postings_total += total
+            self.last_touched = touched
+            self.last_total = total
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "postings_touched": self.postings_touched,
+                "postings_total": self.postings_total,
+                "touched_ratio": (
+                    round(self.postings_touched / self.postings_total, 4)
+                    if self.postings_total
+                    else 0.0
+                ),
+                "last_touched": self.last_touched,
+                "last_total": self.last_total,
+            }
@@ -1,51 +1,174 @@
-import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
 
 from orchestrator_api.config import settings
+from orchestrator_api.rag.cache import TTLCache
+from orchestrator_api.rag.encoder import sparse_encoder
+from orchestrator_api.rag.indexes import indexes
 from orchestrator_api.rag.langchain_retriever import ExistingStoreRetriever
-from orchestrator_api.rag.store import store
+from orchestrator_api.rag.line_terms import LineTerms, query_terms, refine_line_span
 from orchestrator_api.schemas import Citation
 
-TOKEN_PATTERN = re.compile(r"[a-zA-Z0-9가-힣_]+")
+# Searches read an immutable index generation, so they can run side by side off the event loop.
+_search_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.rag_search_workers),
+    thread_name_prefix="rag-search",
+)
+
+# Ranked hits keyed by index generation: a write moves the index to a new generation, so
+# entries from before it are never hit again and just age out.
+result_cache = TTLCache(settings.rag_result_cache_size, settings.rag_result_cache_ttl_seconds)
+
+
+@dataclass(frozen=True)
+class RankedHits:
+    """One search, best first and unfiltered; citations at any `min_score` come from it.
+
+    Hits are the top `3 * top_k` by score, so the ones at or above a threshold are exactly
+    what a search run with that threshold would have returned. `spans` are the refined
+    line ranges of the hits.
+    """
+
+    top_k: int
+    hits: tuple[tuple[Any, float], ...]
+    spans: tuple[tuple[int, int], ...]
+
+    def citations(self, min_score: float = 0.0) -> list[Citation]:
+        citations: list[Citation] = []
+        chosen_ranges: dict[str, list[tuple[int, int]]] = {}
+        for (chunk, score), (refined_start, refined_end) in zip(self.hits, self.spans, strict=True):
+            if score < min_score:
+                continue
+            if _is_redundant(chunk.doc_id, refined_start, refined_end, chosen_ranges):
+                continue
+
+            citations.append(
+                Citation(
+                    doc_id=chunk.doc_id,
+                    chunk_id=chunk.chunk_id,
+                    snippet=chunk.text[:220],
+                    score=round(score, 4),
+                    line_start=refined_start,
+                    line_end=refined_end,
+                )
+            )
+            chosen_ranges.setdefault(chunk.doc_id, []).append((refined_start, refined_end))
+            if len(citations) >= self.top_k:
+                break
+        return citations
+
+
+async def aretrieve_citations(
+    query: str,
+    top_k: int = 3,
+    min_score: float = 0.0,
+    index_name: str | None = None,
+    query_encoding: str | None = None,
+) -> list[Citation]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _search_executor,
+        retrieve_citations,
+        query,
+        top_k,
+        min_score,
+        index_name,
+        query_encoding,
+    )
+
+
+async def aretrieve_citations_relaxed(
+    query: str,
+    top_k: int = 3,
+    min_score: float = 0.0,
+    index_name: str | None = None,
+    query_encoding: str | None = None,
+) -> tuple[list[Citation], bool]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _search_executor,
+        retrieve_citations_relaxed,
+        query,
+        top_k,
+        min_score,
+        index_name,
+        query_encoding,
+    )
 
 
 def retrieve_citations(
     query: str,
     top_k: int = 3,
     min_score: float = 0.0,
+    index_name: str | None = None,
+    query_encoding: str | None = None,
 ) -> list[Citation]:
-    results = _search_hits(query=query, top_k=top_k, min_score=min_score)
-
-    citations: list[Citation] = []
-    chosen_ranges: dict[str, list[tuple[int, int]]] = {}
-    for chunk, score in results:
-        refined_start, refined_end = _refine_line_span(
-            query,
-            chunk.text,
-            chunk.line_start,
-            chunk.line_end,
-        )
-        if _is_redundant(chunk.doc_id, refined_start, refined_end, chosen_ranges):
-            continue
+    return retrieve_ranked(query, top_k, index_name, query_encoding).citations(min_score)
 
-        citations.append(
-            Citation(
-                doc_id=chunk.doc_id,
-                chunk_id=chunk.chunk_id,
-                snippet=chunk.text[:220],
-                score=round(score, 4),
-                line_start=refined_start,
-                line_end=refined_end,
-            )
+
+def retrieve_citations_relaxed(
+    query: str,
+    top_k: int = 3,
+    min_score: float = 0.0,
+    index_name: str | None = None,
+    query_encoding: str | None = None,
+) -> tuple[list[Citation], bool]:
+    """Citations at `min_score`, else at any score; `True` when the threshold was dropped.
+
+    Both come from the same search, so a weak query is only scored once.
+    """
+    ranked = retrieve_ranked(query, top_k, index_name, query_encoding)
+    citations = ranked.citations(min_score)
+    if citations:
+        return citations, False
+    return ranked.citations(0.0), True
+
+
+def retrieve_ranked(
+    query: str,
+    top_k: int = 3,
+    index_name: str | None = None,
+    query_encoding: str | None = None,
+) -> RankedHits:
+    index = indexes.get(index_name)
+    # Resolved once and passed down, so `auto` caches under the encoding the search used.
+    query_encoding = sparse_encoder.resolve_query_encoding(query_encoding)
+    key = (" ".join(query.split()), top_k, index.name, index.generation, query_encoding)
+    ranked = result_cache.get(key)
+    if ranked is None:
+        hits = _search_hits(
+            query=query,
+            top_k=top_k,
+            min_score=0.0,
+            index_name=index.name,
+            query_encoding=query_encoding,
         )
-        chosen_ranges.setdefault(chunk.doc_id, []).append((refined_start, refined_end))
-        if len(citations) >= top_k:
-            break
-    return citations
+        terms = query_terms(query)
+        spans = [
+            refine_line_span(_line_terms_of(chunk), terms, chunk.line_start, chunk.line_end)
+            for chunk, _ in hits
+        ]
+        ranked = RankedHits(top_k=top_k, hits=tuple(hits), spans=tuple(spans))
+        result_cache.put(key, ranked)
+    return ranked
 
 
-def _search_hits(query: str, top_k: int, min_score: float) -> list[tuple]:
+def _search_hits(
+    query: str,
+    top_k: int,
+    min_score: float,
+    index_name: str | None = None,
+    query_encoding: str | None = None,
+) -> list[tuple]:
     if settings.use_langchain_pipeline:
-        retriever = ExistingStoreRetriever(top_k=top_k, min_score=min_score)
+        retriever = ExistingStoreRetriever(
+            top_k=top_k,
+            min_score=min_score,
+            index_name=index_name,
+            query_encoding=query_encoding,
+        )
         docs = retriever.invoke(query)
         hits: list[tuple] = []
         for doc in docs:
@@ -56,10 +179,16 @@ def _search_hits(query: str, top_k: int, min_score: float) -> list[tuple]:
                 text=doc.page_content,
                 line_start=int(metadata.get("line_start", 1)),
                 line_end=int(metadata.get("line_end", 1)),
+                line_terms=metadata.get("line_terms"),
             )
             hits.append((chunk, float(metadata.get("score", 0.0))))
         return hits
-    return store.search(query=query, top_k=max(top_k * 3, top_k), min_score=min_score)
+    return indexes.get(index_name).search(
+        query=query,
+        top_k=max(top_k * 3, top_k),
+        min_score=min_score,
+        query_encoding=query_encoding,
+    )
 
 
 class _PseudoChunk:
@@ -70,12 +199,21 @@ class _PseudoChunk:
         text: str,
         line_start: int,
         line_end: int,
+        line_terms: str | None = None,
     ) -> None:
         self.doc_id = doc_id
         self.chunk_id = chunk_id
         self.text = text
         self.line_start = line_start
         self.line_end = line_end
+        self.line_terms = line_terms
+
+
+def _line_terms_of(chunk) -> LineTerms:
+    # Chunks stored before the line index existed are indexed on the fly.
+    if chunk.line_terms:
+        return LineTerms.loads(chunk.line_terms)
+    return LineTerms.from_text(chunk.text)
 
 
 def _is_redundant(
@@ -101,45 +239,9 @@ def _refine_line_span(
     chunk_line_start: int,
     chunk_line_end: int,
 ) -> tuple[int, int]:
-    lines = text.splitlines()
-    if not lines:
-        return chunk_line_start, chunk_line_end
-
-    source_offset = chunk_line_start
-    if lines and lines[0].startswith("Section: "):
-        lines = lines[1:]
-    if not lines:
-        return chunk_line_start, chunk_line_end
-
-    query_terms = [token.lower() for token in TOKEN_PATTERN.findall(query) if len(token) >= 2]
-    if not query_terms:
-        return chunk_line_start, chunk_line_end
-
-    per_line_scores = []
-    for line in lines:
-        lowered = line.lower()
-        score = sum(1 for term in query_terms if term in lowered)
-        per_line_scores.append(score)
-
-    max_score = max(per_line_scores, default=0)
-    if max_score <= 0:
-        return chunk_line_start, chunk_line_end
-
-    best_idx = per_line_scores.index(max_score)
-    left = best_idx
-    right = best_idx
-
-    # Only expand span when signal is strong enough; single-term matches stay narrow.
-    if max_score > 1:
-        while left - 1 >= 0 and per_line_scores[left - 1] >= max_score:
-            left -= 1
-        while right + 1 < len(per_line_scores) and per_line_scores[right + 1] >= max_score:
-            right += 1
-
-    line_start = source_offset + left
-    line_end = source_offset + right
-    line_start = max(chunk_line_start, line_start)
-    line_end = min(chunk_line_end, line_end)
-    if line_start > line_end:
-        return chunk_line_start, chunk_line_end
-    return line_start, line_end
+    return refine_line_span(
+        LineTerms.from_text(text),
+        query_terms(query),
+        chunk_line_start,
+        chunk_line_end,
+    )
@@ -0,0 +1,116 @@
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from orchestrator_api.rag.sparse_index import PostingSegment
+
+SNAPSHOT_VERSION = 3
+_MANIFEST = "manifest.json"
+_SEGMENT_FIELDS = (
+    "row_ids",
+    "indptr",
+    "doc_base",
+    "doc_delta",
+    "weights",
+    "row_max",
+    "block_ptr",
+    "block_max",
+)
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """Derived index state of a store, tied to the SQLite data by `index_version`."""
+
+    index_version: str
+    backend: str
+    vocab: list[str]
+    doc_lengths: np.ndarray
+    doc_norms: np.ndarray
+    terms: PostingSegment
+    headings: PostingSegment
+    postings: PostingSegment | None = None
+
+    @property
+    def doc_count(self) -> int:
+        return int(self.doc_lengths.shape[0])
+
+
+def snapshot_path_for(db_path: Path) -> Path:
+    return db_path.with_name(f"{db_path.stem}.snapshot")
+
+
+def write_snapshot(path: Path, snapshot: IndexSnapshot) -> None:
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+
+    segments = {"terms": snapshot.terms, "headings": snapshot.headings}
+    if snapshot.postings is not None:
+        segments["postings"] = snapshot.postings
+    for name, segment in segments.items():
+        for field in _SEGMENT_FIELDS:
+            np.save(tmp_path / f"{name}.{field}.npy", getattr(segment, field))
+    np.save(tmp_path / "doc_lengths.npy", snapshot.doc_lengths)
+    np.save(tmp_path / "doc_norms.npy", snapshot.doc_norms)
+    (tmp_path / "vocab.json").write_text(
+        json.dumps(snapshot.vocab, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    # Manifest goes last: a directory without it is never loaded.
+    manifest = {
+        "format_version": SNAPSHOT_VERSION,
+        "index_version": snapshot.index_version,
+        "backend": snapshot.backend,
+        "doc_count": snapshot.doc_count,
+        "segments": sorted(segments),
+    }
+    (tmp_path / _MANIFEST).write_text(json.dumps(manifest), encoding="utf-8")
+
+    # Readers may still have the previous files memory-mapped, so swap directories
+    # instead of overwriting arrays in place.
+    old_path = path.with_name(f"{path.name}.old-{os.getpid()}")
+    if path.exists():
+        path.rename(old_path)
+    tmp_path.rename(path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def load_snapshot(path: Path) -> IndexSnapshot | None:
+    manifest_path = path / _MANIFEST
+    if not manifest_path.exists():
+        return None
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("format_version") != SNAPSHOT_VERSION:
+            return None
+
+        segments = {
+            name: PostingSegment(
+                **{
+                    field: np.load(path / f"{name}.{field}.npy", mmap_mode="r")
+                    for field in _SEGMENT_FIELDS
+                }
+            )
+            for name in manifest["segments"]
+        }
+        return IndexSnapshot(
+            index_version=str(manifest["index_version"]),
+            backend=str(manifest["backend"]),
+            vocab=json.loads((path / "vocab.json").read_text(encoding="utf-8")),
+            doc_lengths=np.load(path / "doc_lengths.npy", mmap_mode="r"),
+            doc_norms=np.load(path / "doc_norms.npy", mmap_mode="r"),
+            terms=segments["terms"],
+            headings=segments["headings"],
+            postings=segments.get("postings"),
+        )
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def remove_snapshot(path: Path) -> None:
+    shutil.rmtree(path, ignore_errors=True)
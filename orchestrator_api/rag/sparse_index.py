@@ -0,0 +1,328 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+# Postings per block: the unit of block-max bounds and of doc id coding.
+BLOCK_SIZE = 64
+# In-memory/snapshot dtype of posting weights. `uint8` is scaled by the block max.
+WEIGHT_FORMATS = ("float32", "float16", "uint8")
+
+
+@dataclass(frozen=True)
+class PostingSegment:
+    """Row-major (token x doc) CSR block that only stores rows present in it.
+
+    Each row's postings are cut into blocks of BLOCK_SIZE (row i owns blocks
+    `block_ptr[i]:block_ptr[i + 1]`). A doc id is stored as its offset from the first doc
+    of its block (uint16 when every block spans fewer than 65536 docs), and `block_max`
+    and `row_max` bound the weights for pruning.
+    """
+
+    row_ids: np.ndarray
+    indptr: np.ndarray
+    doc_base: np.ndarray
+    doc_delta: np.ndarray
+    weights: np.ndarray
+    row_max: np.ndarray
+    block_ptr: np.ndarray
+    block_max: np.ndarray
+
+    @classmethod
+    def from_triples(
+        cls,
+        rows: np.ndarray,
+        docs: np.ndarray,
+        values: np.ndarray,
+        weight_format: str = "float32",
+    ) -> "PostingSegment":
+        if weight_format not in WEIGHT_FORMATS:
+            raise ValueError(f"unknown posting weight format: {weight_format!r}")
+        rows = np.asarray(rows, dtype=np.int64)
+        docs = np.asarray(docs, dtype=np.int32)
+        values = np.asarray(values, dtype=np.float32)
+        order = np.lexsort((docs, rows))
+        rows, docs, values = rows[order], docs[order], values[order]
+
+        row_ids, counts = np.unique(rows, return_counts=True)
+        indptr = np.zeros(len(row_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        n_blocks = -(-counts // BLOCK_SIZE)
+        block_ptr = np.zeros(len(row_ids) + 1, dtype=np.int64)
+        np.cumsum(n_blocks, out=block_ptr[1:])
+        block_starts = _block_starts(indptr, block_ptr)
+        blocks = _posting_blocks(block_starts, len(docs))
+
+        doc_base = docs[block_starts]
+        doc_delta = docs - doc_base[blocks]
+        delta_dtype = np.uint16 if not len(doc_delta) or doc_delta.max() <= 0xFFFF else np.uint32
+
+        if weight_format == "float16":
+            # Bounds must hold for the stored values, so they are computed after rounding.
+            values = values.astype(np.float16).astype(np.float32)
+        block_max = np.zeros(0, dtype=np.float32)
+        row_max = np.zeros(0, dtype=np.float32)
+        if len(values):
+            block_max = np.maximum.reduceat(values, block_starts)
+            row_max = np.maximum.reduceat(block_max, block_ptr[:-1])
+        if weight_format == "uint8":
+            scale = np.where(block_max > 0, block_max, 1)[blocks]
+            weights = np.clip(np.rint(values / scale * 255), 0, 255).astype(np.uint8)
+        else:
+            weights = values.astype(weight_format)
+        return cls(
+            row_ids=row_ids,
+            indptr=indptr,
+            doc_base=doc_base,
+            doc_delta=doc_delta.astype(delta_dtype),
+            weights=weights,
+            row_max=row_max,
+            block_ptr=block_ptr,
+            block_max=block_max,
+        )
+
+    @property
+    def nnz(self) -> int:
+        return int(self.doc_delta.shape[0])
+
+    @property
+    def weight_format(self) -> str:
+        return self.weights.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.__dataclass_fields__)
+
+    def to_triples(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        rows = np.repeat(self.row_ids, np.diff(self.indptr))
+        blocks = _posting_blocks(_block_starts(self.indptr, self.block_ptr), self.nnz)
+        docs, values = self._decode(np.arange(self.nnz), blocks)
+        return rows, docs, values
+
+    def row_position(self, row: int) -> int | None:
+        pos = int(np.searchsorted(self.row_ids, row))
+        if pos == len(self.row_ids) or self.row_ids[pos] != row:
+            return None
+        return pos
+
+    def row_block_max(self, pos: int) -> np.ndarray:
+        return self.block_max[self.block_ptr[pos] : self.block_ptr[pos + 1]]
+
+    def row_block_heads(self, pos: int) -> np.ndarray:
+        """First doc of each block of the row at `pos`."""
+        return self.doc_base[self.block_ptr[pos] : self.block_ptr[pos + 1]]
+
+    def row_postings(
+        self,
+        pos: int,
+        blocks: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Decoded (doc indices, values) of the row at `pos`, or of its `blocks` mask."""
+        start, end = int(self.indptr[pos]), int(self.indptr[pos + 1])
+        first, last = int(self.block_ptr[pos]), int(self.block_ptr[pos + 1])
+        # Slicing the row is much cheaper than fancy-indexing its postings.
+        docs = np.repeat(self.doc_base[first:last], BLOCK_SIZE)[: end - start]
+        docs = (docs + self.doc_delta[start:end]).astype(np.int32, copy=False)
+        values = self.weights[start:end]
+        if values.dtype == np.uint8:
+            scale = np.repeat(self.block_max[first:last], BLOCK_SIZE)[: end - start]
+            values = scale * _dequantize(values)
+        values = values.astype(np.float32, copy=False)
+        if blocks is not None:
+            keep = np.repeat(blocks, BLOCK_SIZE)[: end - start]
+            docs, values = docs[keep], values[keep]
+        return docs, values
+
+    def lookup(self, row: int, docs: np.ndarray) -> tuple[np.ndarray, np.ndarray, int]:
+        """Values of `row` at the sorted doc indices `docs`.
+
+        Returns (positions in `docs` that have a posting, their values, postings read),
+        walking whichever side is shorter: the posting list, or one binary search per doc.
+        """
+        pos = self.row_position(row)
+        if pos is None or not len(docs):
+            return _EMPTY_GATHER[0], _EMPTY_GATHER[2], 0
+        row_docs, row_values = self.row_postings(pos)
+        if len(row_docs) <= len(docs):
+            pos = np.minimum(np.searchsorted(docs, row_docs), len(docs) - 1)
+            hit = np.flatnonzero(docs[pos] == row_docs)
+            return pos[hit], row_values[hit], len(row_docs)
+        pos = np.minimum(np.searchsorted(row_docs, docs), len(row_docs) - 1)
+        hit = np.flatnonzero(row_docs[pos] == docs)
+        return hit, row_values[pos[hit]], len(docs)
+
+    def gather(self, query_rows: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return (query position, doc index, value) for every posting of `query_rows`."""
+        if not len(self.row_ids) or not len(query_rows):
+            return _EMPTY_GATHER
+
+        pos = np.searchsorted(self.row_ids, query_rows)
+        pos = np.minimum(pos, len(self.row_ids) - 1)
+        hit = np.flatnonzero(self.row_ids[pos] == query_rows)
+        if not len(hit):
+            return _EMPTY_GATHER
+
+        parts = [self.row_postings(int(row_pos)) for row_pos in pos[hit]]
+        lengths = [len(docs) for docs, _ in parts]
+        return (
+            np.repeat(hit, lengths),
+            np.concatenate([docs for docs, _ in parts]),
+            np.concatenate([values for _, values in parts]),
+        )
+
+    def _decode(self, offsets: np.ndarray, blocks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        docs = (self.doc_base[blocks] + self.doc_delta[offsets]).astype(np.int32, copy=False)
+        values = self.weights[offsets]
+        if values.dtype == np.uint8:
+            values = self.block_max[blocks] * _dequantize(values)
+        return docs, values.astype(np.float32, copy=False)
+
+
+def _dequantize(values: np.ndarray) -> np.ndarray:
+    # q / 255 is exactly 1 at q == 255, so no value exceeds its block max.
+    return values.astype(np.float32) / np.float32(255)
+
+
+def _block_starts(indptr: np.ndarray, block_ptr: np.ndarray) -> np.ndarray:
+    """Offset of the first posting of every block."""
+    n_blocks = np.diff(block_ptr)
+    starts = np.repeat(indptr[:-1] - block_ptr[:-1] * BLOCK_SIZE, n_blocks)
+    return starts + np.arange(block_ptr[-1]) * BLOCK_SIZE
+
+
+def _posting_blocks(block_starts: np.ndarray, nnz: int) -> np.ndarray:
+    """Block of every posting."""
+    return np.repeat(np.arange(len(block_starts)), np.diff(np.append(block_starts, nnz)))
+
+
+_EMPTY_GATHER = (
+    np.zeros(0, dtype=np.int64),
+    np.zeros(0, dtype=np.int32),
+    np.zeros(0, dtype=np.float32),
+)
+
+
+@dataclass(frozen=True)
+class SparseMatrixIndex:
+    """Immutable vocab x docs matrix kept as CSR segments appended on ingest.
+
+    `append` returns a new index that shares the untouched segments, so readers holding
+    the previous value keep a consistent view. Segments are merged binary-counter style
+    so that their number stays logarithmic in the number of appends. Values are stored
+    as `weight_format` and read back as float32.
+    """
+
+    segments: tuple[PostingSegment, ...] = ()
+    weight_format: str = "float32"
+
+    @classmethod
+    def from_segment(cls, segment: PostingSegment) -> "SparseMatrixIndex":
+        return cls((segment,) if segment.nnz else (), segment.weight_format)
+
+    @property
+    def nnz(self) -> int:
+        return sum(segment.nnz for segment in self.segments)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(segment.nbytes for segment in self.segments)
+
+    def append(self, rows: np.ndarray, docs: np.ndarray, values: np.ndarray) -> "SparseMatrixIndex":
+        if not len(rows):
+            return self
+        segment = PostingSegment.from_triples(rows, docs, values, self.weight_format)
+        segments = [*self.segments, segment]
+        while len(segments) > 1 and segments[-1].nnz >= segments[-2].nnz:
+            newer = segments.pop()
+            older = segments.pop()
+            segments.append(_merge_segments([older, newer], self.weight_format))
+        return SparseMatrixIndex(tuple(segments), self.weight_format)
+
+    def merged(self) -> PostingSegment:
+        """All segments as a single segment."""
+        if not self.segments:
+            return PostingSegment.from_triples(
+                np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.int32),
+                np.zeros(0, dtype=np.float32),
+                self.weight_format,
+            )
+        if len(self.segments) == 1:
+            return self.segments[0]
+        return _merge_segments(list(self.segments), self.weight_format)
+
+    def gather(self, query_rows: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        query_rows = np.asarray(query_rows, dtype=np.int64)
+        parts = [segment.gather(query_rows) for segment in self.segments]
+        parts = [part for part in parts if len(part[0])]
+        if not parts:
+            return _EMPTY_GATHER
+        if len(parts) == 1:
+            return parts[0]
+        return tuple(np.concatenate(column) for column in zip(*parts, strict=True))
+
+    def row_stats(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """(max value, posting count) of each of `rows` across all segments."""
+        rows = np.asarray(rows, dtype=np.int64)
+        row_max = np.zeros(len(rows), dtype=np.float32)
+        row_nnz = np.zeros(len(rows), dtype=np.int64)
+        for segment in self.segments:
+            if not len(segment.row_ids):
+                continue
+            pos = np.minimum(np.searchsorted(segment.row_ids, rows), len(segment.row_ids) - 1)
+            hit = np.flatnonzero(segment.row_ids[pos] == rows)
+            row_max[hit] = np.maximum(row_max[hit], segment.row_max[pos[hit]])
+            row_nnz[hit] += segment.indptr[pos[hit] + 1] - segment.indptr[pos[hit]]
+        return row_max, row_nnz
+
+    def lookup(self, row: int, docs: np.ndarray) -> tuple[np.ndarray, np.ndarray, int]:
+        """`PostingSegment.lookup` over every segment; a doc lives in one segment only."""
+        parts = [segment.lookup(row, docs) for segment in self.segments]
+        found = [part for part in parts if len(part[0])]
+        read = sum(part[2] for part in parts)
+        if not found:
+            return _EMPTY_GATHER[0], _EMPTY_GATHER[2], read
+        if len(found) == 1:
+            return found[0][0], found[0][1], read
+        return (
+            np.concatenate([part[0] for part in found]),
+            np.concatenate([part[1] for part in found]),
+            read,
+        )
+
+    def remap_docs(self, doc_map: np.ndarray) -> "SparseMatrixIndex":
+        """Renumber doc columns through `doc_map`; columns mapped to -1 are dropped."""
+        rows, docs, values = self.merged().to_triples()
+        new_docs = doc_map[docs]
+        keep = new_docs >= 0
+        return SparseMatrixIndex.from_segment(
+            PostingSegment.from_triples(
+                rows[keep], new_docs[keep], values[keep], self.weight_format
+            )
+        )
+
+    def matvec(self, query_rows: np.ndarray, query_weights: np.ndarray, n_docs: int) -> np.ndarray:
+        """Score every doc as the dot product of its column with the sparse query."""
+        query_pos, docs, values = self.gather(query_rows)
+        if not len(docs):
+            return np.zeros(n_docs, dtype=np.float64)
+        weights = values * np.asarray(query_weights, dtype=np.float32)[query_pos]
+        return np.bincount(docs, weights=weights, minlength=n_docs)[:n_docs]
+
+
+def _merge_segments(segments: list[PostingSegment], weight_format: str) -> PostingSegment:
+    triples = [segment.to_triples() for segment in segments]
+    rows, docs, values = (np.concatenate(column) for column in zip(*triples, strict=True))
+    return PostingSegment.from_triples(rows, docs, values, weight_format)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` largest scores, best first, ties broken by index."""
+    if k <= 0 or not len(scores):
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        selected = np.flatnonzero(scores >= kth)
+    else:
+        selected = np.arange(len(scores))
+    order = np.lexsort((selected, -scores[selected]))
+    return selected[order][:k]
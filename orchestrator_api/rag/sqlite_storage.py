@@ -0,0 +1,274 @@
+import sqlite3
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock, RLock
+from uuid import uuid4
+
+import numpy as np
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    # WAL + NORMAL only risks the last transactions on power loss, never corruption.
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+_READER_PRAGMAS = (
+    "PRAGMA cache_size=-16384",
+    "PRAGMA mmap_size=268435456",
+)
+
+_POSTINGS_DDL = """
+    CREATE TABLE IF NOT EXISTS postings (
+        token_id INTEGER NOT NULL,
+        doc_idx INTEGER NOT NULL,
+        weight REAL NOT NULL,
+        PRIMARY KEY (token_id, doc_idx)
+    ) WITHOUT ROWID
+"""
+
+ChunkRow = tuple[int, str, str, str, int, int, str | None]
+
+
+class SQLiteStorage:
+    """Persistent connection and SQL for one store file.
+
+    Postings are clustered on (token_id, doc_idx) so a token's postings are one
+    sequential range. Writes go through `transaction()`; the connection is shared and
+    serialized by an internal lock. Chunk text is read at query time over a second,
+    read-only connection, which WAL lets proceed while a write transaction is open.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self._conn: sqlite3.Connection | None = None
+        self._reader: sqlite3.Connection | None = None
+        self._lock = RLock()
+        self._read_lock = Lock()
+        self.ensure_open()
+
+    def ensure_open(self) -> None:
+        """(Re)open the connection, e.g. after the file was removed from under us."""
+        with self._lock:
+            if self._conn is not None and self.db_path.exists():
+                return
+            if self._conn is not None:
+                self._conn.close()
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.db_path,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=256,
+            )
+            for pragma in PRAGMAS:
+                self._conn.execute(pragma)
+            self._init_schema()
+            with self._read_lock:
+                if self._reader is not None:
+                    self._reader.close()
+                self._reader = sqlite3.connect(
+                    f"{self.db_path.as_uri()}?mode=ro",
+                    uri=True,
+                    check_same_thread=False,
+                )
+                for pragma in _READER_PRAGMAS:
+                    self._reader.execute(pragma)
+
+    def close(self) -> None:
+        with self._lock, self._read_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def get_meta(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def set_meta(conn: sqlite3.Connection, key: str, value: str) -> None:
+        conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES(?, ?)", (key, value))
+
+    @classmethod
+    def bump_index_version(cls, conn: sqlite3.Connection) -> str:
+        index_version = uuid4().hex
+        cls.set_meta(conn, "index_version", index_version)
+        return index_version
+
+    @staticmethod
+    def insert_chunks(conn: sqlite3.Connection, rows: Iterable[ChunkRow]) -> None:
+        conn.executemany(
+            "INSERT INTO chunks(doc_idx, doc_id, chunk_id, text, line_start, line_end, line_terms) "
+            "VALUES(?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    @staticmethod
+    def insert_postings(
+        conn: sqlite3.Connection,
+        rows: Iterable[tuple[int, int, float]],
+    ) -> None:
+        conn.executemany("INSERT INTO postings(token_id, doc_idx, weight) VALUES(?, ?, ?)", rows)
+
+    @staticmethod
+    def delete_docs(conn: sqlite3.Connection, doc_indices: list[int]) -> None:
+        params = [(doc_index,) for doc_index in doc_indices]
+        conn.executemany("DELETE FROM chunks WHERE doc_idx = ?", params)
+        conn.executemany("DELETE FROM postings WHERE doc_idx = ?", params)
+
+    @staticmethod
+    def renumber_docs(conn: sqlite3.Connection, moves: list[tuple[int, int]]) -> None:
+        """Apply (new, old) doc_idx moves without tripping the primary keys midway."""
+        if not moves:
+            return
+        conn.execute("CREATE TEMP TABLE doc_map (old INTEGER PRIMARY KEY, new INTEGER NOT NULL)")
+        conn.executemany("INSERT INTO doc_map(new, old) VALUES(?, ?)", moves)
+        # Park moved rows on negative ids first; those cannot collide with anything.
+        for table in ("chunks", "postings"):
+            conn.execute(
+                f"UPDATE {table} SET doc_idx = -1 - "
+                f"(SELECT new FROM doc_map WHERE old = {table}.doc_idx) "
+                "WHERE doc_idx IN (SELECT old FROM doc_map)"
+            )
+            conn.execute(f"UPDATE {table} SET doc_idx = -1 - doc_idx WHERE doc_idx < 0")
+        conn.execute("DROP TABLE doc_map")
+
+    @staticmethod
+    def upsert_sources(
+        conn: sqlite3.Connection,
+        rows: Iterable[tuple[str, str, float, int]],
+    ) -> None:
+        conn.executemany(
+            "INSERT OR REPLACE INTO sources(doc_id, content_hash, mtime, size) "
+            "VALUES(?, ?, ?, ?)",
+            rows,
+        )
+
+    @staticmethod
+    def delete_source(conn: sqlite3.Connection, doc_id: str) -> None:
+        conn.execute("DELETE FROM sources WHERE doc_id = ?", (doc_id,))
+
+    def load_sources(self) -> list[tuple[str, str, float, int]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT doc_id, content_hash, mtime, size FROM sources"
+            ).fetchall()
+
+    def load_chunk_index(self) -> list[tuple[int, str, str, int, int]]:
+        """`(doc_idx, doc_id, chunk_id, line_start, line_end)` of every chunk, without text."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT doc_idx, doc_id, chunk_id, line_start, line_end "
+                "FROM chunks ORDER BY doc_idx"
+            ).fetchall()
+
+    def load_texts(self) -> list[tuple[int, str]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT doc_idx, text FROM chunks ORDER BY doc_idx"
+            ).fetchall()
+
+    def fetch_chunks(self, chunk_ids: list[str]) -> dict[str, tuple[str, str | None]]:
+        """`(text, line_terms)` by chunk id; ids that are no longer stored are left out."""
+        if not chunk_ids:
+            return {}
+        placeholders = ", ".join("?" * len(chunk_ids))
+        with self._read_lock:
+            rows = self._reader.execute(
+                f"SELECT chunk_id, text, line_terms FROM chunks WHERE chunk_id IN ({placeholders})",
+                chunk_ids,
+            ).fetchall()
+        return {chunk_id: (text, line_terms) for chunk_id, text, line_terms in rows}
+
+    def load_postings(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        with self._lock:
+            rows = self._conn.execute("SELECT token_id, doc_idx, weight FROM postings").fetchall()
+        table = np.asarray(rows, dtype=np.float64).reshape(-1, 3)
+        return (
+            table[:, 0].astype(np.int64),
+            table[:, 1].astype(np.int32),
+            table[:, 2].astype(np.float32),
+        )
+
+    def clear(self) -> None:
+        with self.transaction() as conn:
+            for table in ("postings", "lexical", "chunks", "sources", "meta"):
+                conn.execute(f"DELETE FROM {table}")
+
+    def _init_schema(self) -> None:
+        conn = self._conn
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                doc_idx INTEGER PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                chunk_id TEXT NOT NULL UNIQUE,
+                text TEXT NOT NULL,
+                line_start INTEGER NOT NULL,
+                line_end INTEGER NOT NULL,
+                line_terms TEXT
+            )
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(chunks)")}
+        if "line_terms" not in columns:
+            # Older files: chunks without a line index are refined from their text.
+            conn.execute("ALTER TABLE chunks ADD COLUMN line_terms TEXT")
+        self._migrate_postings()
+        conn.execute(_POSTINGS_DDL)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings(doc_idx)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sources (
+                doc_id TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS lexical (
+                doc_idx INTEGER PRIMARY KEY,
+                embedding_json TEXT NOT NULL
+            )
+            """
+        )
+
+    def _migrate_postings(self) -> None:
+        row = self._conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'postings'"
+        ).fetchone()
+        if row is None or "WITHOUT ROWID" in row[0].upper():
+            return
+        # Files written before the clustered layout: copy into the new table once.
+        with self.transaction() as conn:
+            conn.execute("ALTER TABLE postings RENAME TO postings_heap")
+            conn.execute("DROP INDEX IF EXISTS idx_postings_token")
+            conn.execute("DROP INDEX IF EXISTS idx_postings_doc")
+            conn.execute(_POSTINGS_DDL)
+            conn.execute(
+                "INSERT OR REPLACE INTO postings(token_id, doc_idx, weight) "
+                "SELECT token_id, doc_idx, weight FROM postings_heap ORDER BY token_id, doc_idx"
+            )
+            conn.execute("DROP TABLE postings_heap")
@@ -1,18 +1,29 @@
-import json
 import math
 import sqlite3
-from collections import Counter, defaultdict
-from dataclasses import dataclass
+from collections import Counter
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from threading import Lock
+from threading import Lock, Thread
+from typing import NamedTuple
 
 import numpy as np
-import torch
-from sentence_transformers import SparseEncoder
-from transformers import AutoTokenizer
 
 from orchestrator_api.config import settings
-from orchestrator_api.rag.embedder import cosine_similarity, embed_text
+from orchestrator_api.rag.chunk_table import NO_DOC, ChunkTable
+from orchestrator_api.rag.embedder import embed_text
+from orchestrator_api.rag.encoder import SparseVector, sparse_encoder
+from orchestrator_api.rag.inference_free import QUERY_ENCODINGS
+from orchestrator_api.rag.line_terms import build_line_terms
+from orchestrator_api.rag.pruning import PRUNING_MODES, PruningStats, maxscore_top_k
+from orchestrator_api.rag.snapshot import (
+    IndexSnapshot,
+    load_snapshot,
+    remove_snapshot,
+    snapshot_path_for,
+    write_snapshot,
+)
+from orchestrator_api.rag.sparse_index import WEIGHT_FORMATS, SparseMatrixIndex, top_k_indices
+from orchestrator_api.rag.sqlite_storage import ChunkRow, SQLiteStorage
 
 
 @dataclass
@@ -22,418 +33,763 @@ class ChunkRecord:
     text: str
     line_start: int
     line_end: int
+    # `LineTerms` of the text, serialized; filled in when the chunk is stored.
+    line_terms: str | None = None
+
+
+class SourceState(NamedTuple):
+    """Fingerprint of the file a document was ingested from."""
+
+    content_hash: str
+    mtime: float
+    size: int
+
+
+@dataclass(frozen=True)
+class IndexGeneration:
+    """Immutable view of the index that searches run against without locking.
+
+    `term_ids` is a shared append-only dict whose ids never change meaning. `chunks`
+    holds the ids and line ranges of the first `doc_count` doc indices; chunk text is only
+    read from SQLite for the hits a search returns. Deleted doc indices stay in place,
+    flagged in `deleted`, until compaction.
+    """
+
+    generation: int = 0
+    backend: str = "lexical"
+    chunks: ChunkTable = field(default_factory=ChunkTable)
+    doc_count: int = 0
+    term_ids: dict[str, int] = field(default_factory=dict)
+    # SPLADE weights (token id x doc), term frequencies and first-line terms (term id x doc).
+    postings: SparseMatrixIndex = SparseMatrixIndex()
+    terms: SparseMatrixIndex = SparseMatrixIndex()
+    headings: SparseMatrixIndex = SparseMatrixIndex()
+    doc_lengths: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.float32))
+    doc_norms: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.float32))
+    avg_doc_length: float = 0.0
+    deleted: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=bool))
+    tombstones: int = 0
+
+    @property
+    def live_count(self) -> int:
+        return self.doc_count - self.tombstones
+
+    def query_term_rows(self, query_tf: Counter[str]) -> tuple[np.ndarray, np.ndarray]:
+        rows: list[int] = []
+        counts: list[int] = []
+        for term, count in query_tf.items():
+            row = self.term_ids.get(term)
+            if row is not None:
+                rows.append(row)
+                counts.append(count)
+        return np.asarray(rows, dtype=np.int64), np.asarray(counts, dtype=np.float32)
+
+    def bm25_scores(self, query_tf: Counter[str]) -> np.ndarray:
+        total_docs = self.doc_count
+        rows, _ = self.query_term_rows(query_tf)
+        query_pos, docs, tf = self.terms.gather(rows)
+        if not len(docs):
+            return np.zeros(total_docs, dtype=np.float64)
+
+        avgdl = self.avg_doc_length or 1.0
+        k1 = settings.rag_bm25_k1
+        b = settings.rag_bm25_b
+
+        df = np.bincount(query_pos, minlength=len(rows))
+        idf = np.log1p((total_docs - df + 0.5) / (df + 0.5))
+        dl = np.maximum(self.doc_lengths[docs], 1.0)
+        denom = tf + k1 * (1.0 - b + b * (dl / avgdl))
+        contrib = idf[query_pos] * ((tf * (k1 + 1.0)) / denom)
+        return np.bincount(docs, weights=contrib, minlength=total_docs)[:total_docs]
+
+    def token_idf(self, rows: np.ndarray) -> np.ndarray:
+        """BM25 IDF of SPLADE token `rows` over their postings; 0 for tokens never indexed."""
+        _, df = self.postings.row_stats(rows)
+        idf = np.log1p((self.doc_count - df + 0.5) / (df + 0.5))
+        return np.where(df > 0, idf, 0.0)
+
+    def lexical_scores(self, query_tf: Counter[str]) -> np.ndarray:
+        rows, counts = self.query_term_rows(query_tf)
+        dots = self.terms.matvec(rows, counts, self.doc_count)
+        query_norm = math.sqrt(sum(count * count for count in query_tf.values()))
+        if query_norm == 0:
+            return dots
+        norms = self.doc_norms.astype(np.float64) * query_norm
+        return np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+
+    def heading_boosts(self, query_tf: Counter[str], doc_indices: np.ndarray) -> np.ndarray:
+        if not query_tf or not len(doc_indices):
+            return np.zeros(len(doc_indices), dtype=np.float64)
+        rows, _ = self.query_term_rows(query_tf)
+        coverage = self.headings.matvec(rows, np.ones(len(rows)), self.doc_count)[doc_indices]
+        return (coverage / len(query_tf)) * settings.rag_rerank_heading_boost
 
 
 class SparseVectorStore:
-    def __init__(self) -> None:
-        self._records: list[ChunkRecord] = []
+    def __init__(self, db_path: str | Path | None = None, name: str | None = None) -> None:
+        self.name = name or settings.rag_index_name
+        self._generation = IndexGeneration()
         self._chunk_ids: set[str] = set()
-        self._postings: dict[int, list[tuple[int, float]]] = defaultdict(list)
-        self._lexical_embeddings: list[Counter[str]] = []
-        self._doc_term_freqs: list[Counter[str]] = []
-        self._doc_lengths: list[int] = []
-        self._doc_freqs: Counter[str] = Counter()
-        self._avg_doc_length: float = 0.0
-
-        self._model = None
-        self._tokenizer = None
-        self._special_ids: set[int] = set()
+        self._doc_indices: dict[str, list[int]] = {}
+        self.compaction_ratio = settings.rag_compaction_tombstone_ratio
+        if settings.rag_posting_weights not in WEIGHT_FORMATS:
+            raise ValueError(f"unknown RAG_POSTING_WEIGHTS: {settings.rag_posting_weights!r}")
+        self.posting_weights = settings.rag_posting_weights
+        if settings.rag_sparse_pruning not in PRUNING_MODES:
+            raise ValueError(f"unknown RAG_SPARSE_PRUNING: {settings.rag_sparse_pruning!r}")
+        self.pruning_mode = settings.rag_sparse_pruning
+        self.pruning_factor = max(1.0, settings.rag_sparse_pruning_factor)
+        self.pruning_stats = PruningStats()
+        if settings.rag_query_encoding not in QUERY_ENCODINGS:
+            raise ValueError(f"unknown RAG_QUERY_ENCODING: {settings.rag_query_encoding!r}")
+        self._compaction_thread: Thread | None = None
+
+        # `_backend` is resolved once the shared encoder settles; `_stored_backend` is the
+        # encoder that produced the rows on disk.
         self._backend = "uninitialized"
-        self._backend_error: str | None = None
+        self._stored_backend: str | None = None
 
-        self._db_path = Path(settings.rag_store_db_path)
+        self._db_path = Path(db_path or settings.rag_store_db_path)
         if not self._db_path.is_absolute():
             self._db_path = Path.cwd() / self._db_path
-        self._db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._snapshot_path = snapshot_path_for(self._db_path)
+        self._storage = SQLiteStorage(self._db_path)
 
         self._disk_loaded = False
+        # Serializes writers only; searches read the published generation.
         self._lock = Lock()
-        self._init_db()
 
-    def add(self, chunks: list[ChunkRecord]) -> None:
+    def add(
+        self,
+        chunks: list[ChunkRecord],
+        vectors: list[SparseVector] | None = None,
+    ) -> None:
+        """Append chunks whose ids are not stored yet; `vectors` as in `upsert_documents`."""
         if not chunks:
             return
 
+        # Documents are encoded with the final backend, so wait for warm-up outside the lock.
+        sparse_encoder.wait_ready()
         with self._lock:
             self._ensure_ready_locked()
 
-            pending = [chunk for chunk in chunks if chunk.chunk_id not in self._chunk_ids]
-            if not pending:
+            kept = [i for i, chunk in enumerate(chunks) if chunk.chunk_id not in self._chunk_ids]
+            if not kept:
                 return
+            self._apply_locked(
+                [chunks[i] for i in kept],
+                doomed=[],
+                vectors=[vectors[i] for i in kept] if vectors is not None else None,
+            )
 
-            if self._backend == "sparse":
-                self._add_sparse_locked(pending)
-            else:
-                self._add_lexical_locked(pending)
+    def upsert_document(
+        self,
+        doc_id: str,
+        chunks: list[ChunkRecord],
+        source: SourceState | None = None,
+    ) -> None:
+        """Replace every chunk of `doc_id` with `chunks` in a single generation."""
+        self.upsert_documents([(doc_id, chunks, source)])
+
+    def upsert_documents(
+        self,
+        documents: list[tuple[str, list[ChunkRecord], SourceState | None]],
+        vectors: list[SparseVector] | None = None,
+    ) -> None:
+        """Replace several documents in one SQLite transaction and one generation.
+
+        `vectors` may carry the SPLADE encodings of all chunks, in order, when the caller
+        encoded them outside the store lock.
+        """
+        for doc_id, chunks, _ in documents:
+            if any(chunk.doc_id != doc_id for chunk in chunks):
+                raise ValueError(f"chunks must all belong to document {doc_id!r}")
+        if len({doc_id for doc_id, _, _ in documents}) != len(documents):
+            raise ValueError("each document may only appear once per upsert")
+
+        sparse_encoder.wait_ready()
+        with self._lock:
+            self._ensure_ready_locked()
+            pending = [chunk for _, chunks, _ in documents for chunk in chunks]
+            doomed = [
+                doc_index
+                for doc_id, _, _ in documents
+                for doc_index in self._doc_indices.get(doc_id, [])
+            ]
+            sources = [(doc_id, source) for doc_id, _, source in documents if source]
+            if pending or doomed or sources:
+                self._apply_locked(pending, doomed=doomed, sources=sources, vectors=vectors)
+
+    def delete_document(self, doc_id: str) -> int:
+        """Tombstone the chunks of `doc_id`; returns how many were removed."""
+        sparse_encoder.wait_ready()
+        with self._lock:
+            self._ensure_ready_locked()
+            doomed = self._doc_indices.get(doc_id, [])
+            if doomed:
+                self._apply_locked([], doomed=doomed)
+            with self._storage.transaction() as conn:
+                self._storage.delete_source(conn, doc_id)
+            return len(doomed)
+
+    def source_states(self) -> dict[str, SourceState]:
+        """Source file fingerprints by doc_id, as of the last ingest of each file."""
+        with self._lock:
+            self._storage.ensure_open()
+            rows = self._storage.load_sources()
+        return {doc_id: SourceState(*state) for doc_id, *state in rows}
+
+    def record_source(self, doc_id: str, source: SourceState) -> None:
+        with self._lock:
+            self._write_source_locked(doc_id, source)
+
+    def compact(self) -> None:
+        """Drop tombstoned docs and renumber the rest; readers keep the old generation."""
+        with self._lock:
+            self._ensure_ready_locked()
+            self._compact_locked()
 
     def search(
         self,
         query: str,
         top_k: int = 3,
         min_score: float = 0.0,
+        query_encoding: str | None = None,
     ) -> list[tuple[ChunkRecord, float]]:
-        if not query.strip():
+        """Hybrid search; `query_encoding` overrides `RAG_QUERY_ENCODING` for this query."""
+        if not query.strip() or top_k <= 0:
             return []
 
-        with self._lock:
-            self._ensure_ready_locked()
-            query_embedding = embed_text(query)
-            bm25_scores = self._compute_bm25_scores(query_embedding)
-            semantic_scores: dict[int, float] = defaultdict(float)
-
-            if self._backend == "sparse":
-                with torch.no_grad():
-                    q_vec = self._model.encode_query(query)
-                q_dense = self._to_dense_numpy(q_vec).ravel()
-
-                q_nz = np.flatnonzero(q_dense > settings.rag_sparse_min_weight).tolist()
-                q_nz = [token_id for token_id in q_nz if token_id not in self._special_ids]
-
-                for token_id in q_nz:
-                    q_weight = float(q_dense[token_id])
-                    for doc_idx, d_weight in self._postings.get(token_id, []):
-                        semantic_scores[doc_idx] += q_weight * d_weight
+        gen = self._current_generation()
+        if gen.doc_count == 0:
+            return []
+
+        query_embedding = embed_text(query)
+        bm25_scores = gen.bm25_scores(query_embedding)
+        alpha = max(0.0, min(1.0, settings.rag_hybrid_alpha))
+        # Scores are normalized by their maximum over all live docs.
+        lex_max = _live_max(bm25_scores, gen)
+
+        if gen.backend == "sparse" and self.pruning_mode != "off":
+            q_vec = _query_vector(gen, query, query_encoding)
+            semantic_scores, candidates, sem_max = self._pruned_semantic_scores(
+                gen, q_vec, bm25_scores, lex_max, alpha, top_k, min_score
+            )
+        else:
+            if gen.backend == "sparse":
+                q_vec = _query_vector(gen, query, query_encoding)
+                semantic_scores = gen.postings.matvec(q_vec.rows, q_vec.weights, gen.doc_count)
             else:
-                for idx, emb in enumerate(self._lexical_embeddings):
-                    semantic_scores[idx] = cosine_similarity(query_embedding, emb)
-
-            max_sem = max(semantic_scores.values(), default=0.0) or 1.0
-            max_bm25 = max(bm25_scores.values(), default=0.0) or 1.0
-            alpha = max(0.0, min(1.0, settings.rag_hybrid_alpha))
-
-            merged: list[tuple[ChunkRecord, float]] = []
-            for doc_idx, chunk in enumerate(self._records):
-                sem = semantic_scores.get(doc_idx, 0.0) / max_sem
-                lex = bm25_scores.get(doc_idx, 0.0) / max_bm25
-                score = alpha * sem + (1.0 - alpha) * lex
-                score += self._rerank_score_boost(query_embedding, chunk.text)
-                if score < min_score:
-                    continue
-                merged.append((chunk, float(score)))
-
-            merged.sort(key=lambda item: item[1], reverse=True)
-            return merged[:top_k]
+                semantic_scores = gen.lexical_scores(query_embedding)
+            matched = (semantic_scores > 0) | (bm25_scores > 0)
+            if gen.tombstones:
+                matched &= ~gen.deleted
+            candidates = np.flatnonzero(matched)
+            sem_max = _live_max(semantic_scores, gen)
+        if not len(candidates):
+            return []
+
+        sem = semantic_scores[candidates]
+        lex = bm25_scores[candidates]
+        base = alpha * (sem / (sem_max or 1.0))
+        base += (1.0 - alpha) * (lex / (lex_max or 1.0))
+
+        pool = self._rerank_pool(base, top_k, min_score)
+        doc_indices = candidates[pool]
+        scores = base[pool] + gen.heading_boosts(query_embedding, doc_indices)
+
+        keep = np.flatnonzero(scores >= min_score)
+        ranked = keep[top_k_indices(scores[keep], top_k)]
+        records = self._records(gen, doc_indices[ranked].tolist())
+        return [
+            (records[doc_index], float(scores[i]))
+            for doc_index, i in zip(doc_indices[ranked].tolist(), ranked, strict=True)
+            if doc_index in records
+        ]
+
+    def _records(self, gen: IndexGeneration, doc_indices: list[int]) -> dict[int, ChunkRecord]:
+        # Looked up by chunk id, which compaction never changes; a chunk replaced since
+        # `gen` was published is left out.
+        rows = {doc_index: gen.chunks.row(doc_index) for doc_index in doc_indices}
+        stored = self._storage.fetch_chunks([chunk_id for _, chunk_id, _, _ in rows.values()])
+        records: dict[int, ChunkRecord] = {}
+        for doc_index, (doc_id, chunk_id, line_start, line_end) in rows.items():
+            if chunk_id in stored:
+                text, line_terms = stored[chunk_id]
+                records[doc_index] = ChunkRecord(
+                    doc_id, chunk_id, text, line_start, line_end, line_terms
+                )
+        return records
+
+    def _pruned_semantic_scores(
+        self,
+        gen: IndexGeneration,
+        q_vec: SparseVector,
+        bm25_scores: np.ndarray,
+        lex_max: float,
+        alpha: float,
+        top_k: int,
+        min_score: float,
+    ) -> tuple[np.ndarray, np.ndarray, float]:
+        """SPLADE scores of only the docs that can still make the reranked top k.
+
+        A cheap top-1 pass finds the normalizer first; the second pass bounds each doc's
+        hybrid score by its BM25 part plus the full heading boost, so in "exact" mode the
+        result is the same as scoring every posting.
+        """
+        excluded = gen.deleted if gen.tombstones else None
+        best = maxscore_top_k(
+            gen.postings,
+            q_vec.rows,
+            q_vec.weights,
+            gen.doc_count,
+            1,
+            excluded=excluded,
+        )
+        sem_max = float(best.scores[best.alive].max()) if best.alive.any() else 0.0
+
+        lex_part = (1.0 - alpha) * (bm25_scores / (lex_max or 1.0))
+        max_boost = max(0.0, settings.rag_rerank_heading_boost)
+        pruned = maxscore_top_k(
+            gen.postings,
+            q_vec.rows,
+            q_vec.weights,
+            gen.doc_count,
+            top_k,
+            scale=alpha / (sem_max or 1.0),
+            offset_lb=lex_part,
+            offset_ub=lex_part + max_boost,
+            unseen_ub=max_boost,
+            seed=bm25_scores > 0,
+            excluded=excluded,
+            floor=min_score,
+            factor=self.pruning_factor if self.pruning_mode == "approx" else 1.0,
+        )
+        self.pruning_stats.record(
+            best.postings_touched + pruned.postings_touched,
+            pruned.postings_total,
+        )
+        return pruned.scores, np.flatnonzero(pruned.alive), sem_max
 
     def clear(self, delete_disk: bool = True) -> None:
         with self._lock:
-            # Recreate schema defensively in case test bootstrap removed the DB file.
-            self._init_db()
-            self._records.clear()
-            self._chunk_ids.clear()
-            self._postings.clear()
-            self._lexical_embeddings.clear()
-            self._doc_term_freqs.clear()
-            self._doc_lengths.clear()
-            self._doc_freqs.clear()
-            self._avg_doc_length = 0.0
+            # Reopen in case test bootstrap removed the DB file.
+            self._storage.ensure_open()
+            self._forget_records_locked()
+            self._publish_locked(self._empty_generation_locked())
             self._disk_loaded = False
 
             if delete_disk:
-                with self._connect() as conn:
-                    conn.execute("DELETE FROM postings")
-                    conn.execute("DELETE FROM lexical")
-                    conn.execute("DELETE FROM chunks")
-                    conn.execute("DELETE FROM meta")
-                    conn.commit()
+                self._delete_disk_locked()
 
-    def count(self) -> int:
+    def save_snapshot(self) -> None:
+        """Persist the derived index so the next process start can skip rebuilding it."""
         with self._lock:
             self._ensure_ready_locked()
-            return len(self._records)
+            self._save_snapshot_locked()
 
-    def backend_info(self) -> dict[str, str | None]:
+    def unload(self) -> None:
+        """Drop the in-memory index; the next read loads it again from disk."""
         with self._lock:
-            self._ensure_ready_locked()
-            return {
-                "backend": self._backend,
-                "error": self._backend_error,
-                "model": settings.rag_sparse_model,
-                "db_path": str(self._db_path),
-            }
-
-    def _add_sparse_locked(self, pending: list[ChunkRecord]) -> None:
-        texts = [chunk.text for chunk in pending]
-        with torch.no_grad():
-            doc_emb = self._model.encode_document(texts, batch_size=8)
-        doc_dense = self._to_dense_numpy(doc_emb)
-
-        chunk_rows: list[tuple[int, str, str, str, int, int]] = []
-        posting_rows: list[tuple[int, int, float]] = []
+            self._forget_records_locked()
+            self._publish_locked(self._empty_generation_locked())
+            self._disk_loaded = False
 
-        for chunk, vec in zip(pending, doc_dense, strict=True):
-            doc_index = len(self._records)
-            self._records.append(chunk)
-            self._chunk_ids.add(chunk.chunk_id)
-            tf = embed_text(chunk.text)
-            self._append_doc_stats(tf)
-            chunk_rows.append(
-                (
-                    doc_index,
-                    chunk.doc_id,
-                    chunk.chunk_id,
-                    chunk.text,
-                    chunk.line_start,
-                    chunk.line_end,
-                )
-            )
+    @property
+    def loaded(self) -> bool:
+        return self._disk_loaded
 
-            nz = np.flatnonzero(vec > settings.rag_sparse_min_weight).tolist()
-            nz = [token_id for token_id in nz if token_id not in self._special_ids]
-            for token_id in nz:
-                weight = float(vec[token_id])
-                self._postings[token_id].append((doc_index, weight))
-                posting_rows.append((token_id, doc_index, weight))
-
-        with self._connect() as conn:
-            conn.executemany(
-                (
-                    "INSERT INTO chunks(doc_idx, doc_id, chunk_id, text, line_start, line_end) "
-                    "VALUES(?, ?, ?, ?, ?, ?)"
-                ),
-                chunk_rows,
-            )
-            conn.executemany(
-                "INSERT INTO postings(token_id, doc_idx, weight) VALUES(?, ?, ?)",
-                posting_rows,
-            )
-            conn.execute(
-                "INSERT OR REPLACE INTO meta(key, value) VALUES('backend', ?)",
-                (self._backend,),
+    def count(self) -> int:
+        return self._current_generation().live_count
+
+    @property
+    def generation(self) -> int:
+        return self._current_generation().generation
+
+    def backend_info(self) -> dict[str, str | float | None]:
+        gen = self._current_generation()
+        return {
+            # Until the encoder settles every query is served by the lexical path.
+            "backend": gen.backend,
+            "index_name": self.name,
+            "error": sparse_encoder.error,
+            "model": settings.rag_sparse_model,
+            "db_path": str(self._db_path),
+            "warmup_state": sparse_encoder.state,
+            "warmup_seconds": sparse_encoder.warmup_seconds,
+            "pruning": {"mode": self.pruning_mode, **self.pruning_stats.stats()},
+            "query_encoding": settings.rag_query_encoding,
+            "postings": {
+                "weight_format": gen.postings.weight_format,
+                "count": gen.postings.nnz,
+                "bytes": gen.postings.nbytes,
+            },
+        }
+
+    def _current_generation(self) -> IndexGeneration:
+        if not self._disk_loaded or (
+            self._backend == "uninitialized" and sparse_encoder.settled
+        ):
+            with self._lock:
+                self._ensure_ready_locked()
+        return self._generation
+
+    def _publish_locked(self, gen: IndexGeneration) -> None:
+        # A single reference assignment: readers see either the old or the new generation.
+        self._generation = replace(gen, generation=self._generation.generation + 1)
+
+    def _empty_generation_locked(self) -> IndexGeneration:
+        return IndexGeneration(
+            backend="sparse" if self._backend == "sparse" else "lexical",
+            postings=SparseMatrixIndex(weight_format=self.posting_weights),
+        )
+
+    def _apply_locked(
+        self,
+        pending: list[ChunkRecord],
+        doomed: list[int],
+        sources: list[tuple[str, SourceState]] | None = None,
+        vectors: list[SparseVector] | None = None,
+    ) -> None:
+        gen = self._generation
+        next_gen = self._index_terms_locked(gen, [chunk.text for chunk in pending])
+
+        posting_rows: list[tuple[int, int, float]] = []
+        if self._backend == "sparse" and pending:
+            doc_vectors = vectors
+            if doc_vectors is None or len(doc_vectors) != len(pending):
+                doc_vectors = sparse_encoder.encode_documents([chunk.text for chunk in pending])
+            rows = np.concatenate([vec.rows for vec in doc_vectors]).astype(np.int64)
+            docs = np.repeat(
+                np.arange(gen.doc_count, gen.doc_count + len(pending), dtype=np.int32),
+                [len(vec.rows) for vec in doc_vectors],
             )
-            conn.commit()
+            weights = np.concatenate([vec.weights for vec in doc_vectors]).astype(np.float32)
+            if len(rows):
+                next_gen = replace(next_gen, postings=gen.postings.append(rows, docs, weights))
+                # Inserting in primary-key order keeps the clustered postings B-tree appends local.
+                order = np.lexsort((docs, rows))
+                posting_rows = list(
+                    zip(
+                        rows[order].tolist(),
+                        docs[order].tolist(),
+                        weights[order].tolist(),
+                        strict=True,
+                    )
+                )
 
-    def _add_lexical_locked(self, pending: list[ChunkRecord]) -> None:
-        chunk_rows: list[tuple[int, str, str, str, int, int]] = []
-        lexical_rows: list[tuple[int, str]] = []
+        if doomed:
+            deleted = next_gen.deleted.copy()
+            deleted[doomed] = True
+            next_gen = replace(next_gen, deleted=deleted, tombstones=int(deleted.sum()))
 
+        storage = self._storage
+        with storage.transaction() as conn:
+            # Deleted rows leave a hole in doc_idx; the hole is the on-disk tombstone.
+            storage.delete_docs(conn, doomed)
+            storage.insert_chunks(conn, self._chunk_rows(gen.doc_count, pending))
+            storage.insert_postings(conn, posting_rows)
+            storage.upsert_sources(conn, [(doc_id, *source) for doc_id, source in sources or []])
+            self._write_meta(conn)
+
+        self._commit_records_locked(next_gen, pending, doomed)
+
+    @staticmethod
+    def _chunk_rows(
+        first_doc_index: int,
+        pending: list[ChunkRecord],
+    ) -> list[ChunkRow]:
         for chunk in pending:
-            doc_index = len(self._records)
-            self._records.append(chunk)
-            self._chunk_ids.add(chunk.chunk_id)
-            emb = embed_text(chunk.text)
-            self._lexical_embeddings.append(emb)
-            self._append_doc_stats(emb)
-
-            chunk_rows.append(
-                (
-                    doc_index,
-                    chunk.doc_id,
-                    chunk.chunk_id,
-                    chunk.text,
-                    chunk.line_start,
-                    chunk.line_end,
-                )
+            if chunk.line_terms is None:
+                chunk.line_terms = build_line_terms(chunk.text)
+        return [
+            (
+                first_doc_index + offset,
+                chunk.doc_id,
+                chunk.chunk_id,
+                chunk.text,
+                chunk.line_start,
+                chunk.line_end,
+                chunk.line_terms,
             )
-            lexical_rows.append((doc_index, json.dumps(dict(emb))))
-
-        with self._connect() as conn:
-            conn.executemany(
-                (
-                    "INSERT INTO chunks(doc_idx, doc_id, chunk_id, text, line_start, line_end) "
-                    "VALUES(?, ?, ?, ?, ?, ?)"
-                ),
-                chunk_rows,
-            )
-            conn.executemany(
-                "INSERT INTO lexical(doc_idx, embedding_json) VALUES(?, ?)",
-                lexical_rows,
-            )
-            conn.execute(
-                "INSERT OR REPLACE INTO meta(key, value) VALUES('backend', ?)",
-                (self._backend,),
+            for offset, chunk in enumerate(pending)
+        ]
+
+    def _commit_records_locked(
+        self,
+        next_gen: IndexGeneration,
+        pending: list[ChunkRecord],
+        doomed: list[int],
+    ) -> None:
+        # Only after the rows are on disk: append to the shared lists, then publish.
+        first_doc_index = len(next_gen.chunks)
+        chunks = next_gen.chunks.append(
+            (chunk.doc_id, chunk.chunk_id, chunk.line_start, chunk.line_end) for chunk in pending
+        )
+        for doc_index in doomed:
+            self._chunk_ids.discard(chunks.chunk_id(doc_index))
+            self._doc_indices.pop(chunks.doc_id(doc_index), None)
+        for offset, chunk in enumerate(pending):
+            self._chunk_ids.add(chunk.chunk_id)
+            self._doc_indices.setdefault(chunk.doc_id, []).append(first_doc_index + offset)
+        self._publish_locked(replace(next_gen, chunks=chunks))
+        if doomed:
+            self._maybe_compact_locked()
+
+    def _write_source_locked(self, doc_id: str, source: SourceState) -> None:
+        with self._storage.transaction() as conn:
+            self._storage.upsert_sources(conn, [(doc_id, *source)])
+
+    def _forget_records_locked(self) -> None:
+        self._chunk_ids = set()
+        self._doc_indices = {}
+
+    def _maybe_compact_locked(self) -> None:
+        gen = self._generation
+        if not gen.tombstones or gen.tombstones < self.compaction_ratio * gen.doc_count:
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = Thread(
+            target=self.compact,
+            name=f"rag-compaction-{self.name}",
+            daemon=True,
+        )
+        self._compaction_thread.start()
+
+    def _compact_locked(self) -> None:
+        gen = self._generation
+        if not gen.tombstones:
+            return
+
+        live = np.flatnonzero(~gen.deleted)
+        doc_map = np.full(gen.doc_count, -1, dtype=np.int64)
+        doc_map[live] = np.arange(len(live))
+        moves = [(int(doc_map[old]), int(old)) for old in live if doc_map[old] != old]
+
+        with self._storage.transaction() as conn:
+            self._storage.renumber_docs(conn, moves)
+            # Compaction may run before the encoder settles, so the stored backend stays as is.
+            self._storage.bump_index_version(conn)
+
+        chunks = gen.chunks.take(live)
+        doc_lengths = gen.doc_lengths[live]
+        self._doc_indices = {}
+        for doc_index, code in enumerate(chunks.docs.tolist()):
+            self._doc_indices.setdefault(chunks.doc_names[code], []).append(doc_index)
+        self._publish_locked(
+            replace(
+                gen,
+                chunks=chunks,
+                doc_count=len(chunks),
+                postings=gen.postings.remap_docs(doc_map),
+                terms=gen.terms.remap_docs(doc_map),
+                headings=gen.headings.remap_docs(doc_map),
+                doc_lengths=doc_lengths,
+                doc_norms=gen.doc_norms[live],
+                avg_doc_length=float(doc_lengths.mean()) if len(doc_lengths) else 0.0,
+                deleted=np.zeros(len(chunks), dtype=bool),
+                tombstones=0,
             )
-            conn.commit()
+        )
+        self._save_snapshot_locked()
 
     def _ensure_ready_locked(self) -> None:
-        self._ensure_backend_locked()
-        if self._disk_loaded:
+        if not self._disk_loaded:
+            self._load_locked()
+        if self._backend == "uninitialized" and sparse_encoder.settled:
+            self._resolve_backend_locked()
+
+    def _resolve_backend_locked(self) -> None:
+        self._backend = "sparse" if sparse_encoder.ready else "lexical"
+        if self._stored_backend and self._stored_backend != self._backend:
+            # Rows on disk were produced by another encoder; start over as an empty store.
+            self._delete_disk_locked()
+            self._forget_records_locked()
+            self._publish_locked(self._empty_generation_locked())
             return
+        self._publish_locked(
+            replace(self._generation, backend="sparse" if self._backend == "sparse" else "lexical")
+        )
 
-        # Test bootstrap may recreate/remove sqlite file between imports.
-        self._init_db()
-        with self._connect() as conn:
-            backend_row = conn.execute(
-                "SELECT value FROM meta WHERE key='backend'"
-            ).fetchone()
-            stored_backend = backend_row[0] if backend_row else None
-
-            if stored_backend and stored_backend != self._backend:
-                conn.execute("DELETE FROM postings")
-                conn.execute("DELETE FROM lexical")
-                conn.execute("DELETE FROM chunks")
-                conn.execute("DELETE FROM meta")
-                conn.commit()
-                stored_backend = None
-
-            rows = conn.execute(
-                "SELECT doc_idx, doc_id, chunk_id, text, line_start, line_end "
-                "FROM chunks ORDER BY doc_idx"
-            ).fetchall()
-
-            self._records = []
-            self._chunk_ids = set()
-            for _, doc_id, chunk_id, text, line_start, line_end in rows:
-                record = ChunkRecord(
-                    doc_id=doc_id,
-                    chunk_id=chunk_id,
-                    text=text,
-                    line_start=line_start,
-                    line_end=line_end,
-                )
-                self._records.append(record)
-                self._chunk_ids.add(chunk_id)
-
-            if self._backend == "sparse":
-                posting_rows = conn.execute(
-                    "SELECT token_id, doc_idx, weight FROM postings"
-                ).fetchall()
-                self._postings = defaultdict(list)
-                for token_id, doc_idx, weight in posting_rows:
-                    self._postings[int(token_id)].append((int(doc_idx), float(weight)))
-            else:
-                lexical_rows = conn.execute(
-                    "SELECT doc_idx, embedding_json FROM lexical ORDER BY doc_idx"
-                ).fetchall()
-                emb_map: dict[int, Counter[str]] = {}
-                for doc_idx, emb_json in lexical_rows:
-                    emb_map[int(doc_idx)] = Counter(json.loads(emb_json))
-                self._lexical_embeddings = [
-                    emb_map.get(i, Counter()) for i in range(len(self._records))
-                ]
-
-            if stored_backend is None:
-                conn.execute(
-                    "INSERT OR REPLACE INTO meta(key, value) VALUES('backend', ?)",
-                    (self._backend,),
-                )
-                conn.commit()
+    def _delete_disk_locked(self) -> None:
+        self._storage.clear()
+        remove_snapshot(self._snapshot_path)
+        self._stored_backend = None
 
-        self._rebuild_doc_stats_locked()
+    def _load_locked(self) -> None:
+        # Test bootstrap may recreate/remove sqlite file between imports.
+        storage = self._storage
+        storage.ensure_open()
+        self._stored_backend = storage.get_meta("backend")
+        rows = storage.load_chunk_index()
+
+        doc_count = rows[-1][0] + 1 if rows else 0
+        chunks = ChunkTable().extend_at(doc_count, rows)
+        deleted = chunks.docs == NO_DOC
+        self._forget_records_locked()
+        for doc_idx, doc_id, chunk_id, _, _ in rows:
+            self._chunk_ids.add(chunk_id)
+            self._doc_indices.setdefault(doc_id, []).append(doc_idx)
+        del rows
+
+        index_version = storage.get_meta("index_version")
+        snapshot = load_snapshot(self._snapshot_path) if index_version else None
+        restored = (
+            snapshot is not None
+            and snapshot.index_version == index_version
+            and snapshot.backend == self._stored_backend
+            and snapshot.doc_count == doc_count
+            and (
+                snapshot.postings is None
+                or snapshot.postings.weight_format == self.posting_weights
+            )
+        )
+
+        gen = self._empty_generation_locked()
+        if restored:
+            gen = self._restore_snapshot(gen, snapshot)
+        elif self._stored_backend == "sparse":
+            gen = replace(gen, postings=gen.postings.append(*storage.load_postings()))
+
+        tombstones = {"deleted": deleted, "tombstones": int(deleted.sum())}
+        if restored:
+            self._publish_locked(replace(gen, chunks=chunks, doc_count=doc_count, **tombstones))
+        else:
+            texts = [""] * doc_count
+            for doc_idx, text in storage.load_texts():
+                texts[doc_idx] = text
+            gen = self._index_terms_locked(gen, texts)
+            self._publish_locked(replace(gen, chunks=chunks, **tombstones))
+            self._save_snapshot_locked()
         self._disk_loaded = True
+        self._maybe_compact_locked()
 
-    def _ensure_backend_locked(self) -> None:
-        if self._backend != "uninitialized":
+    def _save_snapshot_locked(self) -> None:
+        gen = self._generation
+        if not gen.doc_count or self._stored_backend is None:
+            remove_snapshot(self._snapshot_path)
             return
 
-        try:
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            self._model = SparseEncoder(settings.rag_sparse_model).to(device)
-            self._tokenizer = AutoTokenizer.from_pretrained(settings.rag_sparse_model)
-            self._special_ids = set(getattr(self._tokenizer, "all_special_ids", []) or [])
-            self._backend = "sparse"
-        except Exception as exc:  # noqa: BLE001
-            self._backend = "lexical"
-            self._backend_error = str(exc)
-
-    def _append_doc_stats(self, tf: Counter[str]) -> None:
-        self._doc_term_freqs.append(tf)
-        doc_len = sum(tf.values())
-        self._doc_lengths.append(doc_len)
-        for term in tf:
-            self._doc_freqs[term] += 1
-        total_docs = len(self._doc_lengths)
-        self._avg_doc_length = (sum(self._doc_lengths) / total_docs) if total_docs else 0.0
-
-    def _rebuild_doc_stats_locked(self) -> None:
-        self._doc_term_freqs = []
-        self._doc_lengths = []
-        self._doc_freqs = Counter()
-        for chunk in self._records:
-            tf = embed_text(chunk.text)
-            self._doc_term_freqs.append(tf)
-            self._doc_lengths.append(sum(tf.values()))
-            for term in tf:
-                self._doc_freqs[term] += 1
-        total_docs = len(self._doc_lengths)
-        self._avg_doc_length = (sum(self._doc_lengths) / total_docs) if total_docs else 0.0
-
-    def _compute_bm25_scores(self, query_tf: Counter[str]) -> dict[int, float]:
-        scores: dict[int, float] = defaultdict(float)
-        if not query_tf or not self._doc_term_freqs:
-            return scores
-
-        total_docs = len(self._doc_term_freqs)
-        avgdl = self._avg_doc_length or 1.0
-        k1 = settings.rag_bm25_k1
-        b = settings.rag_bm25_b
-
-        for term in query_tf:
-            df = self._doc_freqs.get(term, 0)
-            if df <= 0:
-                continue
-            idf = math.log(1.0 + (total_docs - df + 0.5) / (df + 0.5))
-            for idx, doc_tf in enumerate(self._doc_term_freqs):
-                tf = doc_tf.get(term, 0)
-                if tf <= 0:
-                    continue
-                dl = self._doc_lengths[idx] or 1
-                denom = tf + k1 * (1.0 - b + b * (dl / avgdl))
-                scores[idx] += idf * ((tf * (k1 + 1.0)) / denom)
-
-        return scores
-
-    def _rerank_score_boost(self, query_tf: Counter[str], text: str) -> float:
-        if not query_tf or not text:
-            return 0.0
-        first_line = text.splitlines()[0].lower() if text else ""
-        coverage = 0
-        for term in query_tf:
-            if term.lower() in first_line:
-                coverage += 1
-        if coverage == 0:
-            return 0.0
-        ratio = coverage / max(1, len(query_tf))
-        return ratio * settings.rag_rerank_heading_boost
-
-    def _init_db(self) -> None:
-        with self._connect() as conn:
-            conn.execute(
-                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        index_version = self._storage.get_meta("index_version")
+        if index_version is None:
+            with self._storage.transaction() as conn:
+                index_version = self._storage.bump_index_version(conn)
+
+        postings = gen.postings.merged()
+        terms = gen.terms.merged()
+        headings = gen.headings.merged()
+        write_snapshot(
+            self._snapshot_path,
+            IndexSnapshot(
+                index_version=index_version,
+                backend=self._stored_backend,
+                vocab=list(gen.term_ids),
+                doc_lengths=gen.doc_lengths,
+                doc_norms=gen.doc_norms,
+                terms=terms,
+                headings=headings,
+                postings=postings if self._stored_backend == "sparse" else None,
+            ),
+        )
+        # Keep serving from the compacted segments that were just written.
+        self._publish_locked(
+            replace(
+                gen,
+                postings=SparseMatrixIndex.from_segment(postings),
+                terms=SparseMatrixIndex.from_segment(terms),
+                headings=SparseMatrixIndex.from_segment(headings),
             )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS chunks (
-                    doc_idx INTEGER PRIMARY KEY,
-                    doc_id TEXT NOT NULL,
-                    chunk_id TEXT NOT NULL UNIQUE,
-                    text TEXT NOT NULL,
-                    line_start INTEGER NOT NULL,
-                    line_end INTEGER NOT NULL
-                )
-                """
-            )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS postings (
-                    token_id INTEGER NOT NULL,
-                    doc_idx INTEGER NOT NULL,
-                    weight REAL NOT NULL
-                )
-                """
-            )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_postings_token ON postings(token_id)"
-            )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS lexical (
-                    doc_idx INTEGER PRIMARY KEY,
-                    embedding_json TEXT NOT NULL
-                )
-                """
-            )
-            conn.commit()
+        )
+
+    @staticmethod
+    def _restore_snapshot(gen: IndexGeneration, snapshot: IndexSnapshot) -> IndexGeneration:
+        return replace(
+            gen,
+            term_ids={term: row for row, term in enumerate(snapshot.vocab)},
+            terms=SparseMatrixIndex.from_segment(snapshot.terms),
+            headings=SparseMatrixIndex.from_segment(snapshot.headings),
+            postings=(
+                SparseMatrixIndex.from_segment(snapshot.postings)
+                if snapshot.postings is not None
+                else gen.postings
+            ),
+            doc_lengths=snapshot.doc_lengths,
+            doc_norms=snapshot.doc_norms,
+            avg_doc_length=float(np.mean(snapshot.doc_lengths)) if snapshot.doc_count else 0.0,
+        )
 
-    def _connect(self) -> sqlite3.Connection:
-        return sqlite3.connect(self._db_path)
+    @staticmethod
+    def _index_terms_locked(
+        gen: IndexGeneration,
+        texts: list[str],
+    ) -> IndexGeneration:
+        first_doc_index = gen.doc_count
+        term_ids = gen.term_ids
+        rows: list[int] = []
+        docs: list[int] = []
+        freqs: list[int] = []
+        heading_rows: list[int] = []
+        heading_docs: list[int] = []
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        norms = np.zeros(len(texts), dtype=np.float32)
+        for offset, text in enumerate(texts):
+            tf = embed_text(text)
+            for term, count in tf.items():
+                rows.append(term_ids.setdefault(term, len(term_ids)))
+                docs.append(first_doc_index + offset)
+                freqs.append(count)
+            first_line = text.splitlines()[0] if text else ""
+            for term in embed_text(first_line):
+                heading_rows.append(term_ids[term])
+                heading_docs.append(first_doc_index + offset)
+            lengths[offset] = sum(tf.values())
+            norms[offset] = math.sqrt(sum(count * count for count in tf.values()))
+
+        doc_lengths = np.concatenate([gen.doc_lengths, lengths])
+        return replace(
+            gen,
+            doc_count=first_doc_index + len(texts),
+            deleted=np.concatenate([gen.deleted, np.zeros(len(texts), dtype=bool)]),
+            terms=gen.terms.append(np.asarray(rows), np.asarray(docs), np.asarray(freqs)),
+            headings=gen.headings.append(
+                np.asarray(heading_rows),
+                np.asarray(heading_docs),
+                np.ones(len(heading_rows), dtype=np.float32),
+            ),
+            doc_lengths=doc_lengths,
+            doc_norms=np.concatenate([gen.doc_norms, norms]),
+            avg_doc_length=float(doc_lengths.mean()) if len(doc_lengths) else 0.0,
+        )
 
     @staticmethod
-    def _to_dense_numpy(value) -> np.ndarray:
-        if hasattr(value, "to_dense"):
-            return value.to_dense().float().cpu().numpy()
-        if isinstance(value, torch.Tensor):
-            return value.float().cpu().numpy()
-        return np.asarray(value)
+    def _rerank_pool(base: np.ndarray, top_k: int, min_score: float) -> np.ndarray:
+        # A candidate can gain at most `max_boost`, so anything that cannot reach the
+        # k-th best base score (or min_score) even with the full boost is left out.
+        max_boost = max(0.0, settings.rag_rerank_heading_boost)
+        floor = min_score - max_boost
+        if top_k < len(base):
+            kth = np.partition(base, len(base) - top_k)[len(base) - top_k]
+            floor = max(floor, kth - max_boost)
+        return np.flatnonzero(base >= floor)
+
+    def _write_meta(self, conn: sqlite3.Connection) -> None:
+        # Every write gets a fresh index_version so that older snapshots are ignored.
+        SQLiteStorage.set_meta(conn, "backend", self._backend)
+        SQLiteStorage.bump_index_version(conn)
+        self._stored_backend = self._backend
+
+
+def _live_max(scores: np.ndarray, gen: IndexGeneration) -> float:
+    if gen.tombstones:
+        scores = scores[~gen.deleted]
+    return float(scores.max()) if len(scores) else 0.0
+
+
+def _query_vector(gen: IndexGeneration, query: str, query_encoding: str | None) -> SparseVector:
+    if sparse_encoder.resolve_query_encoding(query_encoding) == "inference_free":
+        return sparse_encoder.encode_query_inference_free(query, gen.token_idf)
+    return sparse_encoder.encode_query(query)
 
 
 store = SparseVectorStore()
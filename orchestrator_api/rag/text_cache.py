@@ -0,0 +1,90 @@
+import logging
+import os
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+_READ_BLOCK = 1 << 20
+
+
+class ParsedTextCache:
+    """Text extracted from source files, one UTF-8 file per content hash.
+
+    An entry is written next to its final name and renamed into place only once the whole
+    document was extracted, so a partial extraction is never served. Hits refresh the
+    entry's mtime; past `max_bytes` the least recently used entries are removed.
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    def path_for(self, content_hash: str) -> Path:
+        return self.root / content_hash[:2] / f"{content_hash}.txt"
+
+    def read(self, content_hash: str) -> Iterator[str] | None:
+        """The cached text in blocks, or None when it was not extracted before."""
+        path = self.path_for(content_hash)
+        try:
+            handle = path.open(encoding="utf-8", newline="")
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        path.touch()
+        with self._lock:
+            self.hits += 1
+        return _read_blocks(handle)
+
+    def write_through(self, content_hash: str, pieces: Iterable[str]) -> Iterator[str]:
+        """Yield `pieces` unchanged, storing them as the entry once all were consumed."""
+        if self.max_bytes <= 0:
+            yield from pieces
+            return
+        path = self.path_for(content_hash)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f"{path.name}.{os.getpid()}.{id(pieces)}.part")
+        complete = False
+        try:
+            with partial.open("w", encoding="utf-8", newline="") as handle:
+                for piece in pieces:
+                    handle.write(piece)
+                    yield piece
+            complete = True
+        finally:
+            if complete:
+                os.replace(partial, path)
+            else:
+                partial.unlink(missing_ok=True)
+        self._evict()
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _evict(self) -> None:
+        try:
+            entries = [(path.stat(), path) for path in self.root.glob("*/*.txt")]
+        except FileNotFoundError:
+            return
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, path in sorted(entries, key=lambda entry: entry[0].st_mtime):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+            logger.info("evicted parsed text %s", path.name)
+
+
+def _read_blocks(handle) -> Iterator[str]:
+    with handle:
+        yield from iter(lambda: handle.read(_READ_BLOCK), "")
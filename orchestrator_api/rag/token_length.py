@@ -0,0 +1,35 @@
+from functools import lru_cache
+
+# Some tokenizers report a huge sentinel instead of a real limit.
+_MAX_SANE_LENGTH = 1 << 16
+
+
+class TokenCounter:
+    """Lengths of texts in tokens of a model's tokenizer, without special tokens."""
+
+    def __init__(self, tokenizer) -> None:
+        self.tokenizer = tokenizer
+        max_length = getattr(tokenizer, "model_max_length", 0) or 0
+        self.max_length = max_length if 0 < max_length < _MAX_SANE_LENGTH else 512
+        self.special_tokens = tokenizer.num_special_tokens_to_add(pair=False)
+
+    def __call__(self, texts: list[str]) -> list[int]:
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def budget(self, max_tokens: int = 0) -> int:
+        """Tokens a chunk may use so that it is encoded whole: `max_tokens`, or the model's
+        limit when 0, less the special tokens the encoder adds."""
+        limit = min(max_tokens, self.max_length) if max_tokens > 0 else self.max_length
+        return limit - self.special_tokens
+
+
+@lru_cache(maxsize=4)
+def token_counter(model_name: str) -> TokenCounter:
+    """One counter per model and process; ingest pool workers load their own on first use."""
+    # Imported here so chunking by characters never loads transformers.
+    from transformers import AutoTokenizer
+
+    return TokenCounter(AutoTokenizer.from_pretrained(model_name))
@@ -0,0 +1,59 @@
+from typing import Protocol, runtime_checkable
+
+from orchestrator_api.rag.encoder import SparseVector
+from orchestrator_api.rag.store import ChunkRecord, SourceState
+
+STORE_BACKENDS = ("sqlite", "chroma")
+
+
+@runtime_checkable
+class VectorStore(Protocol):
+    """What the index registry, retrieval and ingest need from a store backend.
+
+    Implementations: `SparseVectorStore` (SQLite + in-memory sparse index) and
+    `ChromaVectorStore` (chromadb collection). Pick one with `RAG_STORE_BACKEND`.
+    """
+
+    name: str
+
+    def add(
+        self,
+        chunks: list[ChunkRecord],
+        vectors: list[SparseVector] | None = None,
+    ) -> None: ...
+
+    def upsert_documents(
+        self,
+        documents: list[tuple[str, list[ChunkRecord], SourceState | None]],
+        vectors: list[SparseVector] | None = None,
+    ) -> None: ...
+
+    def delete_document(self, doc_id: str) -> int: ...
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 3,
+        min_score: float = 0.0,
+        query_encoding: str | None = None,
+    ) -> list[tuple[ChunkRecord, float]]: ...
+
+    def count(self) -> int: ...
+
+    def clear(self, delete_disk: bool = True) -> None: ...
+
+    def backend_info(self) -> dict[str, str | float | None]: ...
+
+    def source_states(self) -> dict[str, SourceState]: ...
+
+    def record_source(self, doc_id: str, source: SourceState) -> None: ...
+
+    def save_snapshot(self) -> None: ...
+
+    def unload(self) -> None: ...
+
+    @property
+    def loaded(self) -> bool: ...
+
+    @property
+    def generation(self) -> int: ...
@@ -1,5 +1,9 @@
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
+INDEX_NAME_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+
 
 class Citation(BaseModel):
     doc_id: str
@@ -34,6 +38,9 @@ class ChatRequest(BaseModel):
     roi: dict | None = None
     top_k: int = 3
     ops: list[str] | None = None
+    index_name: str | None = Field(default=None, pattern=INDEX_NAME_PATTERN)
+    # Overrides RAG_QUERY_ENCODING for this request.
+    query_encoding: Literal["model", "inference_free", "auto"] | None = None
 
 
 class ChatResponse(BaseModel):
@@ -47,9 +54,11 @@ class IngestRequest(BaseModel):
     documents: list[str]
     chunk_size: int = 500
     overlap: int = 100
+    index_name: str | None = Field(default=None, pattern=INDEX_NAME_PATTERN)
 
 
 class IngestResponse(BaseModel):
     ingested_count: int
     failed: list[dict[str, str]] = Field(default_factory=list)
     index_name: str = "default"
+    throughput: dict[str, float] = Field(default_factory=dict)
@@ -11,7 +11,7 @@ from orchestrator_api.llm import (
     generate_answer_with_llm,
     stream_answer_with_llm,
 )
-from orchestrator_api.rag.retrieve import retrieve_citations
+from orchestrator_api.rag.retrieve import aretrieve_citations, aretrieve_citations_relaxed
 from orchestrator_api.schemas import AnalysisResult, ChatRequest, ChatResponse, TraceInfo
 from orchestrator_api.tools.mcp_tools import build_analyze_satellite_image_tool
 
@@ -127,24 +127,21 @@ async def _rag_step(state: dict[str, Any]) -> dict[str, Any]:
     rag_relaxed = False
 
     if rag_active and request.question.strip():
-        citations = retrieve_citations(
+        citations, rag_relaxed = await aretrieve_citations_relaxed(
             request.question,
             top_k=request.top_k,
             min_score=settings.rag_min_score,
+            index_name=request.index_name,
+            query_encoding=request.query_encoding,
         )
-        if not citations:
-            rag_relaxed = True
-            citations = retrieve_citations(
-                request.question,
-                top_k=request.top_k,
-                min_score=0.0,
-            )
 
     if not decision.use_rag and not decision.use_mcp and request.question.strip():
-        citations = retrieve_citations(
+        citations = await aretrieve_citations(
             request.question,
             top_k=request.top_k,
             min_score=settings.rag_min_score,
+            index_name=request.index_name,
+            query_encoding=request.query_encoding,
         )
         if citations:
             rag_active = True
@@ -9,7 +9,7 @@ from orchestrator_api.llm import (
     stream_answer_with_llm,
 )
 from orchestrator_api.mcp_client import analyze_image
-from orchestrator_api.rag.retrieve import retrieve_citations
+from orchestrator_api.rag.retrieve import aretrieve_citations, aretrieve_citations_relaxed
 from orchestrator_api.schemas import AnalysisResult, ChatRequest, ChatResponse, TraceInfo
 from orchestrator_api.services.chat_langchain_pipeline import (
     run_chat_langchain,
@@ -37,7 +37,7 @@ async def run_chat(request: ChatRequest) -> ChatResponse:
     if decision.error:
         tools_used.append(f"route.error:{decision.error}")
 
-    citations, rag_relaxed, rag_active = _run_rag(request, decision.use_rag, decision.use_mcp)
+    citations, rag_relaxed, rag_active = await _run_rag(request, decision.use_rag, decision.use_mcp)
     if rag_active:
         tools_used.append("rag.retrieve")
     if rag_relaxed:
@@ -91,7 +91,7 @@ async def run_chat_stream(request: ChatRequest) -> AsyncGenerator[dict, None]:
     if decision.error:
         tools_used.append(f"route.error:{decision.error}")
 
-    citations, rag_relaxed, rag_active = _run_rag(request, decision.use_rag, decision.use_mcp)
+    citations, rag_relaxed, rag_active = await _run_rag(request, decision.use_rag, decision.use_mcp)
     if rag_active:
         tools_used.append("rag.retrieve")
     if rag_relaxed:
@@ -161,7 +161,7 @@ async def run_chat_stream(request: ChatRequest) -> AsyncGenerator[dict, None]:
     yield {"type": "final", "data": response.model_dump()}
 
 
-def _run_rag(
+async def _run_rag(
     request: ChatRequest,
     decision_use_rag: bool,
     decision_use_mcp: bool,
@@ -171,24 +171,21 @@ def _run_rag(
     rag_relaxed = False
 
     if rag_active and request.question.strip():
-        citations = retrieve_citations(
+        citations, rag_relaxed = await aretrieve_citations_relaxed(
             request.question,
             top_k=request.top_k,
             min_score=settings.rag_min_score,
+            index_name=request.index_name,
+            query_encoding=request.query_encoding,
         )
-        if not citations:
-            rag_relaxed = True
-            citations = retrieve_citations(
-                request.question,
-                top_k=request.top_k,
-                min_score=0.0,
-            )
 
     if not decision_use_rag and not decision_use_mcp and request.question.strip():
-        citations = retrieve_citations(
+        citations = await aretrieve_citations(
             request.question,
             top_k=request.top_k,
             min_score=settings.rag_min_score,
+            index_name=request.index_name,
+            query_encoding=request.query_encoding,
         )
         if citations:
             rag_active = True
@@ -1,7 +1,10 @@
 import os
+import shutil
 import tempfile
 from pathlib import Path
 
+import pytest
+
 # Ensure tests never use the development vector DB.
 TEST_DB_PATH = Path(tempfile.gettempdir()) / "satellite_agent_test_rag_store.sqlite3"
 os.environ["RAG_STORE_DB_PATH"] = str(TEST_DB_PATH)
@@ -10,11 +13,29 @@ os.environ["LLM_API_KEY"] = ""
 os.environ["USE_LANGCHAIN_PIPELINE"] = "false"
 
 
+def _remove_test_stores() -> None:
+    # Named indexes live next to the default store as `<stem>.<name>.*`.
+    for path in TEST_DB_PATH.parent.glob(f"{TEST_DB_PATH.stem}*"):
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+
+
+@pytest.fixture(autouse=True)
+def _imagery_dirs(tmp_path: Path, monkeypatch) -> None:
+    # Uploads and analysis artifacts go to the test's tmp dir, never data/imagery.
+    uploads = tmp_path / "uploads"
+    artifacts = tmp_path / "artifacts"
+    uploads.mkdir()
+    artifacts.mkdir()
+    monkeypatch.setattr("orchestrator_api.main.UPLOADS_DIR", uploads)
+    monkeypatch.setattr("mcp_satellite_server.opencv_ops.ARTIFACT_DIR", artifacts)
+
+
 def pytest_sessionstart(session) -> None:  # noqa: ARG001
-    if TEST_DB_PATH.exists():
-        TEST_DB_PATH.unlink()
+    _remove_test_stores()
 
 
 def pytest_sessionfinish(session, exitstatus) -> None:  # noqa: ARG001
-    if TEST_DB_PATH.exists():
-        TEST_DB_PATH.unlink()
+    _remove_test_stores()
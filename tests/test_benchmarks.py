@@ -0,0 +1,11 @@
+import json
+
+from benchmarks import retrieval
+
+
+def test_retrieval_benchmark_runs_on_a_small_corpus(capsys) -> None:
+    retrieval.main(["--chunks", "200", "--queries", "20", "--warmup", "2", "--no-rebuild"])
+
+    report = json.loads(capsys.readouterr().out)
+    assert [row["backend"] for row in report["results"]] == ["lexical", "sparse"]
+    assert all(row["chunks"] == 200 for row in report["results"])
@@ -1,4 +1,4 @@
-from orchestrator_api.rag.chunker import chunk_text
+from orchestrator_api.rag.chunker import MEASURE_BATCH, chunk_text, iter_chunks, iter_lines
 
 
 def test_chunk_text_preserves_markdown_headers() -> None:
@@ -17,3 +17,33 @@ def test_chunk_text_keeps_original_line_offsets() -> None:
     assert chunks[0].line_start == 3
     assert chunks[0].line_end >= 4
     assert any(chunk.line_start == 7 for chunk in chunks)
+
+
+def test_iter_chunks_streams_the_same_chunks_as_chunk_text() -> None:
+    text = "intro\r\n# Region A\n" + "\n".join(f"cloud line {i}" for i in range(40)) + "\n## B\nend"
+    pieces = [text[i : i + 7] for i in range(0, len(text), 7)]
+
+    assert list(iter_lines(pieces)) == text.splitlines()
+    assert list(iter_chunks(iter_lines(pieces), chunk_size=60, overlap=15)) == chunk_text(
+        text, chunk_size=60, overlap=15
+    )
+
+
+def test_measured_chunks_fit_the_budget_with_their_section_line() -> None:
+    batches: list[int] = []
+
+    def _words(lines: list[str]) -> list[int]:
+        batches.append(len(lines))
+        return [len(line.split()) for line in lines]
+
+    text = "# Korean Region\n" + "\n".join(f"구름 마스크 line {i}" for i in range(600))
+    chunks = chunk_text(text, chunk_size=20, overlap=5, measure=_words)
+
+    assert all(chunk.text.startswith("Section: Korean Region\n") for chunk in chunks)
+    assert max(len(chunk.text.split()) for chunk in chunks) <= 20
+    assert chunks[0].line_start == 1
+    assert chunks[-1].line_end == 601
+    assert all(b.line_start <= a.line_end + 1 for a, b in zip(chunks, chunks[1:], strict=False))
+    # Lines are measured in batches, plus one call for the section line.
+    assert max(batches) == MEASURE_BATCH
+    assert sum(batches) == 601 + 1
@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from orchestrator_api.rag.store import ChunkRecord, store
+
+
+def test_searches_do_not_wait_for_writer_lock() -> None:
+    store.clear()
+    store.add([ChunkRecord("doc", "doc:1-1", "cloud shadow removal guide", 1, 1)])
+    generation = store.generation
+
+    # Simulate a long ingest holding the writer lock.
+    with store._lock, ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(store.search, "cloud shadow", 1) for _ in range(8)]
+        results = [future.result(timeout=5) for future in futures]
+
+    assert all(hits[0][0].chunk_id == "doc:1-1" for hits in results)
+    assert store.generation == generation
+
+
+def test_add_publishes_a_new_generation() -> None:
+    store.clear()
+    before = store.generation
+
+    store.add([ChunkRecord("doc", "doc:2-2", "water index", 2, 2)])
+
+    assert store.generation > before
+    assert store.count() == 1
@@ -0,0 +1,53 @@
+from pathlib import Path
+
+from orchestrator_api.rag.store import ChunkRecord, SparseVectorStore
+
+
+def _chunks(doc_id: str, *texts: str) -> list[ChunkRecord]:
+    return [
+        ChunkRecord(doc_id, f"{doc_id}:{line}-{line}", text, line, line)
+        for line, text in enumerate(texts, start=1)
+    ]
+
+
+def test_upsert_and_delete_tombstone_old_chunks(tmp_path: Path) -> None:
+    store = SparseVectorStore(db_path=tmp_path / "store.sqlite3")
+    store.compaction_ratio = 2.0
+    store.upsert_document("a", _chunks("a", "cloud mask guide", "ndvi threshold"))
+    store.upsert_document("b", _chunks("b", "water body extraction"))
+
+    store.upsert_document("a", _chunks("a", "glacier calving front"))
+    assert store.delete_document("b") == 1
+
+    assert store.count() == 1
+    assert store.search("cloud mask ndvi water", top_k=5) == []
+    assert [c.chunk_id for c, _ in store.search("glacier", top_k=5)] == ["a:1-1"]
+
+    reloaded = SparseVectorStore(db_path=tmp_path / "store.sqlite3")
+    reloaded.compaction_ratio = 2.0
+    assert reloaded.count() == 1
+    assert reloaded._generation.tombstones == 3
+
+
+def test_compaction_renumbers_live_chunks(tmp_path: Path) -> None:
+    store = SparseVectorStore(db_path=tmp_path / "store.sqlite3")
+    store.compaction_ratio = 2.0
+    store.upsert_document("a", _chunks("a", "cloud mask guide"))
+    store.upsert_document("b", _chunks("b", "water body extraction", "river water level"))
+    store.delete_document("a")
+    before = store.search("water", top_k=5)
+    old_generation = store._generation
+
+    store.compact()
+
+    assert store._generation.doc_count == 2
+    assert store._generation.tombstones == 0
+    assert old_generation.chunks.doc_id(0) == "a"
+    hits = store.search("water", top_k=5)
+    assert [c.chunk_id for c, _ in hits] == [c.chunk_id for c, _ in before]
+
+    reloaded = SparseVectorStore(db_path=tmp_path / "store.sqlite3")
+    assert [c.chunk_id for c, _ in reloaded.search("water", top_k=5)] == [
+        c.chunk_id for c, _ in hits
+    ]
+    assert reloaded._generation.doc_count == 2
@@ -0,0 +1,99 @@
+import time
+from dataclasses import replace
+
+import pytest
+import torch
+from fastapi.testclient import TestClient
+
+from orchestrator_api.config import settings
+from orchestrator_api.main import app
+from orchestrator_api.rag.encoder import (
+    SparseEncoderRuntime,
+    autotune_batch_size,
+    build_sparse_model,
+)
+from orchestrator_api.rag.store import ChunkRecord, SparseVectorStore, store
+
+
+def test_failed_warmup_is_reported(monkeypatch) -> None:
+    def _missing_model(*args, **kwargs):
+        raise OSError("model not found")
+
+    monkeypatch.setattr("orchestrator_api.rag.encoder.SparseEncoder", _missing_model)
+    runtime = SparseEncoderRuntime("missing/model")
+
+    assert runtime.wait_ready(timeout=5) is False
+    info = runtime.info()
+    assert info["state"] == "failed"
+    assert info["error"] == "model not found"
+    assert info["warmup_seconds"] is not None
+
+
+def test_search_is_served_lexically_during_warmup(monkeypatch) -> None:
+    store.clear()
+    store.add([ChunkRecord("doc", "doc:1-1", "NDVI vegetation index guide", 1, 1)])
+
+    warming = SparseEncoderRuntime("warming/model")
+    warming.state = "loading"
+    monkeypatch.setattr("orchestrator_api.rag.store.sparse_encoder", warming)
+    fresh = SparseVectorStore()
+
+    hits = fresh.search("ndvi index", top_k=1)
+    info = fresh.backend_info()
+
+    assert hits[0][0].chunk_id == "doc:1-1"
+    assert info["backend"] == "lexical"
+    assert info["warmup_state"] == "loading"
+
+
+def test_health_reports_encoder_state() -> None:
+    body = TestClient(app).get("/health").json()
+
+    assert body["status"] == "ok"
+    assert body["rag_encoder"]["state"] in {"idle", "loading", "ready", "failed"}
+
+
+class _TinyModel(torch.nn.Module):
+    def __init__(self, *args, **kwargs) -> None:
+        if kwargs.get("backend") == "onnx":
+            raise RuntimeError("onnx runtime missing")
+        super().__init__()
+        self.head = torch.nn.Linear(8, 8)
+
+
+def test_unknown_inference_mode_fails_at_startup(monkeypatch) -> None:
+    monkeypatch.setattr(
+        "orchestrator_api.rag.encoder.settings", replace(settings, rag_sparse_inference="int4")
+    )
+
+    with pytest.raises(ValueError, match="RAG_SPARSE_INFERENCE"):
+        SparseEncoderRuntime("tiny/model")
+
+
+def test_int8_inference_quantizes_linear_layers(monkeypatch) -> None:
+    monkeypatch.setattr("orchestrator_api.rag.encoder.SparseEncoder", _TinyModel)
+
+    model, inference = build_sparse_model("tiny/model", "int8", "cpu")
+
+    assert inference == "int8"
+    assert isinstance(model.head, torch.ao.nn.quantized.dynamic.Linear)
+
+
+def test_onnx_inference_falls_back_to_torch(monkeypatch) -> None:
+    monkeypatch.setattr("orchestrator_api.rag.encoder.SparseEncoder", _TinyModel)
+
+    model, inference = build_sparse_model("tiny/model", "onnx", "cpu")
+
+    assert inference == "torch"
+    assert isinstance(model.head, torch.nn.Linear)
+
+
+def test_autotune_picks_fastest_batch_size() -> None:
+    def _encode(texts: list[str], batch_size: int) -> None:
+        # A fixed cost per call, so larger batches are faster.
+        time.sleep(0.002 * -(-len(texts) // batch_size))
+
+    best, rates = autotune_batch_size(_encode, [2, 4, 8], text="ndvi")
+
+    assert best == 8
+    assert set(rates) == {2, 4, 8}
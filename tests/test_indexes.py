@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from orchestrator_api.main import app
+from orchestrator_api.rag.indexes import IndexRegistry, UnknownIndexError, index_db_path, indexes
+from orchestrator_api.rag.ingest import ingest_documents
+from orchestrator_api.rag.retrieve import retrieve_citations
+from orchestrator_api.rag.store import ChunkRecord, SparseVectorStore
+
+
+def test_named_indexes_are_isolated(tmp_path: Path) -> None:
+    mission = indexes.get("mission-a", create=True)
+    mission.clear(delete_disk=True)
+    indexes.get().clear()
+    doc = tmp_path / "mission.txt"
+    doc.write_text("Glacier calving front tracking with SAR backscatter", encoding="utf-8")
+
+    count, failed = ingest_documents([str(doc)], index_name="mission-a")
+
+    assert (count, failed) == (1, [])
+    assert mission.count() == 1
+    assert indexes.get().count() == 0
+    assert retrieve_citations("glacier calving", index_name="mission-a")
+    assert retrieve_citations("glacier calving") == []
+    mission.clear(delete_disk=True)
+
+
+def test_registry_unloads_least_recently_used(tmp_path: Path) -> None:
+    default = SparseVectorStore(db_path=tmp_path / "default.sqlite3", name="default")
+    registry = IndexRegistry(default, max_resident=1)
+    default.add([ChunkRecord("a", "a:1-1", "orbit", 1, 1)])
+    assert default.loaded
+
+    other = registry.get("other", create=True)
+    other.count()
+
+    assert not default.loaded
+    assert other.loaded
+    assert default.count() == 1
+
+
+def test_invalid_index_name_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        indexes.get("../escape")
+
+
+def test_reading_an_unknown_index_creates_nothing() -> None:
+    with pytest.raises(UnknownIndexError):
+        indexes.get("never-ingested")
+    with pytest.raises(UnknownIndexError):
+        retrieve_citations("glacier", index_name="never-ingested")
+
+    resp = TestClient(app).post(
+        "/chat",
+        json={"question": "glacier", "index_name": "never-ingested"},
+        headers={"x-user-id": "alice"},
+    )
+
+    assert resp.status_code == 404
+    assert not index_db_path("never-ingested").exists()
+    assert "never-ingested" not in [info["name"] for info in indexes.info()]
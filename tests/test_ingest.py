@@ -1,6 +1,8 @@
 from pathlib import Path
 
-from orchestrator_api.rag.ingest import ingest_documents
+from orchestrator_api.rag.chunker import chunk_text
+from orchestrator_api.rag.ingest import ingest_documents, ingest_with_report, sync_documents
+from orchestrator_api.rag.pipeline import IngestPipeline
 from orchestrator_api.rag.retrieve import retrieve_citations
 from orchestrator_api.rag.store import store
 
@@ -21,3 +23,100 @@ def test_ingest_and_retrieve(tmp_path: Path) -> None:
     assert cites[0].line_start is not None
     assert cites[0].line_end is not None
     assert ":" in cites[0].chunk_id and "-" in cites[0].chunk_id
+
+
+def test_sync_documents_only_reingests_changed_files(tmp_path: Path) -> None:
+    store.clear()
+    keep = tmp_path / "keep.txt"
+    edit = tmp_path / "edit.txt"
+    gone = tmp_path / "gone.txt"
+    keep.write_text("NDVI vegetation index guide", encoding="utf-8")
+    edit.write_text("cloud mask threshold", encoding="utf-8")
+    gone.write_text("water body extraction", encoding="utf-8")
+    first = sync_documents([str(keep), str(edit), str(gone)], root=str(tmp_path))
+    assert len(first["updated"]) == 3
+
+    edit.write_text("glacier calving front", encoding="utf-8")
+    gone.unlink()
+    report = sync_documents([str(keep), str(edit)], root=str(tmp_path))
+
+    assert report["skipped"] == [str(keep)]
+    assert report["updated"] == [str(edit)]
+    assert report["removed"] == [str(gone)]
+    assert set(report["timings_ms"]) == {"scan", "ingest", "remove", "total"}
+    assert store.count() == 2
+    assert retrieve_citations("glacier calving")
+    assert retrieve_citations("water extraction") == []
+
+
+def test_ingest_pipeline_batches_documents_and_reports_throughput(tmp_path: Path) -> None:
+    store.clear()
+    paths = []
+    for i in range(5):
+        doc = tmp_path / f"doc{i}.md"
+        doc.write_text(f"# Scene {i}\nsentinel tile {i} cloud cover notes", encoding="utf-8")
+        paths.append(str(doc))
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+
+    report = ingest_with_report([*paths, str(broken)], chunk_size=200, overlap=20)
+
+    assert report.ingested == paths
+    assert [failure["document"] for failure in report.failures] == [str(broken)]
+    throughput = report.throughput()
+    assert throughput["documents"] == 5
+    assert throughput["chunks"] == store.count()
+    assert throughput["docs_per_s"] > 0
+
+
+def test_large_document_is_streamed_in_pieces(tmp_path: Path) -> None:
+    store.clear()
+    doc = tmp_path / "manual.md"
+    pieces: list[int] = []
+    pipeline = IngestPipeline(store, chunk_size=80, overlap=10)
+    pipeline.batch_size = 3
+    pipeline.stream_bytes = 0
+    pipeline.on_progress = lambda report, _: pieces.append(report.chunks)
+
+    for version in ("orbit", "glacier"):
+        text = "\n".join(f"{version} page {i} band notes" for i in range(60))
+        doc.write_text(text, encoding="utf-8")
+        pieces.clear()
+        report = pipeline.run([str(doc)])
+
+        assert report.ingested == [str(doc)]
+        assert report.chunks == store.count() == len(chunk_text(text, chunk_size=80, overlap=10))
+        assert len(pieces) > 3
+    assert retrieve_citations("orbit") == []
+    assert store.source_states()[str(doc)].size == doc.stat().st_size
+
+
+def test_encode_failure_drops_the_rest_of_a_streamed_document(
+    tmp_path: Path, monkeypatch
+) -> None:
+    class _FailingOnceEncoder:
+        calls = 0
+
+        def wait_ready(self) -> bool:
+            return True
+
+        def encode_documents(self, texts: list[str]) -> list:
+            self.calls += 1
+            if self.calls == 1:
+                raise RuntimeError("encoder out of memory")
+            return [None] * len(texts)
+
+    monkeypatch.setattr("orchestrator_api.rag.pipeline.sparse_encoder", _FailingOnceEncoder())
+    store.clear()
+    doc = tmp_path / "manual.md"
+    doc.write_text("\n".join(f"orbit page {i} band notes" for i in range(60)), encoding="utf-8")
+    pipeline = IngestPipeline(store, chunk_size=80, overlap=10)
+    pipeline.batch_size = 3
+    pipeline.stream_bytes = 0
+
+    report = pipeline.run([str(doc)])
+
+    assert report.ingested == []
+    assert report.failures == [{"document": str(doc), "error": "encoder out of memory"}]
+    assert store.count() == 0
+    assert str(doc) not in store.source_states()
@@ -0,0 +1,64 @@
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from orchestrator_api.main import app
+from orchestrator_api.rag.jobs import IngestJob, IngestJobManager, ingest_jobs
+from orchestrator_api.rag.store import store
+
+
+def _wait_for(predicate, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_ingest_job_reports_progress(tmp_path: Path) -> None:
+    store.clear()
+    docs = []
+    for i in range(3):
+        doc = tmp_path / f"scene{i}.txt"
+        doc.write_text(f"scene {i} flood extent mapping", encoding="utf-8")
+        docs.append(str(doc))
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    client = TestClient(app)
+    headers = {"x-user-id": "alice"}
+
+    submitted = client.post(
+        "/ingest/jobs", json={"documents": [*docs, str(broken)]}, headers=headers
+    )
+    assert submitted.status_code == 202
+    job_id = submitted.json()["id"]
+
+    # Polled in-process: the HTTP endpoint is rate limited.
+    _wait_for(lambda: ingest_jobs.get(job_id).status == "succeeded")
+    body = client.get(f"/ingest/jobs/{job_id}", headers=headers).json()
+    assert body["files_total"] == 4
+    assert body["files_done"] == 4
+    assert body["chunks_done"] == store.count() == 3
+    assert [failure["document"] for failure in body["failed"]] == [str(broken)]
+    assert body["result"]["ingested_count"] == 3
+    assert client.get("/ingest/jobs/unknown", headers=headers).status_code == 404
+
+
+def test_jobs_beyond_the_limit_queue_and_can_be_cancelled() -> None:
+    manager = IngestJobManager(max_concurrent=1)
+
+    def block_until_cancelled(job: IngestJob) -> dict:
+        job.cancel.wait(10)
+        return {}
+
+    running = manager.submit("ingest", "default", block_until_cancelled)
+    queued = manager.submit("ingest", "default", block_until_cancelled)
+    _wait_for(lambda: running.status == "running")
+    assert queued.status == "queued"
+
+    manager.cancel(queued.id)
+    manager.cancel(running.id)
+
+    _wait_for(lambda: running.status == "cancelled")
+    assert queued.status == "cancelled"
+    assert queued.started_at is None
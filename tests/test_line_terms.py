@@ -0,0 +1,21 @@
+from orchestrator_api.rag.line_terms import LineTerms, build_line_terms, refine_line_span
+from orchestrator_api.rag.retrieve import _refine_line_span
+
+TEXT = "\n".join(
+    [
+        "Section: Indices",
+        "NDVI uses red and near-infrared bands.",
+        "Cloud masks come from the SCL layer.",
+        "NDVI values near 1 indicate dense vegetation.",
+        "Sentinel-2 band B8 is near-infrared.",
+    ]
+)
+
+
+def test_stored_line_terms_refine_like_the_text() -> None:
+    stored = LineTerms.loads(build_line_terms(TEXT))
+    for query in ["ndvi vegetation", "near-infrared bands", "cloud", "b8 band", "nothing here"]:
+        terms = [t.lower() for t in query.replace("-", " ").split()]
+        assert refine_line_span(stored, terms, 10, 13) == _refine_line_span(query, TEXT, 10, 13)
+    assert stored.lines_with("infra") == 0b1001
+    assert _refine_line_span("ndvi vegetation", TEXT, 10, 13) == (12, 12)
@@ -5,7 +5,7 @@ import cv2
 import numpy as np
 from fastapi.testclient import TestClient
 
-from mcp_satellite_server.opencv_ops import ARTIFACT_DIR
+from mcp_satellite_server import opencv_ops
 from mcp_satellite_server.server import create_app
 
 
@@ -72,5 +72,5 @@ def test_mcp_analyze_satellite_image(tmp_path: Path) -> None:
         assert op["artifact_uri"] is not None
         assert op["artifact_uri"].startswith("/imagery/artifacts/")
         artifact_name = op["artifact_uri"].split("/imagery/artifacts/", 1)[1]
-        artifact_path = ARTIFACT_DIR / artifact_name
+        artifact_path = opencv_ops.ARTIFACT_DIR / artifact_name
         assert artifact_path.exists()
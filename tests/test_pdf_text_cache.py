@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from orchestrator_api import main
+from orchestrator_api.rag import parser, pipeline
+from orchestrator_api.rag.ingest import ingest_with_report
+from orchestrator_api.rag.parser import iter_pdf_pages
+from orchestrator_api.rag.retrieve import retrieve_citations
+from orchestrator_api.rag.store import store
+from orchestrator_api.rag.text_cache import ParsedTextCache
+
+
+def _write_pdf(path: Path, pages: list[str]) -> None:
+    writer = PdfWriter()
+    font = writer._add_object(
+        DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/Helvetica"),
+            }
+        )
+    )
+    for text in pages:
+        page = writer.add_blank_page(612, 792)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+        )
+    writer.write(path)
+
+
+def test_page_ranges_on_a_pool_keep_page_order(tmp_path: Path) -> None:
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, [f"orbit page {i}" for i in range(7)])
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        pooled = list(iter_pdf_pages(str(pdf), pool, pages_per_task=2, tasks_ahead=2))
+
+    assert pooled == list(iter_pdf_pages(str(pdf)))
+    assert [page.strip() for page in pooled] == [f"orbit page {i}" for i in range(7)]
+
+
+def test_unchanged_pdf_is_read_from_the_text_cache(tmp_path: Path, monkeypatch) -> None:
+    cache = ParsedTextCache(tmp_path / "parsed_text", 1 << 20)
+    monkeypatch.setattr(pipeline, "parsed_text_cache", cache)
+    monkeypatch.setattr(main, "parsed_text_cache", cache)
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, ["glacier calving front", "sea ice extent"])
+
+    store.clear()
+    assert ingest_with_report([str(pdf)]).ingested == [str(pdf)]
+    first = [c.snippet for c in retrieve_citations("glacier calving")]
+    assert cache.stats()["misses"] == 1
+
+    def _no_extraction(*args, **kwargs):
+        raise AssertionError("PDF extracted again")
+
+    monkeypatch.setattr(parser, "PdfReader", _no_extraction)
+    store.clear()
+    assert ingest_with_report([str(pdf)]).ingested == [str(pdf)]
+    assert [c.snippet for c in retrieve_citations("glacier calving")] == first
+    assert cache.stats()["hits"] == 1
+    metrics = TestClient(main.app).get("/metrics").text
+    assert "rag_parsed_text_cache_hits_total 1" in metrics
+    assert "rag_parsed_text_cache_misses_total 1" in metrics
@@ -0,0 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+from orchestrator_api.rag import store as store_module
+from orchestrator_api.rag.encoder import QueryMicroBatcher, SparseEncoderRuntime, SparseVector
+from orchestrator_api.rag.inference_free import QueryTables
+from orchestrator_api.rag.sparse_index import SparseMatrixIndex
+from orchestrator_api.rag.store import IndexGeneration
+
+
+class _CountingModel:
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def encode_query(self, queries: list[str]) -> torch.Tensor:
+        self.calls.append(list(queries))
+        vectors = np.zeros((len(queries), 8), dtype=np.float32)
+        for row, query in enumerate(queries):
+            vectors[row, len(query) % 8] = 1.0
+        return torch.from_numpy(vectors)
+
+
+class _WordTokenizer:
+    all_special_ids = [0]
+
+    def __call__(self, text: str, add_special_tokens: bool = True) -> dict:
+        return {"input_ids": [len(word) % 8 for word in text.split()]}
+
+
+def _ready_runtime() -> SparseEncoderRuntime:
+    runtime = SparseEncoderRuntime("counting/model")
+    runtime.model = _CountingModel()
+    runtime.tokenizer = _WordTokenizer()
+    runtime.special_ids = frozenset([0])
+    runtime.state = "ready"
+    return runtime
+
+
+def test_micro_batcher_groups_concurrent_queries() -> None:
+    calls: list[list[str]] = []
+
+    def _encode_batch(queries: list[str]) -> list[SparseVector]:
+        calls.append(queries)
+        weights = np.array([1.0], dtype=np.float32)
+        return [SparseVector(np.array([len(query)]), weights) for query in queries]
+
+    batcher = QueryMicroBatcher(_encode_batch, max_batch_size=8, max_wait_ms=200)
+    queries = ["a" * n for n in range(1, 9)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(batcher.encode, queries))
+
+    assert [int(vec.rows[0]) for vec in results] == list(range(1, 9))
+    assert len(calls) < len(queries)
+    assert batcher.stats()["queries"] == len(queries)
+
+
+def test_encode_query_is_cached_by_normalized_text() -> None:
+    runtime = SparseEncoderRuntime("counting/model")
+    runtime.model = _CountingModel()
+    runtime.state = "ready"
+
+    first = runtime.encode_query("ndvi  bands")
+    second = runtime.encode_query(" ndvi bands ")
+
+    assert len(runtime.model.calls) == 1
+    assert first is second
+    assert runtime.info()["query_cache"]["hits"] == 1
+
+
+def test_inference_free_query_skips_the_model() -> None:
+    runtime = _ready_runtime()
+    # Token ids 3 (twice), 4, 0 (special) and 2; token 2 was never indexed.
+    gen = IndexGeneration(
+        backend="sparse",
+        doc_count=4,
+        postings=SparseMatrixIndex().append(
+            np.array([3, 4, 4, 4]), np.array([0, 1, 2, 3]), np.ones(4, dtype=np.float32)
+        ),
+    )
+
+    vec = runtime.encode_query_inference_free("sar dem ndvi swirband ab", gen.token_idf)
+
+    assert runtime.model.calls == []
+    assert vec.rows.tolist() == [3, 4]
+    assert vec.weights[0] > vec.weights[1] > 0
+    assert runtime.info()["query_encodings"]["inference_free"] == 1
+
+
+def test_query_tables_add_expansions_with_max_weight() -> None:
+    tables = QueryTables(
+        token_weights=np.array([0.0, 2.0, 1.0, 0.5], dtype=np.float32),
+        expansion_ptr=np.array([0, 0, 2, 3, 3]),
+        expansion_ids=np.array([2, 3, 3]),
+        expansion_weights=np.array([0.5, 0.25, 1.0], dtype=np.float32),
+    )
+
+    rows, weights = tables.weigh(np.array([1, 2]))
+
+    assert rows.tolist() == [1, 2, 3]
+    # Token 2 is in the query (1.0) and an expansion of 1 (2.0 * 0.5); 3 comes from both.
+    assert weights.tolist() == [2.0, 1.0, 1.0]
+
+
+def test_auto_query_encoding_skips_the_model_under_load(monkeypatch) -> None:
+    runtime = _ready_runtime()
+    monkeypatch.setattr(store_module, "sparse_encoder", runtime)
+    gen = IndexGeneration(backend="sparse", doc_count=1)
+
+    store_module._query_vector(gen, "ndvi", "auto")
+    runtime._pending_queries = 10**6
+    store_module._query_vector(gen, "swir", "auto")
+
+    assert runtime.model.calls == [["ndvi"]]
+    assert runtime.query_encodings == {"model": 1, "inference_free": 1}
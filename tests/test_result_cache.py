@@ -0,0 +1,68 @@
+from orchestrator_api.rag import retrieve
+from orchestrator_api.rag.cache import TTLCache
+from orchestrator_api.rag.indexes import indexes
+from orchestrator_api.rag.store import ChunkRecord
+
+
+def test_citations_are_cached_until_the_index_changes(monkeypatch) -> None:
+    store = indexes.get("cache-test", create=True)
+    store.clear(delete_disk=True)
+    store.add([ChunkRecord("a", "a:1-1", "NDVI vegetation index from red and NIR", 1, 1)])
+    searches: list[str] = []
+    search_hits = retrieve._search_hits
+
+    def _counting_search_hits(query: str, *args, **kwargs):
+        searches.append(query)
+        return search_hits(query, *args, **kwargs)
+
+    monkeypatch.setattr(retrieve, "_search_hits", _counting_search_hits)
+    monkeypatch.setattr(retrieve, "result_cache", TTLCache(8, 60))
+
+    first = retrieve.retrieve_citations("what is  NDVI", index_name="cache-test")
+    second = retrieve.retrieve_citations(" what is NDVI ", index_name="cache-test")
+    assert len(searches) == 1
+    assert second == first and second[0] is not first[0]
+
+    store.add([ChunkRecord("b", "b:1-1", "NDVI thresholds for crops", 1, 1)])
+    third = retrieve.retrieve_citations("what is NDVI", index_name="cache-test")
+    assert len(searches) == 2
+    assert {c.doc_id for c in third} == {"a", "b"}
+    assert retrieve.result_cache.stats()["hit_rate"] == round(1 / 3, 4)
+    store.clear(delete_disk=True)
+
+
+def test_auto_query_encoding_caches_per_encoding_used(monkeypatch) -> None:
+    store = indexes.get("cache-test", create=True)
+    store.clear(delete_disk=True)
+    store.add([ChunkRecord("a", "a:1-1", "NDVI vegetation index from red and NIR", 1, 1)])
+    encodings: list[str] = []
+    search_hits = retrieve._search_hits
+
+    def _counting_search_hits(*args, query_encoding: str, **kwargs):
+        encodings.append(query_encoding)
+        return search_hits(*args, query_encoding=query_encoding, **kwargs)
+
+    monkeypatch.setattr(retrieve, "_search_hits", _counting_search_hits)
+    monkeypatch.setattr(retrieve, "result_cache", TTLCache(8, 60))
+
+    monkeypatch.setattr(retrieve.sparse_encoder, "_pending_queries", 10**6)
+    retrieve.retrieve_citations("NDVI", index_name="cache-test", query_encoding="auto")
+    monkeypatch.setattr(retrieve.sparse_encoder, "_pending_queries", 0)
+    retrieve.retrieve_citations("NDVI", index_name="cache-test", query_encoding="auto")
+    retrieve.retrieve_citations("NDVI", index_name="cache-test", query_encoding="model")
+
+    assert encodings == ["inference_free", "model"]
+    store.clear(delete_disk=True)
+
+
+def test_ttl_cache_expires_entries() -> None:
+    now = [0.0]
+    cache = TTLCache(4, ttl_seconds=10, clock=lambda: now[0])
+    cache.put("q", ["hit"])
+
+    now[0] = 9.0
+    assert cache.get("q") == ["hit"]
+    now[0] = 10.0
+    assert cache.get("q") is None
+    assert cache.stats()["expired"] == 1
+    assert len(cache) == 0
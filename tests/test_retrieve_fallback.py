@@ -0,0 +1,39 @@
+from orchestrator_api.rag import retrieve
+from orchestrator_api.rag.cache import TTLCache
+from orchestrator_api.rag.indexes import indexes
+from orchestrator_api.rag.store import ChunkRecord
+
+
+def test_relaxed_fallback_reuses_one_search(monkeypatch) -> None:
+    store = indexes.get("fallback-test", create=True)
+    store.clear(delete_disk=True)
+    store.add(
+        [
+            ChunkRecord("a", "a:1-1", "Sentinel-2 bands B4 red and B8 near infrared", 1, 1),
+            ChunkRecord("b", "b:1-1", "Landsat thermal bands for surface temperature", 1, 1),
+            ChunkRecord("c", "c:1-1", "Cloud masking with the scene classification layer", 1, 1),
+        ]
+    )
+    searches: list[float] = []
+    search_hits = retrieve._search_hits
+
+    def _counting_search_hits(*args, **kwargs):
+        searches.append(kwargs["min_score"])
+        return search_hits(*args, **kwargs)
+
+    monkeypatch.setattr(retrieve, "_search_hits", _counting_search_hits)
+    monkeypatch.setattr(retrieve, "result_cache", TTLCache(8, 60))
+
+    ranked = retrieve.retrieve_ranked("sentinel bands", top_k=2, index_name="fallback-test")
+    scores = [score for _, score in ranked.hits]
+    threshold = (scores[0] + scores[1]) / 2
+    strict = store.search("sentinel bands", top_k=6, min_score=threshold)
+    assert [c.chunk_id for c in ranked.citations(threshold)] == [c.chunk_id for c, _ in strict]
+
+    citations, relaxed = retrieve.retrieve_citations_relaxed(
+        "sentinel bands", top_k=2, min_score=2.0, index_name="fallback-test"
+    )
+    assert relaxed
+    assert citations == ranked.citations(0.0)
+    assert searches == [0.0]
+    store.clear(delete_disk=True)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from orchestrator_api.rag.store import ChunkRecord, SparseVectorStore, store
+
+
+def test_cold_start_restores_memory_mapped_snapshot(monkeypatch) -> None:
+    store.clear()
+    store.add(
+        [
+            ChunkRecord("doc", "doc:1-1", "Section: NDVI\nNDVI uses red and NIR bands", 1, 1),
+            ChunkRecord("doc", "doc:2-2", "cloud mask threshold guide", 2, 2),
+        ]
+    )
+    store.save_snapshot()
+    expected = store.search("ndvi bands", top_k=2)
+
+    def _fail_reindex(*args, **kwargs) -> None:
+        raise AssertionError("snapshot should make re-tokenizing unnecessary")
+
+    monkeypatch.setattr(SparseVectorStore, "_index_terms_locked", _fail_reindex)
+    fresh = SparseVectorStore()
+    hits = fresh.search("ndvi bands", top_k=2)
+
+    assert [(c.chunk_id, round(s, 6)) for c, s in hits] == [
+        (c.chunk_id, round(s, 6)) for c, s in expected
+    ]
+    assert isinstance(fresh._generation.doc_lengths, np.memmap)
+
+
+def test_stale_snapshot_is_rebuilt() -> None:
+    store.clear()
+    store.add([ChunkRecord("doc", "doc:1-1", "water body extraction", 1, 1)])
+    store.save_snapshot()
+    store.add([ChunkRecord("doc", "doc:2-2", "urban change detection", 2, 2)])
+
+    fresh = SparseVectorStore()
+
+    assert fresh.count() == 2
+    assert fresh.search("urban change", top_k=1)[0][0].chunk_id == "doc:2-2"
@@ -0,0 +1,114 @@
+import numpy as np
+
+from orchestrator_api.rag.pruning import maxscore_top_k
+from orchestrator_api.rag.sparse_index import BLOCK_SIZE, SparseMatrixIndex, top_k_indices
+
+
+def test_matvec_matches_dense_product_across_segments() -> None:
+    rng = np.random.default_rng(7)
+    dense = (rng.random((40, 25)) > 0.8) * rng.random((40, 25))
+
+    index = SparseMatrixIndex()
+    for start in range(0, 25, 4):
+        rows, cols = np.nonzero(dense[:, start : start + 4])
+        index = index.append(rows, cols + start, dense[rows, cols + start])
+
+    assert len(index.segments) < 7
+    assert index.nnz == int(np.count_nonzero(dense))
+
+    query = np.zeros(40)
+    query[[1, 5, 17, 33]] = [0.5, 1.0, 2.0, 0.25]
+    rows = np.flatnonzero(query)
+    scores = index.matvec(rows, query[rows], n_docs=25)
+
+    np.testing.assert_allclose(scores, query @ dense, rtol=1e-5)
+
+
+def test_gather_skips_unknown_rows() -> None:
+    index = SparseMatrixIndex().append(
+        np.array([3, 3, 9]),
+        np.array([0, 2, 1]),
+        np.array([1.0, 2.0, 3.0]),
+    )
+
+    query_pos, docs, values = index.gather(np.array([1, 3]))
+
+    assert query_pos.tolist() == [1, 1]
+    assert docs.tolist() == [0, 2]
+    assert values.tolist() == [1.0, 2.0]
+
+
+def test_maxscore_keeps_exact_top_k_and_touches_fewer_postings() -> None:
+    rng = np.random.default_rng(3)
+    dense = (rng.random((60, 400)) > 0.7) * rng.random((60, 400)) ** 4
+    index = SparseMatrixIndex()
+    for start in range(0, 400, 100):
+        rows, cols = np.nonzero(dense[:, start : start + 100])
+        index = index.append(rows, cols + start, dense[rows, cols + start])
+    rows = np.array([2, 7, 11, 30, 41, 59])
+    weights = np.array([1.0, 0.2, 0.7, 0.05, 1.5, 0.4])
+    offsets = (rng.random(400) > 0.8) * rng.random(400) * 0.2
+    excluded = np.zeros(400, dtype=bool)
+    excluded[::17] = True
+
+    pruned = maxscore_top_k(
+        index,
+        rows,
+        weights,
+        400,
+        5,
+        offset_lb=offsets,
+        offset_ub=offsets + 0.05,
+        unseen_ub=0.05,
+        seed=offsets > 0,
+        excluded=excluded,
+    )
+
+    full = weights @ dense[rows] + offsets
+    full[excluded] = -np.inf
+    expected = top_k_indices(full, 5)
+    alive = np.flatnonzero(pruned.alive)
+    assert set(expected) <= set(alive)
+    np.testing.assert_allclose(pruned.scores[alive], (weights @ dense[rows])[alive], rtol=1e-5)
+    assert pruned.postings_touched < pruned.postings_total == int(np.count_nonzero(dense[rows]))
+
+
+def test_lookup_reads_only_requested_docs() -> None:
+    index = SparseMatrixIndex().append(
+        np.array([4, 4, 4, 4]),
+        np.array([1, 3, 5, 7]),
+        np.array([0.1, 0.3, 0.5, 0.7]),
+    )
+
+    positions, values, read = index.lookup(4, np.array([3, 6]))
+
+    assert positions.tolist() == [0]
+    assert values.tolist() == [np.float32(0.3)]
+    assert read == 2
+    assert index.row_stats(np.array([4, 9]))[0].tolist() == [np.float32(0.7), 0.0]
+
+
+
+def test_compact_formats_round_trip_within_block_bounds() -> None:
+    rng = np.random.default_rng(3)
+    rows = np.repeat(np.arange(4), 300)
+    docs = np.concatenate([rng.choice(2_000_000, 300, replace=False) for _ in range(4)])
+    values = (rng.random(1200) * 3).astype(np.float32)
+    order = np.lexsort((docs, rows))
+
+    for weight_format, tolerance in (("float32", 0.0), ("float16", 2e-3), ("uint8", 6e-3)):
+        segment = SparseMatrixIndex(weight_format=weight_format).append(rows, docs, values).merged()
+        _, out_docs, out_values = segment.to_triples()
+
+        assert segment.weight_format == weight_format
+        assert out_docs.tolist() == docs[order].tolist()
+        np.testing.assert_allclose(out_values, values[order], atol=tolerance)
+        for pos in range(4):
+            block_values = segment.row_postings(pos)[1]
+            padded = np.pad(block_values, (0, -len(block_values) % BLOCK_SIZE))
+            assert (padded.reshape(-1, BLOCK_SIZE).max(axis=1) <= segment.row_block_max(pos)).all()
+
+    # Sparse rows need 32-bit offsets; dense ones fit in 16 bits.
+    assert segment.doc_delta.dtype == np.uint32
+    dense = SparseMatrixIndex().append(rows, rows * 1000 + docs % 1000, values).merged()
+    assert dense.doc_delta.dtype == np.uint16
@@ -0,0 +1,72 @@
+import sqlite3
+from pathlib import Path
+
+from orchestrator_api.rag.sqlite_storage import SQLiteStorage
+
+
+def _select(db_path: Path, sql: str, params: tuple = ()) -> list[tuple]:
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+
+def test_heap_postings_are_migrated_to_clustered_layout(tmp_path: Path) -> None:
+    db_path = tmp_path / "legacy.sqlite3"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE postings (token_id INTEGER, doc_idx INTEGER, weight REAL)")
+        conn.execute("CREATE INDEX idx_postings_token ON postings(token_id)")
+        conn.executemany(
+            "INSERT INTO postings VALUES(?, ?, ?)", [(7, 1, 0.5), (3, 0, 1.0), (7, 0, 2.0)]
+        )
+    conn.close()
+
+    storage = SQLiteStorage(db_path)
+    with sqlite3.connect(db_path) as conn:
+        ddl = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'postings'").fetchone()[0]
+        journal = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.close()
+
+    assert "WITHOUT ROWID" in ddl.upper()
+    assert journal == "wal"
+    postings = "SELECT doc_idx, weight FROM postings WHERE token_id = ?"
+    assert _select(db_path, postings, (7,)) == [(0, 2.0), (1, 0.5)]
+    storage.close()
+
+
+def test_renumber_docs_moves_chunks_and_postings(tmp_path: Path) -> None:
+    db_path = tmp_path / "store.sqlite3"
+    storage = SQLiteStorage(db_path)
+    with storage.transaction() as conn:
+        storage.insert_chunks(
+            conn, [(doc_idx, "doc", f"doc:{doc_idx}", "text", 1, 1, None) for doc_idx in range(3)]
+        )
+        storage.insert_postings(conn, [(5, 0, 1.0), (5, 1, 1.0), (5, 2, 3.0)])
+        storage.delete_docs(conn, [0])
+        storage.renumber_docs(conn, [(0, 1), (1, 2)])
+
+    assert [row[:3] for row in storage.load_chunk_index()] == [
+        (0, "doc", "doc:1"),
+        (1, "doc", "doc:2"),
+    ]
+    postings = "SELECT doc_idx, weight FROM postings WHERE token_id = ?"
+    assert _select(db_path, postings, (5,)) == [(0, 1.0), (1, 3.0)]
+    storage.close()
+
+
+def test_chunks_without_line_terms_are_migrated(tmp_path: Path) -> None:
+    db_path = tmp_path / "store.sqlite3"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE chunks (doc_idx INTEGER PRIMARY KEY, doc_id TEXT NOT NULL, "
+        "chunk_id TEXT NOT NULL UNIQUE, text TEXT NOT NULL, line_start INTEGER NOT NULL, "
+        "line_end INTEGER NOT NULL)"
+    )
+    conn.execute("INSERT INTO chunks VALUES (0, 'doc', 'doc:1-1', 'text', 1, 1)")
+    conn.commit()
+    conn.close()
+
+    storage = SQLiteStorage(db_path)
+
+    assert _select(db_path, "SELECT * FROM chunks") == [(0, "doc", "doc:1-1", "text", 1, 1, None)]
+    storage.close()
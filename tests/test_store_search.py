@@ -0,0 +1,46 @@
+from orchestrator_api.rag.store import ChunkRecord, store
+
+
+def _record(chunk_id: str, text: str) -> ChunkRecord:
+    return ChunkRecord(doc_id="doc", chunk_id=chunk_id, text=text, line_start=1, line_end=2)
+
+
+def test_search_skips_unmatched_chunks_and_boosts_headings() -> None:
+    store.clear()
+    store.add(
+        [
+            _record("doc:1-2", "notes\ncloud mask appears in this paragraph"),
+            _record("doc:3-4", "Section: Cloud mask\ncloud mask steps"),
+            _record("doc:5-6", "water body extraction"),
+        ]
+    )
+
+    hits = store.search("cloud mask", top_k=5, min_score=0.0)
+
+    assert [chunk.chunk_id for chunk, _ in hits] == ["doc:3-4", "doc:1-2"]
+    assert hits[0][1] > hits[1][1]
+
+
+def test_hits_read_text_from_disk_by_chunk_id() -> None:
+    store.clear()
+    store.add([_record("doc:1-2", "Section: NDVI\nndvi from red and nir bands")])
+    store.unload()
+
+    gen = store._current_generation()
+    assert gen.chunks.row(0) == ("doc", "doc:1-2", 1, 2)
+    [(hit, _)] = store.search("ndvi", top_k=1)
+    assert hit.text == "Section: NDVI\nndvi from red and nir bands"
+    assert hit.line_terms is not None
+
+    # A chunk removed after the generation was published is dropped, not misattributed.
+    with store._storage.transaction() as conn:
+        store._storage.delete_docs(conn, [0])
+    assert store.search("ndvi", top_k=1) == []
+
+
+def test_search_with_non_positive_top_k_returns_nothing() -> None:
+    store.clear()
+    store.add([_record("doc:1-2", "cloud mask steps")])
+
+    assert store.search("cloud mask", top_k=0) == []
+    assert store.search("cloud mask", top_k=-2) == []
@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import pytest
+
+from orchestrator_api.rag.chroma_store import ChromaVectorStore
+from orchestrator_api.rag.encoder import SparseEncoderRuntime
+from orchestrator_api.rag.store import ChunkRecord, SourceState, SparseVectorStore
+from orchestrator_api.rag.vector_store import VectorStore
+
+
+def test_backends_implement_the_store_interface(tmp_path: Path) -> None:
+    assert isinstance(SparseVectorStore(db_path=tmp_path / "store.sqlite3"), VectorStore)
+    assert isinstance(ChromaVectorStore(path=tmp_path / "store.chroma"), VectorStore)
+
+
+def test_chroma_store_upsert_search_and_delete(tmp_path: Path) -> None:
+    pytest.importorskip("chromadb")
+    store = ChromaVectorStore(path=tmp_path / "store.chroma", name="chroma-test")
+    source = SourceState(content_hash="abc", mtime=1.0, size=10)
+    store.upsert_document(
+        "scene",
+        [
+            ChunkRecord("scene", "scene:1-1", "flood extent mapping with SAR", 1, 1),
+            ChunkRecord("scene", "scene:2-2", "cloud mask threshold guide", 2, 2),
+        ],
+        source,
+    )
+    store.add([ChunkRecord("other", "other:1-1", "urban change detection", 1, 1)])
+
+    hits = store.search("flood extent", top_k=2)
+    assert hits[0][0].chunk_id == "scene:1-1"
+    assert store.count() == 3
+    assert store.source_states() == {"scene": source}
+
+    store.upsert_document("scene", [ChunkRecord("scene", "scene:1-3", "glacier retreat", 1, 3)])
+    assert store.count() == 2
+    assert store.search("glacier", top_k=1)[0][0].line_end == 3
+
+    assert store.delete_document("other") == 1
+    assert store.count() == 1
+    reopened = ChromaVectorStore(path=tmp_path / "store.chroma", name="chroma-test")
+    assert reopened.count() == 1
+    store.clear()
+    assert store.count() == 0
+
+
+def test_chroma_sparse_collection_is_searched_lexically_during_warmup(
+    tmp_path: Path, monkeypatch
+) -> None:
+    chromadb = pytest.importorskip("chromadb")
+    warming = SparseEncoderRuntime("warming/model")
+    warming.state = "loading"
+    monkeypatch.setattr("orchestrator_api.rag.chroma_store.sparse_encoder", warming)
+    # A collection built with SPLADE vectors by an earlier process.
+    client = chromadb.PersistentClient(path=str(tmp_path / "store.chroma"))
+    collection = client.create_collection(
+        "chunks",
+        metadata={"hnsw:space": "cosine", "features": "sparse", "dim": 8},
+        embedding_function=None,
+    )
+    collection.upsert(
+        ids=["scene:1-1", "scene:2-2"],
+        embeddings=[[1.0] + [0.0] * 7, [0.0, 1.0] + [0.0] * 6],
+        documents=["flood extent mapping with SAR", "cloud mask threshold guide"],
+        metadatas=[
+            {"doc_id": "scene", "line_start": 1, "line_end": 1},
+            {"doc_id": "scene", "line_start": 2, "line_end": 2},
+        ],
+    )
+    store = ChromaVectorStore(path=tmp_path / "store.chroma", name="chroma-warmup")
+
+    hits = store.search("flood extent", top_k=2)
+
+    assert [chunk.chunk_id for chunk, _ in hits] == ["scene:1-1"]
+    assert store.backend_info()["features"] == "sparse"
+
+
+def test_chroma_reads_do_not_create_the_collection(tmp_path: Path, monkeypatch) -> None:
+    pytest.importorskip("chromadb")
+    warming = SparseEncoderRuntime("warming/model")
+    warming.state = "loading"
+    monkeypatch.setattr(
+        warming, "wait_ready", lambda timeout=None: pytest.fail("a read waited for the encoder")
+    )
+    monkeypatch.setattr("orchestrator_api.rag.chroma_store.sparse_encoder", warming)
+    store = ChromaVectorStore(path=tmp_path / "store.chroma", name="chroma-fresh")
+
+    assert store.search("flood extent") == []
+    assert store.count() == 0
+    assert store.source_states() == {}
+    assert store.delete_document("scene") == 0
+    assert not (tmp_path / "store.chroma").exists()